@@ -21,18 +21,20 @@ files into the executable.
 # See pyi_carchive.py for a more general archive (contains anything)
 # that can be understood by a C program.
 
+import hashlib
 import os
 import sys
 import struct
 from types import CodeType
 import marshal
 import zlib
+from multiprocessing.pool import ThreadPool
 
-from PyInstaller.building.utils import get_code_object, strip_paths_in_code,\
-    fake_pyc_timestamp
+from PyInstaller.building.utils import get_code_data, fake_pyc_timestamp
 from PyInstaller.loader.pyimod02_archive import PYZ_TYPE_MODULE, PYZ_TYPE_PKG, \
-    PYZ_TYPE_DATA
+    PYZ_TYPE_DATA, PYZ_CODEC_STORE, PYZ_CODEC_ZLIB, PYZ_CODEC_LZMA
 from ..compat import BYTECODE_MAGIC, is_py2
+from ..utils.misc import replace_file, save_file_atomically
 
 
 class ArchiveWriter(object):
@@ -173,20 +175,135 @@ class ZlibArchiveWriter(ArchiveWriter):
     TOCPOS = 8
     HDRLEN = ArchiveWriter.HDRLEN + 5
     COMPRESSION_LEVEL = 6  # Default level of the 'zlib' module from Python.
-
-    def __init__(self, archive_path, logical_toc, code_dict=None, cipher=None):
+    CODECS = {'store': PYZ_CODEC_STORE,
+              'zlib': PYZ_CODEC_ZLIB,
+              'lzma': PYZ_CODEC_LZMA}
+    # Increase this when changing the format of the index.
+    INDEX_VERSION = 1
+
+    def __init__(self, archive_path, logical_toc, code_dict=None, cipher=None,
+                 jobs=1, compression='zlib'):
         """
-        code_dict      dict containing module code objects from ModuleGraph.
+        code_dict      dict containing module code objects from ModuleGraph,
+                       or the marshalled code objects.
+        jobs           number of threads compressing (and encrypting) entries.
+                       The archive is the same for any number of threads.
+        compression    codec used for the entries, one of `CODECS`. Entries
+                       not getting smaller are stored uncompressed.
+
+        Next to the archive an index `archive_path + '.index'` is written,
+        recording the digest of the data of each entry. When the archive is
+        written again, unchanged entries are copied from the previous archive
+        instead of compressing them again.
         """
+        if compression not in self.CODECS:
+            raise ValueError('Unknown PYZ compression %r, use one of %s'
+                             % (compression, ', '.join(sorted(self.CODECS))))
+        if compression == 'lzma' and is_py2:
+            raise ValueError('lzma compression requires Python 3')
         # Keep references to module code objects constructed by ModuleGraph
         # to avoid writting .pyc/pyo files to hdd.
         self.code_dict = code_dict or {}
         self.cipher = cipher or None
+        self.jobs = jobs
+        self.codec = self.CODECS[compression]
+        # The compressed entries depend on these, besides their data.
+        key_id = None
+        if self.cipher:
+            key = self.cipher.key
+            if not isinstance(key, bytes):
+                key = key.encode('utf-8')
+            key_id = hashlib.md5(key).hexdigest()
+        self._settings = (compression, self.COMPRESSION_LEVEL, key_id)
+        # Index of the entries written, see _write_index().
+        self._index = {}
 
         super(ZlibArchiveWriter, self).__init__(archive_path, logical_toc)
 
+    def _start_add_entries(self, archive_path):
+        self._archive_path = archive_path
+        self._previous = self._open_previous_archive()
+        super(ZlibArchiveWriter, self)._start_add_entries(archive_path)
+
+    def _open_previous_archive(self):
+        """
+        Move the previous archive aside and return the tuple ``(index,
+        file)`` to copy its entries from, or `None` if there is no usable
+        previous archive.
+        """
+        index_path = self._archive_path + '.index'
+        try:
+            with open(index_path, 'rb') as f:
+                version, size, index = marshal.load(f)
+            # The index is not valid anymore once writing the archive starts.
+            os.remove(index_path)
+        except (IOError, OSError):
+            return None
+        except (EOFError, ValueError, TypeError):
+            os.remove(index_path)
+            return None
+        try:
+            if version != self.INDEX_VERSION or \
+                    os.path.getsize(self._archive_path) != size:
+                return None
+            previous_path = self._archive_path + '.previous'
+            replace_file(self._archive_path, previous_path)
+            return index, open(previous_path, 'rb')
+        except (IOError, OSError):
+            return None
+
+    def _get_previous_entry(self, name, typ, digest):
+        """
+        Return the tuple ``(codec, obj)`` of an unchanged entry of the
+        previous archive, or `None`.
+        """
+        if self._previous is None:
+            return None
+        index, f = self._previous
+        entry = index.get(name)
+        if entry is None or entry[:3] != (typ, digest, self._settings):
+            return None
+        pos, length, codec = entry[3:]
+        f.seek(pos)
+        obj = f.read(length)
+        if len(obj) != length:
+            return None
+        return codec, obj
+
+    def _add_from_table_of_contents(self, toc):
+        entries = [self._get_entry_data(entry) for entry in toc]
+        digests = [hashlib.md5(data).digest() for _, _, data in entries]
+        objs = [self._get_previous_entry(name, typ, digest)
+                for (name, typ, _), digest in zip(entries, digests)]
+        missing = [i for i, obj in enumerate(objs) if obj is None]
+        if self.jobs > 1 and len(missing) > 1:
+            # zlib and lzma release the GIL while compressing, so threads
+            # compress entries in parallel.
+            pool = ThreadPool(self.jobs)
+            try:
+                compressed = pool.map(self._compress,
+                                      [entries[i][2] for i in missing],
+                                      chunksize=16)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            compressed = [self._compress(entries[i][2]) for i in missing]
+        for i, obj in zip(missing, compressed):
+            objs[i] = obj
+        for (name, typ, _), digest, (codec, obj) in zip(entries, digests,
+                                                        objs):
+            self._add_compressed(name, typ, codec, obj, digest)
 
     def add(self, entry):
+        name, typ, data = self._get_entry_data(entry)
+        codec, obj = self._compress(data)
+        self._add_compressed(name, typ, codec, obj, hashlib.md5(data).digest())
+
+    def _get_entry_data(self, entry):
+        """
+        Return the tuple ``(name, typ, data)`` for an entry of the TOC.
+        """
         name, path, typ = entry
         if typ == 'PYMODULE':
             typ = PYZ_TYPE_MODULE
@@ -199,7 +316,9 @@ class ZlibArchiveWriter(ArchiveWriter):
                 base, ext = os.path.splitext(os.path.basename(path))
                 if base == '__init__':
                     typ = PYZ_TYPE_PKG
-            data = marshal.dumps(self.code_dict[name])
+            data = self.code_dict[name]
+            if not isinstance(data, bytes):
+                data = marshal.dumps(data)
         else:
             # Any data files, that might be required by pkg_resources.
             typ = PYZ_TYPE_DATA
@@ -207,16 +326,61 @@ class ZlibArchiveWriter(ArchiveWriter):
                 data = fh.read()
             # No need to use forward slash as path-separator here since
             # pkg_resources on Windows back slash as path-separator.
+        return name, typ, data
 
-        obj = zlib.compress(data, self.COMPRESSION_LEVEL)
+    def _compress(self, data):
+        """
+        Return the tuple ``(codec, obj)`` with the compressed (and encrypted)
+        data and the codec used.
+        """
+        codec = self.codec
+        if codec == PYZ_CODEC_ZLIB:
+            obj = zlib.compress(data, self.COMPRESSION_LEVEL)
+        elif codec == PYZ_CODEC_LZMA:
+            import lzma
+            # The dictionary is allocated when decompressing, so do not make
+            # it larger than the entry.
+            filters = [{'id': lzma.FILTER_LZMA1,
+                        'preset': 9 | lzma.PRESET_EXTREME,
+                        'dict_size': max(len(data), 4096)}]
+            obj = lzma.compress(data, format=lzma.FORMAT_ALONE,
+                                filters=filters)
+        else:
+            obj = data
+        if len(obj) >= len(data):
+            # Tiny entries do not compress, avoid decompressing them.
+            codec, obj = PYZ_CODEC_STORE, data
 
         # First compress then encrypt.
         if self.cipher:
             obj = self.cipher.encrypt(obj)
+        return codec, obj
 
-        self.toc.append((name, (typ, self.lib.tell(), len(obj))))
+    def _add_compressed(self, name, typ, codec, obj, digest):
+        pos = self.lib.tell()
+        self.toc.append((name, (typ, pos, len(obj), codec)))
+        self._index[name] = (typ, digest, self._settings, pos, len(obj), codec)
         self.lib.write(obj)
 
+    def _finalize(self):
+        try:
+            super(ZlibArchiveWriter, self)._finalize()
+        finally:
+            if self._previous is not None:
+                self._previous[1].close()
+                os.remove(self._previous[1].name)
+        self._write_index()
+
+    def _write_index(self):
+        """
+        Write the index of the archive, mapping the name of each entry to
+        its type, the digest of its data, the settings it was compressed
+        with and its position, length and codec.
+        """
+        size = os.path.getsize(self._archive_path)
+        save_file_atomically(self._archive_path + '.index', marshal.dumps(
+            (self.INDEX_VERSION, size, self._index)))
+
     def update_headers(self, tocpos):
         """
         add level
@@ -319,7 +483,12 @@ class CArchiveWriter(ArchiveWriter):
     _cookie_format = '!8siiii64s'
     _cookie_size = struct.calcsize(_cookie_format)
 
-    def __init__(self, archive_path, logical_toc, pylib_name):
+    # Type codes of the entries which are aligned if the archive has an
+    # alignment: binaries and the PYZ.
+    ALIGNED_TYPES = ('b', 'z')
+
+    def __init__(self, archive_path, logical_toc, pylib_name,
+                 extraction_cache=False, alignment=0):
         """
         Constructor.
 
@@ -327,8 +496,19 @@ class CArchiveWriter(ArchiveWriter):
         start        is the seekposition within PATH.
         len          is the length of the CArchive (if 0, then read till EOF).
         pylib_name   name of Python DLL which bootloader will use.
+        extraction_cache
+                     add the runtime option 'pyi-extraction-cache' with the
+                     hash of the archive's contents, which the bootloader
+                     uses to name the directory it extracts the files into.
+        alignment    if not 0, the data of uncompressed entries with a type
+                     code in ALIGNED_TYPES start at a multiple of alignment
+                     bytes from the start of the archive. So they can be
+                     mapped into memory directly if the archive itself is
+                     aligned in the executable.
         """
         self._pylib_name = pylib_name
+        self._extraction_cache = extraction_cache
+        self._alignment = alignment
 
         # A CArchive created from scratch starts at 0, no leading bootloader.
         super(CArchiveWriter, self).__init__(archive_path, logical_toc)
@@ -372,10 +552,7 @@ class CArchiveWriter(ArchiveWriter):
                 # If it's a source code file, compile it to a code object and marshall
                 # the object so it can be unmarshalled by the bootloader.
 
-                code = get_code_object(nm, pathnm)
-                code = strip_paths_in_code(code)
-
-                code_data = marshal.dumps(code)
+                code_data = get_code_data(nm, pathnm)
                 ulen = len(code_data)
             else:
                 fh = open(pathnm, 'rb')
@@ -384,6 +561,9 @@ class CArchiveWriter(ArchiveWriter):
             print("Cannot find ('%s', '%s', %s, '%s')" % (nm, pathnm, flag, typcd))
             raise
 
+        if self._alignment and flag == 0 and typcd in self.ALIGNED_TYPES:
+            padding = -self.lib.tell() % self._alignment
+            self.lib.write(b'\0' * padding)
         where = self.lib.tell()
         assert flag in range(3)
         if not fh and not code_data:
@@ -438,6 +618,9 @@ class CArchiveWriter(ArchiveWriter):
         CArchives can be opened from the end - the cookie points
         back to the start.
         """
+        if self._extraction_cache:
+            self.toc.add(tocpos, 0, 0, 0, 'o', 'pyi-extraction-cache %s'
+                         % self._content_hash(tocpos))
         tocstr = self.toc.tobinary()
         self.lib.write(tocstr)
         toclen = len(tocstr)
@@ -451,3 +634,19 @@ class CArchiveWriter(ArchiveWriter):
                              tocpos, toclen, pyvers,
                              self._pylib_name.encode('ascii'))
         self.lib.write(cookie)
+
+    def _content_hash(self, tocpos):
+        """
+        Return the hash of the entries written so far and of the table of
+        contents describing them.
+        """
+        digest = hashlib.sha256(self.toc.tobinary())
+        self.lib.flush()
+        with open(self.lib.name, 'rb') as f:
+            while f.tell() < tocpos:
+                buf = f.read(min(1024 * 1024, tocpos - f.tell()))
+                if not buf:
+                    break
+                digest.update(buf)
+        # The bootloader uses the hash in a directory name.
+        return digest.hexdigest()[:32]
@@ -23,9 +23,10 @@ from operator import itemgetter
 from PyInstaller import HOMEPATH, PLATFORM
 from PyInstaller.archive.writers import ZlibArchiveWriter, CArchiveWriter
 from PyInstaller.building.utils import _check_guts_toc, add_suffix_to_extensions, \
-    checkCache, strip_paths_in_code, get_code_object, \
-    _make_clean_directory
-from PyInstaller.compat import is_win, is_darwin, is_linux, is_cygwin, exec_command_all
+    checkCacheAll, get_code_data, _make_clean_directory, \
+    collect_file, sync_collect_directory, COLLECT_LINK_MODES
+from PyInstaller.compat import is_win, is_darwin, is_linux, is_cygwin, is_py2, \
+    exec_command_all
 from PyInstaller.depend import bindepend
 from PyInstaller.depend.analysis import get_bootstrap_modules
 from PyInstaller.depend.utils import is_path_to_egg
@@ -63,6 +64,10 @@ class PYZ(Target):
                 name will do fine.
             cipher
                 The block cipher that will be used to encrypt Python bytecode.
+            compression
+                How to compress the modules: 'zlib' (default), 'lzma' for
+                the smallest archive (Python 3 only) or 'store' for the
+                fastest imports.
 
         """
 
@@ -70,6 +75,13 @@ class PYZ(Target):
         Target.__init__(self)
         name = kwargs.get('name', None)
         cipher = kwargs.get('cipher', None)
+        self.compression = kwargs.get('compression', 'zlib')
+        if self.compression not in ZlibArchiveWriter.CODECS:
+            raise ValueError('Unknown PYZ compression %r, use one of %s'
+                             % (self.compression,
+                                ', '.join(sorted(ZlibArchiveWriter.CODECS))))
+        if self.compression == 'lzma' and is_py2:
+            raise ValueError('lzma compression requires Python 3')
         self.toc = TOC()
         # If available, use code objects directly from ModuleGraph to
         # speed up PyInstaller.
@@ -92,6 +104,13 @@ class PYZ(Target):
             # Insert the key as the first module in the list. The key module contains
             # just variables and does not depend on other modules.
             self.dependencies.insert(0, key_file)
+        if self.compression == 'lzma':
+            # The bootstrap modules need '_lzma' to decompress the modules.
+            import _lzma
+            if hasattr(_lzma, '__file__'):
+                self.dependencies.extend(bindepend.Dependencies(
+                    [('_lzma', os.path.abspath(_lzma.__file__), 'EXTENSION')],
+                    jobs=CONF.get('jobs', 1)))
         # Compile the top-level modules so that they end up in the CArchive and can be
         # imported by the bootstrap script.
         self.dependencies = misc.compile_py_files(self.dependencies, CONF['workpath'])
@@ -100,6 +119,7 @@ class PYZ(Target):
     _GUTS = (# input parameters
             ('name', _check_guts_eq),
             ('toc', _check_guts_toc),  # todo: pyc=1
+            ('compression', _check_guts_eq),
             # no calculated/analysed values
             )
 
@@ -112,25 +132,26 @@ class PYZ(Target):
         logger.info("Building PYZ (ZlibArchive) %s", self.name)
         # Do not bundle PyInstaller bootstrap modules into PYZ archive.
         toc = self.toc - self.dependencies
+        # Marshalled code objects with leading parts of paths removed.
+        code_data = {}
         for entry in toc[:]:
-            if not entry[0] in self.code_dict and entry[2] == 'PYMODULE':
-                # For some reason the code-object, modulegraph created
-                # is not available. Recreate it
-                try:
-                    self.code_dict[entry[0]] = get_code_object(entry[0], entry[1])
-                except SyntaxError:
-                    # Exclude the module in case this is code meant for a newer Python version.
-                    toc.remove(entry)
+            if entry[2] != 'PYMODULE':
+                continue
+            # If the code-object modulegraph created is not available for
+            # some reason, get_code_data() recreates it.
+            try:
+                code_data[entry[0]] = get_code_data(
+                    entry[0], entry[1], self.code_dict.get(entry[0]))
+            except SyntaxError:
+                # Exclude the module in case this is code meant for a newer Python version.
+                toc.remove(entry)
         # sort content alphabetically to support reproducible builds
         toc.sort()
 
-        # Remove leading parts of paths in code objects
-        self.code_dict = {
-            key: strip_paths_in_code(code)
-            for key, code in self.code_dict.items()
-        }
-
-        pyz = ZlibArchiveWriter(self.name, toc, code_dict=self.code_dict, cipher=self.cipher)
+        from ..config import CONF
+        pyz = ZlibArchiveWriter(self.name, toc, code_dict=code_data,
+                                cipher=self.cipher, jobs=CONF.get('jobs', 1),
+                                compression=self.compression)
         logger.info("Building PYZ (ZlibArchive) %s completed successfully.",
                     self.name)
 
@@ -154,7 +175,8 @@ class PKG(Target):
                  'DEPENDENCY': 'd'}
 
     def __init__(self, toc, name=None, cdict=None, exclude_binaries=0,
-                 strip_binaries=False, upx_binaries=False, upx_exclude=None):
+                 strip_binaries=False, upx_binaries=False, upx_exclude=None,
+                 compression='zlib', extraction_cache=False, alignment=0):
         """
         toc
                 A TOC (Table of Contents)
@@ -171,7 +193,25 @@ class PKG(Target):
         strip_binaries
                 If True, use 'strip' command to reduce the size of binary files.
         upx_binaries
+        compression
+                Used for the default `cdict`: 'zlib' compresses the entries,
+                'store' leaves them uncompressed for a faster startup. The
+                bootloader only supports these two.
+        extraction_cache
+                If True, the bootloader extracts the files in onefile mode
+                into a directory named after the hash of the PKG's contents,
+                keeps it on exit and reuses it on later runs. Not supported
+                on Windows, nor for PKGs with dependencies on other
+                executables (multipackage).
+        alignment
+                If not 0, binaries and the PYZ are stored uncompressed by the
+                default `cdict` and their data start at a multiple of
+                `alignment` bytes. With a page-size alignment they can be
+                mapped into memory directly from the executable.
         """
+        if compression not in ('zlib', 'store'):
+            raise ValueError("Unknown PKG compression %r, use 'zlib' or "
+                             "'store'" % (compression,))
         Target.__init__(self)
         self.toc = toc
         self.cdict = cdict
@@ -182,15 +222,25 @@ class PKG(Target):
         self.strip_binaries = strip_binaries
         self.upx_binaries = upx_binaries
         self.upx_exclude = upx_exclude or []
+        self.extraction_cache = extraction_cache
+        self.alignment = alignment
+        if self.exclude_binaries:
+            # Forward the extension modules needed by the bootstrap modules
+            # of the PYZ to the container, too.
+            self.dependencies = TOC([entry for entry in toc
+                                     if entry[2] == 'EXTENSION'])
         # This dict tells PyInstaller what items embedded in the executable should
         # be compressed.
         if self.cdict is None:
-            self.cdict = {'EXTENSION': COMPRESSED,
-                          'DATA': COMPRESSED,
-                          'BINARY': COMPRESSED,
-                          'EXECUTABLE': COMPRESSED,
-                          'PYSOURCE': COMPRESSED,
-                          'PYMODULE': COMPRESSED,
+            flag = UNCOMPRESSED if compression == 'store' else COMPRESSED
+            # Aligned binaries are to be mapped, so they are not compressed.
+            binflag = UNCOMPRESSED if alignment else flag
+            self.cdict = {'EXTENSION': binflag,
+                          'DATA': flag,
+                          'BINARY': binflag,
+                          'EXECUTABLE': binflag,
+                          'PYSOURCE': flag,
+                          'PYMODULE': flag,
                           # Do not compress PYZ as a whole. Single modules are
                           # compressed when creating PYZ archive.
                           'PYZ': UNCOMPRESSED}
@@ -203,7 +253,9 @@ class PKG(Target):
             ('exclude_binaries', _check_guts_eq),
             ('strip_binaries', _check_guts_eq),
             ('upx_binaries', _check_guts_eq),
-            ('upx_exclude', _check_guts_eq)
+            ('upx_exclude', _check_guts_eq),
+            ('extraction_cache', _check_guts_eq),
+            ('alignment', _check_guts_eq),
             # no calculated/analysed values
             )
 
@@ -221,6 +273,12 @@ class PKG(Target):
         seenFnms = {}
         seenFnms_typ = {}
         toc = add_suffix_to_extensions(self.toc)
+        if not self.exclude_binaries:
+            # Strip and compress all binaries in parallel first.
+            get_cached = checkCacheAll(
+                toc, ('BINARY', 'EXTENSION', 'DEPENDENCY'),
+                strip=self.strip_binaries, upx=self.upx_binaries,
+                upx_exclude=self.upx_exclude)
         # 'inm'  - relative filename inside a CArchive
         # 'fnm'  - absolute filename as it is on the file system.
         for inm, fnm, typ in toc:
@@ -254,11 +312,7 @@ class PKG(Target):
                     seenFnms[fnm] = inm
                     seenFnms_typ[fnm] = typ
 
-                    fnm = checkCache(fnm, strip=self.strip_binaries,
-                                     upx=self.upx_binaries,
-                                     upx_exclude=self.upx_exclude,
-                                     dist_nm=inm)
-
+                    fnm = get_cached(inm, fnm)
                     mytoc.append((inm, fnm, self.cdict.get(typ, 0),
                                   self.xformdict.get(typ, 'b')))
             elif typ == 'OPTION':
@@ -278,8 +332,17 @@ class PKG(Target):
         mytoc.sort(key=itemgetter(3, 0))
         # Do *not* sort modules and scripts, as their order is important.
         # TODO: Think about having all modules first and then all scripts.
+        # Only onefile executables extract files.
+        extraction_cache = self.extraction_cache and not self.exclude_binaries
+        if extraction_cache and any(typcd == 'd' for _, _, _, typcd in mytoc):
+            # The files in other executables are not covered by the hash.
+            logger.warning('Extraction cache is not supported with '
+                           'dependencies on other executables, ignoring it.')
+            extraction_cache = False
         archive = CArchiveWriter(self.name, srctoc + mytoc,
-                                 pylib_name=pylib_name)
+                                 pylib_name=pylib_name,
+                                 extraction_cache=extraction_cache,
+                                 alignment=self.alignment)
 
         for item in trash:
             os.remove(item)
@@ -334,6 +397,27 @@ class EXE(Target):
             uac_uiaccess
                 Windows only. Setting to True allows an elevated application to
                 work with Remote Desktop
+            compression
+                Forwarded to the PKG the EXE builds: 'zlib' (default) or
+                'store'.
+            extraction_cache
+                Onefile mode only, not on Windows. If True, the bootloader
+                extracts the files into a directory named after the hash of
+                the bundled files, and reuses it on later runs instead of
+                extracting into a new temporary directory each time.
+            alignment
+                Forwarded to the PKG the EXE builds. If not 0, the binaries
+                and the PYZ are stored uncompressed at multiples of
+                `alignment` bytes, counted from the start of the executable
+                if the PKG is appended to it. Use a multiple of the page size
+                to let them be mapped into memory; 65536 suits all common
+                systems (page sizes of 4 to 64 KiB, and the 64 KiB allocation
+                granularity of Windows).
+            memfd_binaries
+                Onefile mode on Linux only. If True, the bootloader extracts
+                the binaries into anonymous memory files (memfd) and only
+                links them from the temporary directory. Ignored with
+                `extraction_cache`.
         """
         from ..config import CONF
         Target.__init__(self)
@@ -352,9 +436,11 @@ class EXE(Target):
         self.strip = kwargs.get('strip', False)
         self.upx_exclude = kwargs.get("upx_exclude", [])
         self.runtime_tmpdir = kwargs.get('runtime_tmpdir', None)
+        self.memfd_binaries = kwargs.get('memfd_binaries', False)
         # If ``append_pkg`` is false, the archive will not be appended
         # to the exe, but copied beside it.
         self.append_pkg = kwargs.get('append_pkg', True)
+        self.alignment = kwargs.get('alignment', 0)
 
         # On Windows allows the exe to request admin privileges.
         self.uac_admin = kwargs.get('uac_admin', False)
@@ -406,6 +492,10 @@ class EXE(Target):
             # no value; presence means "true"
             self.toc.append(("pyi-bootloader-ignore-signals", "", "OPTION"))
 
+        if self.memfd_binaries:
+            # no value; presence means "true"
+            self.toc.append(("pyi-memfd-binaries", "", "OPTION"))
+
         if is_win:
             filename = os.path.join(CONF['workpath'], CONF['specnm'] + ".exe.manifest")
             self.manifest = winmanifest.create_manifest(filename, self.manifest,
@@ -430,7 +520,10 @@ class EXE(Target):
         self.pkg = PKG(self.toc, cdict=kwargs.get('cdict', None),
                        exclude_binaries=self.exclude_binaries,
                        strip_binaries=self.strip, upx_binaries=self.upx,
-                       upx_exclude=self.upx_exclude
+                       upx_exclude=self.upx_exclude,
+                       compression=kwargs.get('compression', 'zlib'),
+                       extraction_cache=kwargs.get('extraction_cache', False),
+                       alignment=self.alignment
                        )
         self.dependencies = self.pkg.dependencies
 
@@ -452,6 +545,7 @@ class EXE(Target):
             ('uac_uiaccess', _check_guts_eq),
             ('manifest', _check_guts_eq),
             ('append_pkg', _check_guts_eq),
+            ('alignment', _check_guts_eq),
             # for the case the directory ius shared between platforms:
             ('pkgname', _check_guts_eq),
             ('toc', _check_guts_eq),
@@ -610,6 +704,16 @@ class EXE(Target):
                 logger.debug(stderr)
             if retcode != 0:
                 raise SystemError("objcopy Failure: %s" % stderr)
+            if self.alignment:
+                # Sections can only be aligned once they exist.
+                retcode, stdout, stderr = exec_command_all(
+                    'objcopy', '--set-section-alignment',
+                    'pydata=%d' % self.alignment, self.name)
+                if retcode != 0:
+                    # Older binutils do not know this option.
+                    logger.warning("Could not align the archive in EXE %s, "
+                                   "objcopy returned %i: %s",
+                                   self.name, retcode, stderr)
         else:
             # Fall back to just append on end of file
             logger.info("Appending archive to EXE %s", self.name)
@@ -617,6 +721,10 @@ class EXE(Target):
                 # write the bootloader data
                 with open(exe, 'rb') as infh:
                     shutil.copyfileobj(infh, outf, length=64*1024)
+                if self.alignment:
+                    # The bootloader finds the start of the archive from
+                    # its end, so padding before it does no harm.
+                    outf.write(b'\0' * (-outf.tell() % self.alignment))
                 # write the archive data
                 with open(self.pkg.name, 'rb') as infh:
                     shutil.copyfileobj(infh, outf, length=64*1024)
@@ -655,9 +763,28 @@ class COLLECT(Target):
 
                 name
                     The name of the directory to be built.
+                link_mode
+                    How to put the files into the directory: 'copy'
+                    (default), 'hardlink' to create hard links to the
+                    cached or original files, or 'reflink' to create
+                    copy-on-write clones of them (Linux only). Files which
+                    can not be linked are copied. Defaults to the option
+                    ``--link-mode``.
+                incremental
+                    If true, update the directory built before instead of
+                    recreating it: only changed files are collected again
+                    and files no longer needed are removed. Defaults to the
+                    option ``--incremental-collect``.
         """
         from ..config import CONF
         Target.__init__(self)
+        self.link_mode = kws.get('link_mode') or \
+            CONF.get('link_mode') or 'copy'
+        if self.link_mode not in COLLECT_LINK_MODES:
+            raise ValueError('Unknown COLLECT link mode %r, use one of %s'
+                             % (self.link_mode, ', '.join(COLLECT_LINK_MODES)))
+        self.incremental = kws.get('incremental',
+                                   CONF.get('incremental_collect', False))
         self.strip_binaries = kws.get('strip', False)
         self.upx_exclude = kws.get("upx_exclude", [])
         self.console = True
@@ -700,14 +827,18 @@ class COLLECT(Target):
     )
 
     def _check_guts(self, data, last_build):
-        # COLLECT always needs to be executed, since it will clean the output
-        # directory anyway to make sure there is no existing cruft accumulating
+        # COLLECT always needs to be executed, since it will clean (or sync)
+        # the output directory anyway to make sure there is no existing cruft
+        # accumulating
         return 1
 
     def assemble(self):
-        _make_clean_directory(self.name)
         logger.info("Building COLLECT %s", self.tocbasename)
         toc = add_suffix_to_extensions(self.toc)
+        get_cached = checkCacheAll(toc, strip=self.strip_binaries,
+                                   upx=self.upx_binaries,
+                                   upx_exclude=self.upx_exclude)
+        files = []
         for inm, fnm, typ in toc:
             if not os.path.exists(fnm) or not os.path.isfile(fnm) and is_path_to_egg(fnm):
                 # file is contained within python egg, it is added with the egg
@@ -716,28 +847,45 @@ class COLLECT(Target):
                or os.path.isabs(inm):
                 raise SystemExit('Security-Alert: try to store file outside '
                                  'of dist-directory. Aborting. %r' % inm)
+            if typ in ('EXTENSION', 'BINARY'):
+                fnm = get_cached(inm, fnm)
+            if typ != 'DEPENDENCY':
+                files.append((inm, fnm, typ in ('EXTENSION', 'BINARY')))
+        manifest = os.path.splitext(self.tocfilename)[0] + '.manifest'
+        if self.incremental:
+            collected, unchanged, removed = sync_collect_directory(
+                self.name, files, manifest, self.link_mode)
+            logger.info("Collected %d files, %d unchanged, removed %d files",
+                        collected, unchanged, removed)
+            logger.info("Building COLLECT %s completed successfully.",
+                        self.tocbasename)
+            return
+        # The manifest of an incremental build is outdated now.
+        if os.path.exists(manifest):
+            os.remove(manifest)
+        _make_clean_directory(self.name)
+        # Number of files collected by each link mode.
+        link_modes = {}
+        for inm, fnm, executable in files:
             tofnm = os.path.join(self.name, inm)
             todir = os.path.dirname(tofnm)
             if not os.path.exists(todir):
                 os.makedirs(todir)
-            if typ in ('EXTENSION', 'BINARY'):
-                fnm = checkCache(fnm, strip=self.strip_binaries,
-                                 upx=self.upx_binaries,
-                                 upx_exclude=self.upx_exclude,
-                                 dist_nm=inm)
-            if typ != 'DEPENDENCY':
-                if os.path.isdir(fnm):
-                    # beacuse shutil.copy2() is the default copy function
-                    # for shutil.copytree, this will also copy file metadata
-                    shutil.copytree(fnm, tofnm)
-                else:
-                    shutil.copy(fnm, tofnm)
+            if os.path.isdir(fnm):
+                # beacuse shutil.copy2() is the default copy function
+                # for shutil.copytree, this will also copy file metadata
+                shutil.copytree(fnm, tofnm)
                 try:
                     shutil.copystat(fnm, tofnm)
                 except OSError:
                     logger.warning("failed to copy flags of %s", fnm)
-            if typ in ('EXTENSION', 'BINARY'):
-                os.chmod(tofnm, 0o755)
+            else:
+                used = collect_file(fnm, tofnm, self.link_mode,
+                                    executable=executable)
+                link_modes[used] = link_modes.get(used, 0) + 1
+        if self.link_mode != 'copy':
+            logger.info("Collected files by link mode: %s", ', '.join(
+                '%s %d' % item for item in sorted(link_modes.items())))
         logger.info("Building COLLECT %s completed successfully.",
                     self.tocbasename)
 
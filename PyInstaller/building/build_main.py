@@ -18,6 +18,7 @@ NOTE: All global variables, classes and imported modules create API
 
 
 import glob
+import multiprocessing
 import os
 import pprint
 import shutil
@@ -32,7 +33,9 @@ from ..utils.misc import absnormpath, compile_py_files
 from ..compat import is_py2, is_win, PYDYLIB_NAMES, \
     open_file, text_type, unicode_writer
 from ..depend import bindepend
-from ..depend.analysis import initialize_modgraph
+from ..depend.analysis import initialize_modgraph, shutdown_scan_pool, \
+    get_import_signature, ModuleScanCache
+from . import timing
 from .api import PYZ, EXE, COLLECT, MERGE
 from .datastruct import TOC, Target, Tree, _check_guts_eq
 from .osx import BUNDLE
@@ -238,6 +241,7 @@ class Analysis(Target):
         self.win_private_assemblies = win_private_assemblies
         self._python_version = sys.version
         self.noarchive = noarchive
+        self._import_signatures = {}
 
         self.__postinit__()
 
@@ -268,8 +272,9 @@ class Analysis(Target):
 
             #calculated/analysed values
             ('_python_version', _check_guts_eq),
-            ('scripts', _check_guts_toc_mtime),
-            ('pure', lambda *args: _check_guts_toc_mtime(*args, **{'pyc': 1})),
+            # Changed scripts and pure modules are checked by `_check_guts()`.
+            ('scripts', None),
+            ('pure', None),
             ('binaries', _check_guts_toc_mtime),
             ('zipfiles', _check_guts_toc_mtime),
             ('zipped_data', None),  # TODO check this, too
@@ -278,6 +283,8 @@ class Analysis(Target):
 
             # cached binding redirects - loaded into CONF for PYZ/COLLECT to find.
             ('binding_redirects', None),
+            # digests of the imports of all scripts and pure modules.
+            ('_import_signatures', None),
             )
 
     def _extend_pathex(self, spec_pathex, scripts):
@@ -309,13 +316,12 @@ class Analysis(Target):
     def _check_guts(self, data, last_build):
         if Target._check_guts(self, data, last_build):
             return True
-        for fnm in self.inputs:
-            if mtime(fnm) > last_build:
-                logger.info("Building because %s changed", fnm)
-                return True
+        if self._check_guts_sources(data, last_build):
+            return True
         # Now we know that none of the input parameters and none of
-        # the input files has changed. So take the values calculated
-        # resp. analysed in the last run and store them in `self`.
+        # the input files has changed in a way affecting the analysis. So
+        # take the values calculated resp. analysed in the last run and
+        # store them in `self`.
         self.scripts = TOC(data['scripts'])
         self.pure = TOC(data['pure'])
         self.binaries = TOC(data['binaries'])
@@ -326,9 +332,46 @@ class Analysis(Target):
         # Store previously found binding redirects in CONF for later use by PKG/COLLECT
         from ..config import CONF
         self.binding_redirects = CONF['binding_redirects'] = data['binding_redirects']
+        self._import_signatures = data['_import_signatures']
 
         return False
 
+    def _check_guts_sources(self, data, last_build):
+        """
+        Check whether the scripts or pure Python modules analysed in the last
+        run changed in a way requiring to analyse them again.
+
+        Most edits do not touch any import statement, so the module graph
+        and thus all of the analysed values stay the same. Only the code of
+        the changed modules needs to be compiled again, which is done by
+        PYZ resp. PKG anyway. Thus a changed source file requires a rebuild
+        only if its imports changed.
+        """
+        from ..config import CONF
+        changed = [fnm for fnm in self.inputs if mtime(fnm) > last_build]
+        for nm, fnm, typ in data['scripts'] + data['pure']:
+            if mtime(fnm) > last_build:
+                changed.append(fnm)
+            elif fnm.endswith(('.pyc', '.pyo')) and mtime(fnm[:-1]) > last_build:
+                # The source of a module collected as bytecode changed.
+                logger.info("Building because %s changed", fnm[:-1])
+                return True
+        if not changed:
+            return False
+
+        cache_dir = CONF.get('cachedir')
+        scan_cache = ModuleScanCache(cache_dir) if cache_dir else None
+        signatures = data['_import_signatures']
+        for fnm in sorted(set(changed)):
+            signature = signatures.get(fnm)
+            if (signature is None or
+                    get_import_signature(fnm, scan_cache) != signature):
+                logger.info("Building because %s changed", fnm)
+                return True
+            logger.info("Imports and names of %s did not change, reusing "
+                        "analysis", fnm)
+        return False
+
     def assemble(self):
         """
         This method is the MAIN method for finding all necessary files to be bundled.
@@ -337,8 +380,9 @@ class Analysis(Target):
 
         for m in self.excludes:
             logger.debug("Excluding module '%s'" % m)
-        self.graph = initialize_modgraph(
-            excludes=self.excludes, user_hook_dirs=self.hookspath)
+        with timing.phase('graph init'):
+            self.graph = initialize_modgraph(
+                excludes=self.excludes, user_hook_dirs=self.hookspath)
 
         # TODO Find a better place where to put 'base_library.zip' and when to created it.
         # For Python 3 it is necessary to create file 'base_library.zip'
@@ -347,7 +391,8 @@ class Analysis(Target):
         # those modules as "built-in".
         if not is_py2:
             libzip_filename = os.path.join(CONF['workpath'], 'base_library.zip')
-            create_py3_base_library(libzip_filename, graph=self.graph)
+            with timing.phase('base_library.zip'):
+                create_py3_base_library(libzip_filename, graph=self.graph)
             # Bundle base_library.zip as data file.
             # Data format of TOC item:   ('relative_path_in_dist_dir', 'absolute_path_on_disk', 'DATA')
             self.datas.append((os.path.basename(libzip_filename), libzip_filename, 'DATA'))
@@ -388,9 +433,10 @@ class Analysis(Target):
         # This also ensures that its assembly depencies under Windows get added to the
         # built .exe's manifest. Python 2.7 extension modules have no assembly
         # dependencies, and rely on the app-global dependencies set by the .exe.
-        self.binaries.extend(bindepend.Dependencies([('', python, '')],
-                                                    manifest=depmanifest,
-                                                    redirects=self.binding_redirects)[1:])
+        with timing.phase('python deps'):
+            self.binaries.extend(bindepend.Dependencies(
+                [('', python, '')], manifest=depmanifest,
+                redirects=self.binding_redirects)[1:])
         if is_win:
             depmanifest.writeprettyxml()
 
@@ -409,15 +455,17 @@ class Analysis(Target):
 
         # Assume that if the script does not exist, Modulegraph will raise error.
         # Save the graph nodes of each in sequence.
-        for script in self.inputs:
-            logger.info("Analyzing %s", script)
-            priority_scripts.append(self.graph.run_script(script))
+        with timing.phase('script analysis'):
+            for script in self.inputs:
+                logger.info("Analyzing %s", script)
+                priority_scripts.append(self.graph.run_script(script))
 
-        # Analyze the script's hidden imports (named on the command line)
-        self.graph.add_hiddenimports(self.hiddenimports)
+            # Analyze the script's hidden imports (named on the command line)
+            self.graph.add_hiddenimports(self.hiddenimports)
 
         ### Post-graph hooks.
-        self.graph.process_post_graph_hooks()
+        with timing.phase('hooks'):
+            self.graph.process_post_graph_hooks()
 
         # Update 'binaries' TOC and 'datas' TOC.
         deps_proc = DependencyProcessor(self.graph,
@@ -431,17 +479,21 @@ class Analysis(Target):
         ### Look for dlls that are imported by Python 'ctypes' module.
         # First get code objects of all modules that import 'ctypes'.
         logger.info('Looking for ctypes DLLs')
-        ctypes_code_objs = self.graph.get_co_using_ctypes()  # dict like:  {'module1': code_obj, 'module2': code_obj}
-        for name, co in ctypes_code_objs.items():
-            # Get dlls that might be needed by ctypes.
-            logger.debug('Scanning %s for shared libraries or dlls', name)
-            ctypes_binaries = scan_code_for_ctypes(co)
-            self.binaries.extend(set(ctypes_binaries))
+        with timing.phase('ctypes scan'):
+            ctypes_code_objs = self.graph.get_co_using_ctypes()  # dict like:  {'module1': code_obj, 'module2': code_obj}
+            for name, co in ctypes_code_objs.items():
+                # Get dlls that might be needed by ctypes.
+                logger.debug('Scanning %s for shared libraries or dlls', name)
+                ctypes_binaries = scan_code_for_ctypes(co)
+                self.binaries.extend(set(ctypes_binaries))
 
         # Analyze run-time hooks.
         # Run-time hooks has to be executed before user scripts. Add them
         # to the beginning of 'priority_scripts'.
-        priority_scripts = self.graph.analyze_runtime_hooks(self.custom_runtime_hooks) + priority_scripts
+        with timing.phase('runtime hooks analysis'):
+            priority_scripts = self.graph.analyze_runtime_hooks(self.custom_runtime_hooks) + priority_scripts
+        # The graph is complete, no more modules need to be scanned.
+        shutdown_scan_pool()
 
         # 'priority_scripts' is now a list of the graph nodes of custom runtime
         # hooks, then regular runtime hooks, then the PyI loader scripts.
@@ -460,12 +512,22 @@ class Analysis(Target):
         # And get references to module code objects constructed by ModuleGraph
         # to avoid writing .pyc/pyo files to hdd.
         self.pure._code_cache = self.graph.get_code_objects()
+        # Remember the imports of all source files, so the next run does not
+        # need to analyse them again if only other parts of them changed.
+        self._import_signatures = {}
+        for name, path, typecode in self.scripts + self.pure:
+            if path.endswith('.py'):
+                signature = get_import_signature(path, self.graph._scan_cache)
+                if signature is not None:
+                    self._import_signatures[path] = signature
 
         # Add remaining binary dependencies - analyze Python C-extensions and what
         # DLLs they depend on.
         logger.info('Looking for dynamic libraries')
-        self.binaries.extend(bindepend.Dependencies(self.binaries,
-                                                    redirects=self.binding_redirects))
+        with timing.phase('binary deps'):
+            self.binaries.extend(bindepend.Dependencies(self.binaries,
+                                                        redirects=self.binding_redirects,
+                                                        jobs=CONF.get('jobs', 1)))
 
         ### Include zipped Python eggs.
         logger.info('Looking for eggs')
@@ -613,6 +675,7 @@ def build(spec, distpath, workpath, clean_build):
     CONF['warnfile'] = os.path.join(workpath, 'warn-%s.txt' % CONF['specnm'])
     CONF['dot-file'] = os.path.join(workpath, 'graph-%s.dot' % CONF['specnm'])
     CONF['xref-file'] = os.path.join(workpath, 'xref-%s.html' % CONF['specnm'])
+    CONF['timing-file'] = os.path.join(workpath, 'timing-%s.json' % CONF['specnm'])
 
     # Clean PyInstaller cache (CONF['cachedir']) and temporary files (workpath)
     # to be able start a clean build.
@@ -676,7 +739,9 @@ def build(spec, distpath, workpath, clean_build):
         # ... then let Python determine the encoding, since ``compile`` accepts
         # byte strings.
         code = compile(f.read(), spec, 'exec')
+    timing.reset()
     exec(code, spec_namespace)
+    timing.write_report(CONF['timing-file'])
 
 def __add_options(parser):
     parser.add_argument("--distpath", metavar="DIR",
@@ -700,12 +765,34 @@ def __add_options(parser):
                         default=False,
                         help='Clean PyInstaller cache and remove temporary '
                         'files before building.')
+    parser.add_argument('--jobs', type=int, default=1, metavar='N',
+                        help='Number of parallel jobs to use for the build, '
+                        'e.g. for analysing modules and stripping or '
+                        'compressing binaries. Use 0 for the number of '
+                        'CPUs. (default: 1)')
+    parser.add_argument('--link-mode', choices=('copy', 'hardlink', 'reflink'),
+                        default=None,
+                        help='How to put the files into the output directory '
+                        'in onedir mode: copy them, create hard links to the '
+                        'cached or original files, or create copy-on-write '
+                        'clones of them (Linux only). Files which can not '
+                        'be linked are copied. Hard linked files must not be '
+                        'modified. (default: copy)')
+    parser.add_argument('--incremental-collect', action='store_true',
+                        default=False,
+                        help='In onedir mode, update the output directory '
+                        'built before instead of recreating it: only copy '
+                        'files which changed and remove files no longer '
+                        'needed. Unchanged files keep their timestamps.')
 
 
 def main(pyi_config, specfile, noconfirm, ascii=False, **kw):
 
     from ..config import CONF
     CONF['noconfirm'] = noconfirm
+    CONF['jobs'] = kw.get('jobs', 1) or multiprocessing.cpu_count()
+    CONF['link_mode'] = kw.get('link_mode')
+    CONF['incremental_collect'] = kw.get('incremental_collect', False)
 
     # Some modules are included if they are detected at build-time or
     # if a command-line argument is specified. (e.g. --ascii)
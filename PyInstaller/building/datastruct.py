@@ -13,6 +13,7 @@ import os
 from PyInstaller.utils import misc
 from PyInstaller.utils.misc import load_py_data_struct, save_py_data_struct
 from .. import log as logging
+from . import timing
 from .utils import _check_guts_eq
 
 logger = logging.getLogger(__name__)
@@ -155,7 +156,8 @@ class Target(object):
                 data = dict(zip((g[0] for g in self._GUTS), data))
         # assemble if previous data was not found or is outdated
         if not data or self._check_guts(data, last_build):
-            self.assemble()
+            with timing.phase(self.__class__.__name__):
+                self.assemble()
             self._save_guts()
 
     _GUTS = []
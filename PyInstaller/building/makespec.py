@@ -166,6 +166,18 @@ def __add_options(parser):
                    'This option can be used multiple times.')
     g.add_argument('--key', dest='key',
                    help='The key used to encrypt Python bytecode.')
+    g.add_argument('--compression', dest='compression', default='zlib',
+                   choices=('zlib', 'lzma', 'store'),
+                   help='How to compress the bundled Python modules: '
+                   '"zlib" (default), "lzma" for the smallest executable '
+                   '(Python 3 only), or "store" for the fastest startup. '
+                   'With "store" the other files in the executable are '
+                   'left uncompressed, too.')
+    g.add_argument('--align-binaries', action='store_true', default=False,
+                   help='Store the binaries and the PYZ in the executable '
+                   'uncompressed and aligned to 64 KiB, the largest common '
+                   'page size, so they can be mapped into memory directly. '
+                   'This makes the executable larger.')
 
     g = parser.add_argument_group('How to generate')
     g.add_argument("-d", "--debug",
@@ -301,6 +313,18 @@ def __add_options(parser):
                         "The ``_MEIxxxxxx``-folder will be created here. "
                         "Please use this option only if you know what you "
                         "are doing.")
+    g.add_argument("--extraction-cache", action="store_true", default=False,
+                   help="In `onefile`-mode, extract the libraries and "
+                        "support files into a ``_MEIC``-folder named after "
+                        "their hash, keep it on exit and reuse it on later "
+                        "runs instead of extracting them on every run. "
+                        "Not supported on Windows.")
+    g.add_argument("--memfd-binaries", action="store_true", default=False,
+                   help="(Linux only) In `onefile`-mode, extract shared "
+                        "libraries and extension modules into anonymous "
+                        "memory files (memfd) instead of writing them into "
+                        "the ``_MEIxxxxxx``-folder, which then only holds "
+                        "links to them and the data files.")
     g.add_argument("--bootloader-ignore-signals", action="store_true",
                    default=False,
                    help=("Tell the bootloader to ignore signals rather "
@@ -314,12 +338,13 @@ def __add_options(parser):
 def main(scripts, name=None, onefile=None,
          console=True, debug=None, strip=False, noupx=False, upx_exclude=None,
          runtime_tmpdir=None, pathex=None, version_file=None, specpath=None,
-         bootloader_ignore_signals=False,
+         bootloader_ignore_signals=False, extraction_cache=False,
+         memfd_binaries=False,
          datas=None, binaries=None, icon_file=None, manifest=None, resources=None, bundle_identifier=None,
          hiddenimports=None, hookspath=None, key=None, runtime_hooks=None,
          excludes=None, uac_admin=False, uac_uiaccess=False,
          win_no_prefer_redirects=False, win_private_assemblies=False,
-         **kwargs):
+         compression='zlib', align_binaries=False, **kwargs):
     # If appname is not specified - use the basename of the main script as name.
     if name is None:
         name = os.path.splitext(os.path.basename(scripts[0]))[0]
@@ -377,6 +402,15 @@ def main(scripts, name=None, onefile=None,
     if resources:
         resources = list(map(quote_win_filepath, resources))
         exe_options = "%s, resources=%s" % (exe_options, repr(resources))
+    if compression == 'store':
+        # The bootloader only supports zlib, so 'lzma' applies to the PYZ only.
+        exe_options = "%s, compression='store'" % exe_options
+    if extraction_cache and onefile:
+        exe_options = "%s, extraction_cache=True" % exe_options
+    if memfd_binaries and onefile:
+        exe_options = "%s, memfd_binaries=True" % exe_options
+    if align_binaries:
+        exe_options = "%s, alignment=65536" % exe_options
 
     hiddenimports = hiddenimports or []
     upx_exclude = upx_exclude or []
@@ -432,6 +466,7 @@ def main(scripts, name=None, onefile=None,
         'runtime_tmpdir': runtime_tmpdir,
         'exe_options': exe_options,
         'cipher_init': cipher_init,
+        'compression': compression,
         # Directory with additional custom import hooks.
         'hookspath': hookspath,
         # List with custom runtime hook files.
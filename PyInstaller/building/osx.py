@@ -13,7 +13,8 @@ import shutil
 from ..compat import is_darwin, FileExistsError
 from .api import EXE, COLLECT
 from .datastruct import Target, TOC, logger
-from .utils import _check_path_overlap, _rmtree, add_suffix_to_extensions, checkCache
+from .utils import _check_path_overlap, _rmtree, add_suffix_to_extensions, \
+    checkCacheAll
 
 
 
@@ -169,13 +170,14 @@ class BUNDLE(Target):
 
         links = []
         toc = add_suffix_to_extensions(self.toc)
+        get_cached = checkCacheAll(toc, strip=self.strip, upx=self.upx,
+                                   upx_exclude=self.upx_exclude)
         for inm, fnm, typ in toc:
             # Copy files from cache. This ensures that are used files with relative
             # paths to dynamic library dependencies (@executable_path)
             base_path = inm.split('/', 1)[0]
             if typ in ('EXTENSION', 'BINARY'):
-                fnm = checkCache(fnm, strip=self.strip, upx=self.upx,
-                                 upx_exclude=self.upx_exclude, dist_nm=inm)
+                fnm = get_cached(inm, fnm)
             # Add most data files to a list for symlinking later.
             if typ == 'DATA' and base_path not in ('base_library.zip', 'PySide2', 'PyQt5'):
                 links.append((inm, fnm))
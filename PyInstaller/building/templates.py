@@ -28,6 +28,7 @@ a = Analysis(%(scripts)s,
              cipher=block_cipher,
              noarchive=%(noarchive)s)
 pyz = PYZ(a.pure, a.zipped_data,
+             compression=%(compression)r,
              cipher=block_cipher)
 exe = EXE(pyz,
           a.scripts,
@@ -61,6 +62,7 @@ a = Analysis(%(scripts)s,
              cipher=block_cipher,
              noarchive=%(noarchive)s)
 pyz = PYZ(a.pure, a.zipped_data,
+             compression=%(compression)r,
              cipher=block_cipher)
 exe = EXE(pyz,
           a.scripts,
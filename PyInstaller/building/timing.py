@@ -0,0 +1,136 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2019, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+"""
+Record the time and memory spent in the phases of a build and in the hooks.
+"""
+
+import contextlib
+import json
+import os
+import time
+
+from ..compat import is_darwin, is_win
+from .. import log as logging
+
+logger = logging.getLogger(__name__)
+
+
+# Phases recorded since the last reset(), in the order they ended.
+_phases = []
+# Names of the phases currently running, outermost first.
+_running = []
+# Hooks run since the last reset().
+_hooks = []
+
+
+def reset():
+    """
+    Forget all phases and hooks recorded, e.g. at the start of a build.
+    """
+    del _phases[:]
+    del _running[:]
+    del _hooks[:]
+
+
+def _cpu_time():
+    # User and system time of this process and its finished child processes
+    # (e.g. the workers scanning modules).
+    times = os.times()
+    return sum(times[:4])
+
+
+def peak_rss():
+    """
+    Return the peak resident set size of this process in bytes, or None if
+    not available.
+    """
+    if is_win:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD),
+                        ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t),
+                        ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t),
+                        ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(
+                process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Mac OS X reports bytes, other platforms kilobytes.
+    return maxrss if is_darwin else maxrss * 1024
+
+
+@contextlib.contextmanager
+def phase(name):
+    """
+    Context manager recording the wall and CPU time of a phase of the build
+    and the peak RSS at its end.
+
+    Phases may be nested, the name of a nested phase is prefixed by the
+    names of the phases containing it, e.g. 'Analysis/hooks'.
+    """
+    _running.append(name)
+    name = '/'.join(_running)
+    wall, cpu = time.time(), _cpu_time()
+    try:
+        yield
+    finally:
+        _running.pop()
+        _phases.append({'name': name,
+                        'wall': time.time() - wall,
+                        'cpu': _cpu_time() - cpu,
+                        'peak_rss': peak_rss()})
+
+
+def add_hook(module_name, filename, seconds):
+    """
+    Record the time spent running the hook `filename` for `module_name`.
+    """
+    _hooks.append({'module': module_name, 'hook': filename,
+                   'wall': seconds})
+
+
+def write_report(filename):
+    """
+    Write the phases and hooks recorded as JSON to `filename` and log a
+    summary.
+    """
+    hooks = sorted(_hooks, key=lambda hook: -hook['wall'])
+    with open(filename, 'w') as fp:
+        json.dump({'phases': _phases, 'hooks': hooks}, fp, indent=1)
+
+    logger.info('Build phases (wall / CPU seconds, peak RSS):')
+    for entry in _phases:
+        rss = entry['peak_rss']
+        logger.info('  %-32s %8.2f %8.2f %10s', entry['name'], entry['wall'],
+                    entry['cpu'],
+                    '-' if rss is None else '%.1f MB' % (rss / 1048576.0))
+    if hooks:
+        logger.info('Slowest hooks (wall seconds):')
+        for hook in hooks[:10]:
+            logger.info('  %-32s %8.2f', hook['module'], hook['wall'])
+    logger.info('Build timing written to %s', filename)
@@ -12,8 +12,10 @@
 #--- functions for checking guts ---
 # NOTE: By GUTS it is meant intermediate files and data structures that
 # PyInstaller creates for bundling files and creating final executable.
+import binascii
 import glob
 import hashlib
+import marshal
 import os
 import os.path
 import pkgutil
@@ -22,6 +24,8 @@ import shutil
 import sys
 
 import struct
+import threading
+from multiprocessing.pool import ThreadPool
 
 from PyInstaller.config import CONF
 from .. import compat
@@ -30,7 +34,6 @@ from ..compat import is_darwin, is_win, EXTENSION_SUFFIXES, \
 from ..depend import dylib
 from ..depend.bindepend import match_binding_redirect
 from ..utils import misc
-from ..utils.misc import load_py_data_struct, save_py_data_struct
 from .. import log as logging
 
 if is_win:
@@ -180,28 +183,13 @@ def checkCache(fnm, strip=False, upx=False, upx_exclude=None, dist_nm=None):
     upx = (upx and (is_win or is_cygwin) and
            os.path.normcase(os.path.basename(fnm)) not in upx_exclude)
 
-    # Load cache index
     # Make cachedir per Python major/minor version.
     # This allows parallel building of executables with different
     # Python versions as one user.
     pyver = ('py%d%s') % (sys.version_info[0], sys.version_info[1])
     arch = platform.architecture()[0]
     cachedir = os.path.join(CONF['cachedir'], 'bincache%d%d_%s_%s' % (strip, upx, pyver, arch))
-    if not os.path.exists(cachedir):
-        os.makedirs(cachedir)
-    cacheindexfn = os.path.join(cachedir, "index.dat")
-    if os.path.exists(cacheindexfn):
-        try:
-            cache_index = load_py_data_struct(cacheindexfn)
-        except Exception as e:
-            # tell the user they may want to fix their cache
-            # .. however, don't delete it for them; if it keeps getting
-            #    corrupted, we'll never find out
-            logger.warn("pyinstaller bincache may be corrupted; "
-                        "use pyinstaller --clean to fix")
-            raise
-    else:
-        cache_index = {}
+    cache_index = _get_bincache_index(cachedir)
 
     # Verify if the file we're looking for is present in the cache.
     # Use the dist_mn if given to avoid different extension modules
@@ -215,19 +203,102 @@ def checkCache(fnm, strip=False, upx=False, upx_exclude=None, dist_nm=None):
     # needs to be reprocessed. The redirects may change if the versions of dependent
     # manifests change due to system updates.
     redirects = CONF.get('binding_redirects', [])
-    digest = cacheDigest(fnm, redirects)
+    fingerprint = cacheFingerprint(fnm, redirects)
     cachedfile = os.path.join(cachedir, basenm)
-    cmd = None
-    if basenm in cache_index:
-        if digest != cache_index[basenm]:
-            os.remove(cachedfile)
+    # Several threads may be processing binaries, see `checkCacheAll()`.
+    with _bincache_locks.setdefault(cachedfile, threading.Lock()):
+        entry = cache_index.get(basenm)
+        if entry is not None and entry[1] == fingerprint:
+            # The file did not change since it was cached, no need to hash it.
+            digest = entry[0]
         else:
-            # On Mac OS X we need relative paths to dll dependencies
-            # starting with @executable_path
-            if is_darwin:
-                dylib.mac_set_relative_dylib_deps(cachedfile, dist_nm)
-            return cachedfile
+            digest = cacheDigest(fnm, redirects)
+        if entry is None or entry[0] != digest or not os.path.exists(cachedfile):
+            # The file is processed as a temporary file, which replaces the
+            # cached file when done. So other builds sharing the cache never
+            # see a partially processed file.
+            fd, tmpfile = misc.make_temp_file_for(cachedfile)
+            os.close(fd)
+            try:
+                _process_cached_file(fnm, tmpfile, cachedfile, strip, upx,
+                                     redirects, dist_nm)
+                misc.replace_file(tmpfile, cachedfile)
+            except:
+                if os.path.exists(tmpfile):
+                    os.remove(tmpfile)
+                raise
 
+            # update cache index
+            cache_index.set(basenm, digest, fingerprint)
+        elif entry[1] != fingerprint:
+            # Skip hashing the file next time.
+            cache_index.set(basenm, digest, fingerprint)
+
+        # On Mac OS X we need relative paths to dll dependencies
+        # starting with @executable_path
+        if is_darwin:
+            dylib.mac_set_relative_dylib_deps(cachedfile, dist_nm)
+    return cachedfile
+
+
+def checkCacheAll(toc, typecodes=('BINARY', 'EXTENSION'), strip=False,
+                  upx=False, upx_exclude=None, jobs=None):
+    """
+    Run `checkCache()` for many binaries at once, using `jobs` threads
+    (default: ``CONF['jobs']``).
+
+    Stripping and compressing binaries are independent of each other and
+    take a lot of time, so this is to be done before collecting the
+    binaries one by one.
+
+    `toc` is a TOC of tuples ``(dist_nm, fnm, typ)``. The existing files
+    with a type code in `typecodes` are processed, but only the first
+    binary of each `dist_nm`, as later ones would replace it in the cache.
+    Return a function ``get_cached(dist_nm, fnm)``, which returns the cached
+    file of a binary of the TOC, and runs `checkCache()` for binaries which
+    were not processed here.
+    """
+    if jobs is None:
+        jobs = CONF.get('jobs', 1)
+    binaries = []
+    seen = set()
+    for dist_nm, fnm, typ in toc:
+        if (typ in typecodes and dist_nm not in seen and
+                os.path.isfile(fnm)):
+            seen.add(dist_nm)
+            binaries.append((dist_nm, fnm))
+
+    def check_cache(binary):
+        dist_nm, fnm = binary
+        return fnm, checkCache(fnm, strip=strip, upx=upx,
+                               upx_exclude=upx_exclude, dist_nm=dist_nm)
+
+    if jobs > 1 and len(binaries) > 1:
+        pool = ThreadPool(min(jobs, len(binaries)))
+        try:
+            results = pool.map(check_cache, binaries)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [check_cache(binary) for binary in binaries]
+    cached = dict(zip((dist_nm for dist_nm, fnm in binaries), results))
+
+    def get_cached(dist_nm, fnm):
+        if cached.get(dist_nm, (None,))[0] == fnm:
+            return cached[dist_nm][1]
+        return check_cache((dist_nm, fnm))[1]
+    return get_cached
+
+
+def _process_cached_file(fnm, tmpfile, cachedfile, strip, upx, redirects,
+                         dist_nm=None):
+    """
+    Process file `fnm` for the cache as requested by `checkCache()`, writing
+    the result into `tmpfile`, which is to become `cachedfile`.
+    """
+    from ..config import CONF
+    cmd = None
 
     # Optionally change manifest and its deps to private assemblies
     if fnm.lower().endswith(".manifest"):
@@ -246,12 +317,14 @@ def checkCache(fnm, strip=False, upx=False, upx_exclude=None, dist_nm=None):
 
         applyRedirects(manifest, redirects)
 
-        manifest.writeprettyxml(cachedfile)
-        return cachedfile
+        manifest.writeprettyxml(tmpfile)
+        return
 
     if upx:
         if strip:
-            fnm = checkCache(fnm, strip=True, upx=False)
+            # Key the stripped file by `dist_nm` as well, so binaries sharing
+            # the basename do not replace each other while being copied.
+            fnm = checkCache(fnm, strip=True, upx=False, dist_nm=dist_nm)
         bestopt = "--best"
         # FIXME: Linux builds of UPX do not seem to contain LZMA (they assert out)
         # A better configure-time check is due.
@@ -261,7 +334,7 @@ def checkCache(fnm, strip=False, upx=False, upx_exclude=None, dist_nm=None):
         upx_executable = "upx"
         if CONF.get('upx_dir'):
             upx_executable = os.path.join(CONF['upx_dir'], upx_executable)
-        cmd = [upx_executable, bestopt, "-q", cachedfile]
+        cmd = [upx_executable, bestopt, "-q", tmpfile]
     else:
         if strip:
             strip_options = []
@@ -270,37 +343,35 @@ def checkCache(fnm, strip=False, upx=False, upx_exclude=None, dist_nm=None):
                 # under Mac OSX.
                 # -S = strip only debug symbols.
                 strip_options = ["-S"]
-            cmd = ["strip"] + strip_options + [cachedfile]
+            cmd = ["strip"] + strip_options + [tmpfile]
 
-    if not os.path.exists(os.path.dirname(cachedfile)):
-        os.makedirs(os.path.dirname(cachedfile))
     # There are known some issues with 'shutil.copy2' on Mac OS X 10.11
     # with copying st_flags. Issue #1650.
     # 'shutil.copy' copies also permission bits and it should be sufficient for
     # PyInstalle purposes.
-    shutil.copy(fnm, cachedfile)
+    shutil.copy(fnm, tmpfile)
     # TODO find out if this is still necessary when no longer using shutil.copy2()
     if hasattr(os, 'chflags'):
         # Some libraries on FreeBSD have immunable flag (libthr.so.3, for example)
         # If flags still remains, os.chmod will failed with:
         # OSError: [Errno 1] Operation not permitted.
         try:
-            os.chflags(cachedfile, 0)
+            os.chflags(tmpfile, 0)
         except OSError:
             pass
-    os.chmod(cachedfile, 0o755)
+    os.chmod(tmpfile, 0o755)
 
     if os.path.splitext(fnm.lower())[1] in (".pyd", ".dll"):
         # When shared assemblies are bundled into the app, they may optionally be
         # changed into private assemblies.
         try:
-            res = winmanifest.GetManifestResources(os.path.abspath(cachedfile))
+            res = winmanifest.GetManifestResources(os.path.abspath(tmpfile))
         except winresource.pywintypes.error as e:
             if e.args[0] == winresource.ERROR_BAD_EXE_FORMAT:
                 # Not a win32 PE file
                 pass
             else:
-                logger.error(os.path.abspath(cachedfile))
+                logger.error(os.path.abspath(tmpfile))
                 raise
         else:
             if winmanifest.RT_MANIFEST in res and len(res[winmanifest.RT_MANIFEST]):
@@ -317,7 +388,7 @@ def checkCache(fnm, strip=False, upx=False, upx_exclude=None, dist_nm=None):
                         except Exception as exc:
                             logger.error("Cannot parse manifest resource %s, "
                                          "%s", name, language)
-                            logger.error("From file %s", cachedfile, exc_info=1)
+                            logger.error("From file %s", tmpfile, exc_info=1)
                         else:
                             # optionally change manifest to private assembly
                             private = CONF.get('win_private_assemblies', False)
@@ -335,11 +406,11 @@ def checkCache(fnm, strip=False, upx=False, upx_exclude=None, dist_nm=None):
                             redirecting = applyRedirects(manifest, redirects)
                             if redirecting or private:
                                 try:
-                                    manifest.update_resources(os.path.abspath(cachedfile),
+                                    manifest.update_resources(os.path.abspath(tmpfile),
                                                               [name],
                                                               [language])
                                 except Exception as e:
-                                    logger.error(os.path.abspath(cachedfile))
+                                    logger.error(os.path.abspath(tmpfile))
                                     raise
 
     if cmd:
@@ -347,21 +418,15 @@ def checkCache(fnm, strip=False, upx=False, upx_exclude=None, dist_nm=None):
         # terminates if execution fails
         compat.exec_command(*cmd)
 
-    # update cache index
-    cache_index[basenm] = digest
-    save_py_data_struct(cacheindexfn, cache_index)
 
-    # On Mac OS X we need relative paths to dll dependencies
-    # starting with @executable_path
-    if is_darwin:
-        dylib.mac_set_relative_dylib_deps(cachedfile, dist_nm)
-    return cachedfile
+# BLAKE2 is faster than MD5 on 64-bit platforms, but requires Python 3.6.
+_cache_hash = getattr(hashlib, 'blake2b', hashlib.md5)
 
 
 def cacheDigest(fnm, redirects):
-    hasher = hashlib.md5()
+    hasher = _cache_hash()
     with open(fnm, "rb") as f:
-        for chunk in iter(lambda: f.read(16 * 1024), b""):
+        for chunk in iter(lambda: f.read(64 * 1024), b""):
             hasher.update(chunk)
     if redirects:
         redirects = str(redirects)
@@ -372,6 +437,89 @@ def cacheDigest(fnm, redirects):
     return digest
 
 
+def cacheFingerprint(fnm, redirects):
+    """
+    Return a fingerprint of file `fnm` based on its path and status.
+
+    If the fingerprint did not change, the contents did not change either,
+    so `cacheDigest()` need not read the whole file again.
+    """
+    st = os.stat(fnm)
+    # Python 2 has no nanosecond timestamps.
+    mtime = getattr(st, 'st_mtime_ns', st.st_mtime)
+    return (os.path.abspath(fnm), st.st_size, mtime, st.st_ino,
+            str(redirects))
+
+
+class _BinaryCacheIndex(object):
+    """
+    Index of a bincache directory, mapping the names of the cached files to
+    the digests and fingerprints of the files they were made from, see
+    `cacheDigest()` and `cacheFingerprint()`.
+
+    Each entry is stored in a file of its own in the subdirectory `index`,
+    replaced atomically when updated. So several builds may share the
+    cache directory without losing or corrupting entries. Entries are read
+    at most once per build.
+    """
+    def __init__(self, cachedir):
+        self.indexdir = os.path.join(cachedir, 'index')
+        self._entries = {}
+
+    def _entry_filename(self, basenm):
+        key = basenm
+        if not isinstance(key, bytes):
+            key = key.encode('utf-8')
+        return os.path.join(self.indexdir, hashlib.md5(key).hexdigest())
+
+    def get(self, basenm):
+        """
+        Return the tuple ``(digest, fingerprint)`` of the file cached as
+        `basenm` _or_ `None`.
+        """
+        try:
+            return self._entries[basenm]
+        except KeyError:
+            pass
+        entry = None
+        try:
+            with open(self._entry_filename(basenm), 'rb') as f:
+                entry_basenm, digest, fingerprint = marshal.load(f)
+            if entry_basenm == basenm:
+                entry = (bytearray(digest), fingerprint)
+        except (IOError, OSError):
+            # Not cached yet.
+            pass
+        except (EOFError, ValueError, TypeError):
+            logger.warn("pyinstaller bincache entry for %s is corrupted, "
+                        "processing the file again", basenm)
+        self._entries[basenm] = entry
+        return entry
+
+    def set(self, basenm, digest, fingerprint):
+        """
+        Record `digest` and `fingerprint` for the file cached as `basenm`.
+        """
+        misc.save_file_atomically(
+            self._entry_filename(basenm),
+            marshal.dumps((basenm, bytes(digest), fingerprint)))
+        self._entries[basenm] = (digest, fingerprint)
+
+
+# Indexes of the bincache directories used by this build.
+_bincache_indexes = {}
+# Locks serializing the processing of each cached file.
+_bincache_locks = {}
+
+
+def _get_bincache_index(cachedir):
+    try:
+        return _bincache_indexes[cachedir]
+    except KeyError:
+        return _bincache_indexes.setdefault(cachedir,
+                                            _BinaryCacheIndex(cachedir))
+
+
 def _check_path_overlap(path):
     """
     Check that path does not overlap with WORKPATH or SPECPATH (i.e.
@@ -436,6 +584,216 @@ def _rmtree(path):
         raise SystemExit('User aborted')
 
 
+# ioctl() request to share the contents of a file with another file on Linux
+# (copy-on-write), see ioctl_ficlone(2).
+_FICLONE = 0x40049409
+
+COLLECT_LINK_MODES = ('copy', 'hardlink', 'reflink')
+
+
+def _reflink_file(src, dst):
+    import fcntl
+    with open(src, 'rb') as fsrc:
+        with open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+
+
+def collect_file(src, dst, link_mode='copy', executable=False):
+    """
+    Create file `dst` with the contents and metadata of file `src`.
+
+    `link_mode` is one of `COLLECT_LINK_MODES`:
+
+    copy
+        Copy the file.
+    hardlink
+        Create a hard link to `src`. So `dst` must not be modified, as this
+        would modify `src`, too.
+    reflink
+        Create a copy-on-write clone of `src` (Linux only), which shares the
+        data blocks with `src` until modified.
+
+    If the file can not be linked (e.g. `src` is on another file system)
+    it is copied. If `executable` is true, `dst` is made executable; a
+    file not executable already is never hard linked for this.
+
+    Return the link mode used.
+    """
+    if link_mode == 'hardlink' and hasattr(os, 'link') and \
+            (not executable or os.stat(src).st_mode & 0o777 == 0o755):
+        try:
+            os.link(src, dst)
+            return 'hardlink'
+        except OSError:
+            pass
+    used = 'copy'
+    if link_mode == 'reflink' and compat.is_linux:
+        try:
+            _reflink_file(src, dst)
+            used = 'reflink'
+        except (IOError, OSError):
+            # Not supported by the file system or not on the same one.
+            if os.path.exists(dst):
+                os.remove(dst)
+    if used == 'copy':
+        shutil.copyfile(src, dst)
+    try:
+        shutil.copystat(src, dst)
+    except OSError:
+        logger.warning("failed to copy flags of %s", src)
+    if executable:
+        os.chmod(dst, 0o755)
+    return used
+
+
+# Increase this when changing the format of the COLLECT manifest.
+_COLLECT_MANIFEST_VERSION = 1
+
+
+def _load_collect_manifest(filename, path):
+    try:
+        with open(filename, 'rb') as f:
+            version, manifest_path, entries = marshal.load(f)
+        if not isinstance(entries, dict):
+            raise ValueError('Invalid COLLECT manifest')
+    except (IOError, OSError):
+        return None
+    except (EOFError, ValueError, TypeError):
+        logger.debug('Ignoring corrupted COLLECT manifest %s', filename)
+        return None
+    if version != _COLLECT_MANIFEST_VERSION or manifest_path != path:
+        return None
+    return entries
+
+
+def _expand_collected_files(files):
+    # Return the files to collect by their normalized names, with
+    # directories expanded to the files they contain, and the names of the
+    # (possibly empty) directories collected.
+    wanted = {}
+    dirs = set()
+    for name, src, executable in files:
+        name = os.path.normpath(name)
+        if not os.path.isdir(src):
+            wanted[name] = (src, executable)
+            continue
+        for dirpath, dirnames, filenames in os.walk(src, followlinks=True):
+            dirname = os.path.normpath(
+                os.path.join(name, os.path.relpath(dirpath, src)))
+            dirs.add(dirname)
+            for fn in filenames:
+                wanted[os.path.join(dirname, fn)] = (
+                    os.path.join(dirpath, fn), executable)
+    return wanted, dirs
+
+
+def _collected_file_unchanged(entry, src, st, dst, executable, link_mode):
+    (entry_src, size, mtime, digest, entry_executable, entry_link_mode,
+     dst_size, dst_mtime) = entry
+    if (entry_src, entry_executable, entry_link_mode) != \
+            (src, executable, link_mode):
+        return False
+    try:
+        dst_st = os.stat(dst)
+    except OSError:
+        return False
+    if (dst_st.st_size, dst_st.st_mtime) != (dst_size, dst_mtime):
+        # Modified or replaced after it was collected.
+        return False
+    if (st.st_size, st.st_mtime) == (size, mtime):
+        return True
+    # E.g. a cached binary processed again, resulting in the same file.
+    return st.st_size == size and bytes(cacheDigest(src, None)) == digest
+
+
+def sync_collect_directory(path, files, manifest_filename, link_mode='copy'):
+    """
+    Make directory `path` contain exactly the passed files, touching only
+    the files which changed since the last call.
+
+    `files` is a list of ``(name, src, executable)`` tuples, where `name`
+    is the path relative to `path` to collect file or directory `src` as.
+    Files are collected by `collect_file()` using `link_mode`.
+
+    Size, mtime and digest of each file collected are recorded in the
+    manifest `manifest_filename`. A file is collected again only if its
+    source or its mode changed, or the collected file was modified.
+    Unchanged files keep their timestamps, so tools like rsync transfer
+    only the files which actually changed. All other files and
+    directories in `path` are removed. Without a valid manifest, `path` is
+    cleaned like by `_make_clean_directory()` first.
+
+    Return the tuple ``(collected, unchanged, removed)`` of the numbers of
+    files.
+    """
+    manifest = _load_collect_manifest(manifest_filename, path)
+    if manifest is None:
+        _make_clean_directory(path)
+        manifest = {}
+    elif _check_path_overlap(path) and not os.path.isdir(path):
+        if os.path.lexists(path):
+            os.remove(path)
+        os.makedirs(path)
+    wanted, dirs = _expand_collected_files(files)
+
+    # Remove stale files first, as they may be in the way of directories
+    # to create.
+    keep = set(os.path.normcase(name) for name in wanted)
+    keep_dirs = set()
+    for name in list(wanted) + list(dirs):
+        name = os.path.dirname(os.path.normcase(name))
+        while name and name not in keep_dirs:
+            keep_dirs.add(name)
+            name = os.path.dirname(name)
+    keep_dirs.update(os.path.normcase(name) for name in dirs)
+    removed = 0
+    for dirpath, dirnames, filenames in os.walk(path, topdown=False):
+        for fn in filenames + [d for d in dirnames
+                               if os.path.islink(os.path.join(dirpath, d))]:
+            fnm = os.path.join(dirpath, fn)
+            if os.path.normcase(os.path.relpath(fnm, path)) not in keep:
+                os.remove(fnm)
+                removed += 1
+        name = os.path.normcase(os.path.relpath(dirpath, path))
+        if dirpath != path and name not in keep_dirs and \
+                not os.listdir(dirpath):
+            os.rmdir(dirpath)
+    for name in sorted(dirs):
+        dirname = os.path.join(path, name)
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+
+    new_manifest = {}
+    collected = 0
+    for name in sorted(wanted):
+        src, executable = wanted[name]
+        dst = os.path.join(path, name)
+        st = os.stat(src)
+        entry = manifest.get(name)
+        if entry is not None and _collected_file_unchanged(
+                entry, src, st, dst, executable, link_mode):
+            # Record the current mtime, so it is not hashed again.
+            new_manifest[name] = entry[:1] + (st.st_size, st.st_mtime) + \
+                entry[3:]
+            continue
+        if os.path.isdir(dst) and not os.path.islink(dst):
+            shutil.rmtree(dst)
+        elif os.path.lexists(dst):
+            os.remove(dst)
+        todir = os.path.dirname(dst)
+        if not os.path.isdir(todir):
+            os.makedirs(todir)
+        collect_file(src, dst, link_mode, executable)
+        collected += 1
+        dst_st = os.stat(dst)
+        new_manifest[name] = (src, st.st_size, st.st_mtime,
+                              bytes(cacheDigest(src, None)), executable,
+                              link_mode, dst_st.st_size, dst_st.st_mtime)
+    misc.save_file_atomically(manifest_filename, marshal.dumps(
+        (_COLLECT_MANIFEST_VERSION, path, new_manifest)))
+    return collected, len(wanted) - collected, removed
+
+
 # TODO Refactor to prohibit empty target directories. As the docstring
 #below documents, this function currently permits the second item of each
 #2-tuple in "hook.datas" to be the empty string, in which case the target
@@ -632,21 +990,28 @@ def get_code_object(modname, filename):
         raise
 
 
-def strip_paths_in_code(co, new_filename=None):
-
+def _get_stripped_filename(filename):
+    """
+    Return `filename` relative to the search path entry it is located in,
+    or `None` if it is in none.
+    """
     # Paths to remove from filenames embedded in code objects
     replace_paths = sys.path + CONF['pathex']
     # Make sure paths end with os.sep
     replace_paths = [os.path.join(f, '') for f in replace_paths]
 
-    if new_filename is None:
-        original_filename = os.path.normpath(co.co_filename)
-        for f in replace_paths:
-            if original_filename.startswith(f):
-                new_filename = original_filename[len(f):]
-                break
+    filename = os.path.normpath(filename)
+    for f in replace_paths:
+        if filename.startswith(f):
+            return filename[len(f):]
+    return None
 
-        else:
+
+def strip_paths_in_code(co, new_filename=None):
+
+    if new_filename is None:
+        new_filename = _get_stripped_filename(co.co_filename)
+        if new_filename is None:
             return co
 
     code_func = type(co)
@@ -674,6 +1039,87 @@ def strip_paths_in_code(co, new_filename=None):
                      co.co_freevars, co.co_cellvars)
 
 
+class CodeCache(object):
+    """
+    Persistent cache of the marshalled, path-stripped code objects of
+    modules, as stored in the PYZ and CArchive.
+
+    Entries are addressed by the digest of the source code and the filename
+    the code objects are stripped to, the cache is versioned by the bytecode
+    magic number and the optimization level. Thus unchanged modules are
+    neither compiled nor stripped again, wherever they are located.
+    """
+    # Increase this when changing the format of the cached entries.
+    VERSION = 1
+
+    def __init__(self, cachedir):
+        magic = binascii.hexlify(compat.BYTECODE_MAGIC).decode('ascii')
+        self.cachedir = os.path.join(
+            cachedir, 'code%d_%s_o%d' % (self.VERSION, magic,
+                                         sys.flags.optimize))
+
+    def _entry_filename(self, digest, filename):
+        key = filename
+        if not isinstance(key, bytes):
+            key = key.encode('utf-8')
+        return os.path.join(self.cachedir,
+                            hashlib.md5(digest + b'\0' + key).hexdigest())
+
+    def get(self, digest, filename):
+        """
+        Return the code data of the source with `digest` stripped to
+        `filename` _or_ `None`.
+        """
+        try:
+            with open(self._entry_filename(digest, filename), 'rb') as f:
+                return f.read()
+        except (IOError, OSError):
+            # Not cached yet.
+            return None
+
+    def put(self, digest, filename, data):
+        misc.save_file_atomically(self._entry_filename(digest, filename),
+                                  data)
+
+
+# Code caches of the cache directories used by this build.
+_code_caches = {}
+
+
+def get_code_data(modname, filename, code=None):
+    """
+    Return the marshalled code object of module `modname`, with the paths
+    stripped, see `strip_paths_in_code()`.
+
+    `filename` is the path of the module. `code` is its code object if
+    already compiled. The result is taken from the code cache if the module
+    has a source file not changed since it was cached.
+    """
+    cache = None
+    if CONF.get('cachedir') and filename and filename.endswith('.py'):
+        cache = _code_caches.get(CONF['cachedir'])
+        if cache is None:
+            cache = _code_caches.setdefault(CONF['cachedir'],
+                                            CodeCache(CONF['cachedir']))
+        try:
+            with open(filename, 'rb') as f:
+                digest = hashlib.md5(f.read()).digest()
+        except (IOError, OSError):
+            cache = None
+        else:
+            new_filename = _get_stripped_filename(filename) or \
+                os.path.normpath(filename)
+            data = cache.get(digest, new_filename)
+            if data is not None:
+                return data
+    if code is None:
+        code = get_code_object(modname, filename)
+    data = marshal.dumps(strip_paths_in_code(code))
+    if cache is not None:
+        cache.put(digest, new_filename, data)
+    return data
+
+
 def fake_pyc_timestamp(buf):
     """
     Reset the timestamp from a .pyc-file header to a fixed value.
@@ -635,6 +635,18 @@ def exec_python(*args, **kwargs):
     return exec_command(*cmdargs, **kwargs)
 
 
+def popen_python(*args, **kwargs):
+    """
+    Wrap starting python script in a subprocess.
+
+    Return the `subprocess.Popen` object of the process.
+    """
+    cmdargs, kwargs = __wrap_python(args, kwargs)
+    # The caller decodes the output itself.
+    kwargs.pop('encoding', None)
+    return subprocess.Popen(cmdargs, **kwargs)
+
+
 def exec_python_rc(*args, **kwargs):
     """
     Wrap running python script in a subprocess.
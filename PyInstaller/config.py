@@ -39,6 +39,9 @@ This is the list of known variables. (Please update it if necessary.)
 cachedir
 hasUPX
 hiddenimports
+incremental_collect
+jobs
+link_mode
 noconfirm
 pathex
 ui_admin
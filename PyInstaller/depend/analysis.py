@@ -34,6 +34,10 @@ about them, replacing what the old ImpTracker list could do.
 
 from __future__ import print_function
 
+import binascii
+import hashlib
+import marshal
+import multiprocessing
 import os
 import re
 import sys
@@ -47,13 +51,14 @@ from ..log import INFO, DEBUG, TRACE
 from ..building.datastruct import TOC
 from .imphook import AdditionalFilesCache, ModuleHookCache
 from .imphookapi import PreSafeImportModuleAPI, PreFindModulePathAPI
+from .utils import get_ctypes_library_names
 from ..compat import importlib_load_source, is_py2, PY3_BASE_MODULES,\
         PURE_PYTHON_MODULE_TYPES, BINARY_MODULE_TYPES, VALID_MODULE_TYPES, \
-        BAD_MODULE_TYPES, MODULE_TYPES_TO_TOC_DICT
+        BAD_MODULE_TYPES, MODULE_TYPES_TO_TOC_DICT, BYTECODE_MAGIC
 from ..lib.modulegraph.find_modules import get_implies
-from ..lib.modulegraph.modulegraph import ModuleGraph
+from ..lib.modulegraph.modulegraph import ModuleGraph, Script, scan_source
 from ..utils.hooks import collect_submodules, is_package
-from ..utils.misc import load_py_data_struct
+from ..utils.misc import load_py_data_struct, save_file_atomically
 
 logger = logging.getLogger(__name__)
 
@@ -96,15 +101,35 @@ class PyiModuleGraph(ModuleGraph):
     _base_modules: list
         Dependencies for `base_library.zip` (which remain the same for every
         executable).
+    _scan_cache : ModuleScanCache
+        Persistent cache of the results of compiling and scanning pure-Python
+        modules _or_ `None` if no cache directory was passed.
+    _jobs : int
+        Number of worker processes compiling and scanning modules in
+        parallel. If 1, all modules are scanned by this process.
+    _scan_jobs : dict
+        Dictionary mapping the absolute paths of source files submitted to
+        the worker processes to their pending results. See the
+        `_prefetch_imports()` method for details.
+    _guessed_paths : dict
+        Dictionary mapping fully-qualified module names to the source files
+        guessed to provide these modules by `_guess_source_path()`.
     """
 
     # Note: these levels are completely arbitrary and may be adjusted if needed.
     LOG_LEVEL_MAPPING = {0: INFO, 1: DEBUG, 2: TRACE, 3: TRACE, 4: TRACE}
 
-    def __init__(self, pyi_homepath, user_hook_dirs=(), excludes=(), **kwargs):
+    def __init__(self, pyi_homepath, user_hook_dirs=(), excludes=(),
+                 cache_dir=None, jobs=1, **kwargs):
         super(PyiModuleGraph, self).__init__(excludes=excludes, **kwargs)
         # Homepath to the place where is PyInstaller located.
         self._homepath = pyi_homepath
+        # Reuse module scans of previous builds and scan modules in parallel.
+        # This has to be set up before any module is imported into the graph.
+        self._scan_cache = ModuleScanCache(cache_dir) if cache_dir else None
+        self._jobs = jobs
+        self._scan_jobs = {}
+        self._guessed_paths = {}
         # modulegraph Node for the main python script that is analyzed
         # by PyInstaller.
         self._top_script_node = None
@@ -125,6 +150,8 @@ class PyiModuleGraph(ModuleGraph):
         self._top_script_node = None
         self._additional_files_cache = AdditionalFilesCache()
         self._user_hook_dirs = user_hook_dirs
+        # Drop scans submitted for modules never imported by a previous run.
+        self._scan_jobs = {}
         # Hook-specific lookup tables.
         # These need to reset when reusing cached PyiModuleGraph to avoid
         # hooks to refer to files or data from another test-case.
@@ -424,6 +451,143 @@ class PyiModuleGraph(ModuleGraph):
         return super(PyiModuleGraph, self)._find_module_path(
             fullname, module_name, search_dirs)
 
+    def _scan_source(self, fp, pathname):
+        """
+        Wrap the superclass method with the persistent module scan cache, so
+        unchanged modules are not compiled and scanned again.
+
+        See superclass method for parameter and return value descriptions.
+        """
+        job = self._scan_jobs.pop(pathname, None)
+        if job is not None:
+            try:
+                return marshal.loads(job.get())
+            except Exception as e:
+                logger.debug('Scanning %s in worker process failed: %s',
+                             pathname, e)
+
+        if self._scan_cache is None:
+            return super(PyiModuleGraph, self)._scan_source(fp, pathname)
+
+        record = self._scan_cache.get(pathname)
+        if record is None:
+            record = super(PyiModuleGraph, self)._scan_source(fp, pathname)
+            self._scan_cache.put(pathname, record)
+        return record
+
+    def _process_imports(self, source_module):
+        """
+        Wrap the superclass method to first submit all modules imported by
+        the passed module to the worker processes, if enabled.
+
+        See superclass method for parameter descriptions.
+        """
+        if self._jobs > 1 and source_module._deferred_imports:
+            self._prefetch_imports(source_module)
+        return super(PyiModuleGraph, self)._process_imports(source_module)
+
+    def _prefetch_imports(self, source_module):
+        """
+        Submit the source files of all modules (probably) imported by the
+        passed module to the worker processes for compiling and scanning.
+
+        Graph nodes are still created by this process in the usual order, one
+        import after the other. Meanwhile the workers compile and scan the
+        modules this process is about to need. `_scan_source()` then picks up
+        the results.
+
+        The import resolution done here is just a cheap guess. A wrong guess
+        merely wastes some worker time, as the module is then scanned by this
+        process as usual.
+        """
+        pool = _get_scan_pool(self._jobs)
+        for have_star, import_info, kwargs in source_module._deferred_imports:
+            target_module_partname, _, target_attr_names, level = import_info
+            for module_name in self._guess_import_names(
+                    source_module, target_module_partname, target_attr_names,
+                    level):
+                if self.findNode(module_name, create_nspkg=False) is not None:
+                    continue
+                pathname = self._guess_source_path(module_name)
+                if pathname is None or pathname in self._scan_jobs:
+                    continue
+                self._scan_jobs[pathname] = pool.apply_async(
+                    _scan_source_file, (pathname, self._scan_cache))
+
+    @staticmethod
+    def _guess_import_names(source_module, target_module_partname,
+                            target_attr_names, level):
+        """
+        List the fully-qualified names of all modules the passed import
+        statement might import, including the parent packages.
+        """
+        if level == 0 or isinstance(source_module, Script):
+            bases = ['']
+        else:
+            # Relative import: find the package this import is relative to.
+            if source_module.packagepath is not None:
+                base = source_module.identifier
+            else:
+                base = source_module.identifier.rpartition('.')[0]
+            for i in range(1, abs(level)):
+                base = base.rpartition('.')[0]
+            # Python 2 implicit relative imports may also be absolute.
+            bases = [base, ''] if level < 0 else [base]
+
+        names = []
+        for base in bases:
+            target_name = '.'.join(
+                part for part in (base, target_module_partname) if part)
+            if not target_name:
+                continue
+            parts = target_name.split('.')
+            names.extend('.'.join(parts[:i]) for i in range(1, len(parts) + 1))
+            for attr_name in target_attr_names or ():
+                names.append(target_name + '.' + attr_name)
+        return names
+
+    def _guess_source_path(self, module_name):
+        """
+        Guess the absolute path of the source file of the passed module
+        _or_ return `None` if it is not a plain source file in a directory.
+        """
+        try:
+            return self._guessed_paths[module_name]
+        except KeyError:
+            pass
+
+        pathname = None
+        parent_name, _, module_partname = module_name.rpartition('.')
+        if parent_name:
+            parent = self.findNode(parent_name, create_nspkg=False)
+            if parent is not None:
+                search_dirs = parent.packagepath or []
+            else:
+                parent_pathname = self._guess_source_path(parent_name)
+                if parent_pathname and os.path.basename(
+                        parent_pathname) == '__init__.py':
+                    search_dirs = [os.path.dirname(parent_pathname)]
+                else:
+                    search_dirs = []
+        elif module_name in sys.builtin_module_names:
+            search_dirs = []
+        else:
+            search_dirs = self.path
+
+        for search_dir in search_dirs:
+            package_init = os.path.join(search_dir, module_partname,
+                                        '__init__.py')
+            if os.path.isfile(package_init):
+                pathname = package_init
+                break
+            module_file = os.path.join(search_dir, module_partname + '.py')
+            if os.path.isfile(module_file):
+                pathname = module_file
+                break
+
+        self._guessed_paths[module_name] = pathname
+        return pathname
+
     def get_code_objects(self):
         """
         Get code objects from ModuleGraph for pure Pyhton modules. This allows
@@ -679,6 +843,172 @@ class PyiModuleGraph(ModuleGraph):
         return co_dict
 
 
+class ModuleScanCache(object):
+    """
+    Persistent cache of the results of compiling and scanning pure-Python
+    modules, see `modulegraph.scan_source()`.
+
+    Compiling and scanning every module reachable from the application
+    (including most of the standard library) dominates the runtime of the
+    analysis, although only few modules change between builds. Since the
+    result of a scan depends only on the source file, it is stored in the
+    cache directory, one file per module. An entry is valid if size and mtime
+    of the source file are unchanged or, if they differ (e.g. after a fresh
+    checkout), if the digest of the contents is unchanged.
+
+    The cache is versioned by the Python version, the bytecode magic number
+    and the optimization level, as these determine the code objects stored.
+    Search paths, excludes and hooks are not part of the key: they only
+    affect how imports are resolved, which is done anew for each build.
+    """
+    # Increase this when changing the format of the cached entries.
+    VERSION = 1
+
+    def __init__(self, cache_dir):
+        pyver = 'py%d%d' % sys.version_info[:2]
+        magic = binascii.hexlify(BYTECODE_MAGIC).decode('ascii')
+        self.cache_dir = os.path.join(
+            cache_dir, 'modgraph%d_%s_%s_o%d' % (self.VERSION, pyver, magic,
+                                                 sys.flags.optimize))
+
+    def _entry_filename(self, pathname):
+        key = pathname
+        if not isinstance(key, bytes):
+            key = key.encode('utf-8')
+        return os.path.join(self.cache_dir, hashlib.md5(key).hexdigest())
+
+    @staticmethod
+    def _digest(pathname):
+        with open(pathname, 'rb') as f:
+            return hashlib.md5(f.read()).hexdigest()
+
+    def get(self, pathname):
+        """
+        Return the cached scan of the passed source file _or_ `None` if there
+        is no valid entry.
+        """
+        try:
+            st = os.stat(pathname)
+            with open(self._entry_filename(pathname), 'rb') as f:
+                (entry_pathname, size, mtime, digest,
+                 record) = marshal.load(f)
+        except (IOError, OSError):
+            # Not cached yet or not a regular file (e.g. within an egg).
+            return None
+        except (EOFError, ValueError, TypeError):
+            logger.debug('Ignoring corrupted module cache entry for %s',
+                         pathname)
+            return None
+        if entry_pathname != pathname:
+            return None
+        if (size, mtime) == (st.st_size, st.st_mtime):
+            return record
+        # Checking the contents is still much cheaper than re-scanning.
+        if self._digest(pathname) != digest:
+            return None
+        self._save(pathname, st, digest, record)
+        return record
+
+    def put(self, pathname, record):
+        """
+        Store the scan of the passed source file.
+        """
+        try:
+            st = os.stat(pathname)
+            digest = self._digest(pathname)
+        except (IOError, OSError):
+            return
+        self._save(pathname, st, digest, record)
+
+    def _save(self, pathname, st, digest, record):
+        data = marshal.dumps((pathname, st.st_size, st.st_mtime, digest,
+                              record))
+        try:
+            save_file_atomically(self._entry_filename(pathname), data)
+        except (IOError, OSError) as e:
+            logger.debug('Cannot write module cache entry for %s: %s',
+                         pathname, e)
+
+
+def _get_scan_record(pathname, scan_cache=None):
+    """
+    Compile and scan the passed source file, unless the result is already in
+    the passed `ModuleScanCache`.
+
+    See `modulegraph.scan_source()` for the return value.
+    """
+    record = scan_cache.get(pathname) if scan_cache is not None else None
+    if record is None:
+        # Let `compile()` detect the source encoding.
+        with open(pathname, 'rb') as f:
+            record = scan_source(f.read(), pathname)
+        if scan_cache is not None:
+            scan_cache.put(pathname, record)
+    return record
+
+
+def _scan_source_file(pathname, scan_cache):
+    """
+    Compile and scan the passed source file in a worker process.
+
+    The result is returned marshalled, as code objects can not be pickled.
+    """
+    return marshal.dumps(_get_scan_record(pathname, scan_cache))
+
+
+def get_import_signature(pathname, scan_cache=None):
+    """
+    Return a digest of all import statements and module-level names in the
+    passed source file _or_ `None` if the file can not be read or compiled.
+
+    Two versions of a module with the same signature import the very same
+    modules in the very same way and define the same names (which decide on
+    missing submodules and the names star-imports provide), so they result
+    in the same module graph. For modules importing `ctypes`, the signature
+    also covers the libraries loaded via ctypes, which become binaries of
+    the analysis.
+    """
+    try:
+        valid, code, imports, global_attr_names = _get_scan_record(
+            pathname, scan_cache)
+    except (IOError, OSError):
+        return None
+    if code is None:
+        return None
+    ctypes_libraries = ()
+    if any(partname == 'ctypes' or partname.startswith('ctypes.')
+           for _, partname, _, level, _ in imports if level <= 0):
+        ctypes_libraries = get_ctypes_library_names(code)
+    # Unlike `marshal`, `repr()` does not depend on strings being interned.
+    return hashlib.md5(
+        repr((imports, global_attr_names, ctypes_libraries)).encode('utf-8')
+    ).hexdigest()
+
+
+# Pool of worker processes shared by all module graphs. It is created on first
+# use and kept alive until `shutdown_scan_pool()` is called.
+_scan_pool = None
+
+
+def _get_scan_pool(processes):
+    global _scan_pool
+    if _scan_pool is None:
+        logger.info('Scanning modules using %d worker processes', processes)
+        _scan_pool = multiprocessing.Pool(processes)
+    return _scan_pool
+
+
+def shutdown_scan_pool():
+    """
+    Terminate the worker processes scanning modules in parallel, if any.
+    """
+    global _scan_pool
+    if _scan_pool is not None:
+        _scan_pool.terminate()
+        _scan_pool.join()
+        _scan_pool = None
+
+
 _cached_module_graph_ = None
 
 def initialize_modgraph(excludes=(), user_hook_dirs=()):
@@ -704,6 +1034,7 @@ def initialize_modgraph(excludes=(), user_hook_dirs=()):
     PyiModuleGraph
         Module graph with core dependencies.
     """
+    from ..config import CONF
     # normalize parameters to ensure tuples and make camparism work
     user_hook_dirs = user_hook_dirs or ()
     excludes = excludes or ()
@@ -730,11 +1061,16 @@ def initialize_modgraph(excludes=(), user_hook_dirs=()):
         # get_implies() are hidden imports known by modulgraph.
         implies=get_implies(),
         user_hook_dirs=user_hook_dirs,
+        # Persistent cache of module scans, shared by all builds.
+        cache_dir=CONF.get('cachedir'),
+        jobs=CONF.get('jobs', 1),
         )
 
     if not _cached_module_graph_:
         # Only cache the first graph, see above for explanation.
         logger.info('Caching module dependency graph...')
+        # Pending scans of worker processes can not be copied.
+        graph._scan_jobs.clear()
         # cache a deep copy of the graph
         _cached_module_graph_ = deepcopy(graph)
         # Clear data which does not need to be copied from teh cached graph
@@ -760,7 +1096,8 @@ def get_bootstrap_modules():
     # built-in modules (linked statically) and thus does not have attribute __file__.
     # 'struct' module is required for reading Python bytecode from executable.
     # 'zlib' is required to decompress this bytecode.
-    for mod_name in ['_struct', 'zlib']:
+    # 'mmap' is used to map the PYZ archive into memory.
+    for mod_name in ['_struct', 'zlib', 'mmap']:
         mod = __import__(mod_name)  # C extension.
         if hasattr(mod, '__file__'):
             loader_mods.append((mod_name, os.path.abspath(mod.__file__), 'EXTENSION'))
@@ -12,22 +12,27 @@ Find external dependencies of binary libraries.
 """
 
 import ctypes.util
+import marshal
 import os
 import re
 import sys
+import threading
+import time
 from glob import glob
 # Required for extracting eggs.
 import zipfile
 import collections
+from multiprocessing.pool import ThreadPool
 
 from .. import compat
 from ..compat import (is_win, is_win_10, is_unix,
                       is_aix, is_solar, is_cygwin, is_hpux,
                       is_darwin, is_freebsd, is_venv, is_conda, base_prefix,
                       PYDYLIB_NAMES)
-from . import dylib, utils
+from . import dylib, elf, utils
 
 from .. import log as logging
+from ..utils.misc import save_file_atomically
 from ..utils.win32 import winutils
 
 logger = logging.getLogger(__name__)
@@ -198,7 +203,8 @@ def matchDLLArch(filename):
     return match_arch
 
 
-def Dependencies(lTOC, xtrapath=None, manifest=None, redirects=None):
+def Dependencies(lTOC, xtrapath=None, manifest=None, redirects=None,
+                 jobs=1):
     """
     Expand LTOC to include all the closure of binary dependencies.
 
@@ -212,24 +218,59 @@ def Dependencies(lTOC, xtrapath=None, manifest=None, redirects=None):
     `redirects` may be a list. Any assembly redirects found via policy files will
     be added to the list as BindingRedirect objects so they can later be used
     to modify any manifests that reference the redirected assembly.
+
+    `jobs` is the number of threads looking for the dependencies of
+    binaries in parallel. The result does not depend on it.
     """
     # Extract all necessary binary modules from Python eggs to be included
     # directly with PyInstaller.
     lTOC = _extract_from_egg(lTOC)
 
-    for nm, pth, typ in lTOC:
-        if nm.upper() in seen:
-            continue
-        logger.debug("Analyzing %s", pth)
-        seen.add(nm.upper())
-        if is_win:
-            for ftocnm, fn in getAssemblyFiles(pth, manifest, redirects):
-                lTOC.append((ftocnm, fn, 'BINARY'))
-        for lib, npth in selectImports(pth, xtrapath):
-            if lib.upper() in seen or npth.upper() in seen:
-                continue
-            seen.add(npth.upper())
-            lTOC.append((lib, npth, 'BINARY'))
+    # Load the cache before the threads start using it, so they do not
+    # wait for each other.
+    imports_cache = _get_imports_cache()
+    if imports_cache is not None:
+        imports_cache.load()
+    pool = ThreadPool(jobs) if jobs > 1 else None
+    try:
+        # Process the binaries level by level: the dependencies of all
+        # binaries of a level are looked up in parallel, then the results are
+        # merged in the order of the binaries, which makes up the next level.
+        # This results in the very same TOC as processing them one by one.
+        todo = list(lTOC)
+        while todo:
+            binaries = []
+            for nm, pth, typ in todo:
+                if nm.upper() in seen:
+                    continue
+                logger.debug("Analyzing %s", pth)
+                seen.add(nm.upper())
+                binaries.append(pth)
+
+            def select_imports(pth):
+                return selectImports(pth, xtrapath)
+            if pool is None:
+                imports = [select_imports(pth) for pth in binaries]
+            else:
+                imports = pool.map(select_imports, binaries)
+
+            todo = []
+            for pth, dependencies in zip(binaries, imports):
+                if is_win:
+                    for ftocnm, fn in getAssemblyFiles(pth, manifest, redirects):
+                        todo.append((ftocnm, fn, 'BINARY'))
+                for lib, npth in dependencies:
+                    if lib.upper() in seen or npth.upper() in seen:
+                        continue
+                    seen.add(npth.upper())
+                    todo.append((lib, npth, 'BINARY'))
+            lTOC.extend(todo)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if imports_cache is not None:
+            imports_cache.save()
 
     return lTOC
 
@@ -540,9 +581,10 @@ def selectImports(pth, xtrapath=None):
     return rv
 
 
-def _getImports_ldd(pth):
+def _getImports_ldd(pth, missing=None):
     """
-    Find the binary dependencies of PTH.
+    Find the binary dependencies of PTH. The names of dependencies which
+    can not be found are appended to list MISSING, if given.
 
     This implementation is for ldd platforms (mostly unix).
     """
@@ -603,12 +645,133 @@ def _getImports_ldd(pth):
             else:
                 logger.error('Can not find %s in path %s (needed by %s)',
                              name, lib, pth)
+                if missing is not None:
+                    missing.append(name)
     return rslt
 
 
-def _getImports_macholib(pth):
+# Dynamic sections of all ELF binaries read so far, by path.
+_elf_info_cache = {}
+
+
+def _get_elf_info(pth):
     """
-    Find the binary dependencies of PTH.
+    Return the dynamic section of ELF binary PTH, see `elf.read_dynamic_info`.
+    """
+    try:
+        return _elf_info_cache[pth]
+    except KeyError:
+        info = _elf_info_cache[pth] = elf.read_dynamic_info(pth)
+        return info
+
+
+def _get_elf_default_paths(elfclass):
+    """
+    Return the trusted directories searched by the dynamic loader last.
+    """
+    if elfclass == elf.ELFCLASS64:
+        if is_solar:
+            return ['/lib/64', '/usr/lib/64']
+        paths = ['/lib64', '/usr/lib64']
+    elif is_solar:
+        return ['/lib', '/usr/lib']
+    else:
+        paths = ['/lib32', '/usr/lib32']
+    return paths + ['/lib', '/usr/lib']
+
+
+def _resolve_elf_library(name, info, rpath, runpath):
+    """
+    Find library NAME needed by a binary with the dynamic section INFO.
+
+    Emulate the search order of the dynamic loader: the RPATH directories
+    of the binary and the binaries which loaded it (only if the binary has
+    no RUNPATH), LD_LIBRARY_PATH, the RUNPATH directories of the binary,
+    the ldconfig cache and finally the trusted default directories. Only
+    libraries of the same class and machine as the binary are considered.
+    """
+    def is_compatible(candidate):
+        try:
+            candidate_info = _get_elf_info(candidate)
+        except (IOError, OSError, ValueError):
+            return False
+        return (candidate_info.elfclass == info.elfclass and
+                candidate_info.machine == info.machine)
+
+    if '/' in name:
+        return name if is_compatible(name) else None
+
+    utils.load_ldconfig_cache()
+    ld_library_path = compat.getenv('LD_LIBRARY_PATH', '')
+    search_dirs = []
+    if not runpath:
+        search_dirs.extend(rpath)
+    search_dirs.extend(ld_library_path.replace(';', ':').split(':'))
+    search_dirs.extend(runpath)
+    candidates = [os.path.join(path, name) for path in search_dirs if path]
+    if utils.LDCONFIG_CACHE.get(name):
+        candidates.append(utils.LDCONFIG_CACHE[name])
+    candidates.extend(os.path.join(path, name)
+                      for path in _get_elf_default_paths(info.elfclass))
+    for candidate in candidates:
+        if os.path.isfile(candidate) and is_compatible(candidate):
+            return os.path.normpath(candidate)
+    return None
+
+
+def _getImports_elf(pth, missing=None):
+    """
+    Find the binary dependencies of PTH. The names of dependencies which
+    can not be found are appended to list MISSING, if given.
+
+    This implementation is for ELF platforms. Like `ldd` it resolves the
+    dependencies recursively, in the order the dynamic loader does, but it
+    reads the binaries instead of running them.
+    """
+    def search_path(paths, pth, info):
+        origin = os.path.dirname(os.path.abspath(pth))
+        expanded = (elf.expand_search_path(path, origin, info.elfclass)
+                    for path in paths)
+        return [path for path in expanded if path]
+
+    rslt = set()
+    info = _get_elf_info(pth)
+    # Libraries by name. A library is loaded only once, a binary needing a
+    # library already loaded under the same name (or soname) gets this one.
+    loaded = {}
+    if info.soname:
+        loaded[info.soname] = pth
+    # The dynamic loader processes the dependencies breadth-first. Each
+    # binary inherits the RPATH directories of the binaries which loaded it.
+    queue = collections.deque([(pth, info, [])])
+    while queue:
+        binary, info, inherited_rpath = queue.popleft()
+        runpath = search_path(info.runpath, binary, info)
+        rpath = inherited_rpath
+        if not runpath:
+            rpath = search_path(info.rpath, binary, info) + rpath
+        for name in info.needed:
+            if name in loaded:
+                continue
+            lib = _resolve_elf_library(name, info, rpath, runpath)
+            loaded[name] = lib
+            if lib is None:
+                logger.warning('Can not find %s (needed by %s)', name, binary)
+                if missing is not None:
+                    missing.append(name)
+                continue
+            rslt.add(lib)
+            lib_info = _get_elf_info(lib)
+            if lib_info.soname:
+                loaded.setdefault(lib_info.soname, lib)
+            queue.append((lib, lib_info, rpath))
+    return rslt
+
+
+def _getImports_macholib(pth, missing=None):
+    """
+    Find the binary dependencies of PTH. The names of dependencies which
+    can not be found are appended to list MISSING, if given.
 
     This implementation is for Mac OS X and uses library macholib.
     """
@@ -698,6 +861,8 @@ def _getImports_macholib(pth):
             # Log error if no existing file found.
             if not final_lib:
                 logger.error('Can not find path %s (needed by %s)', lib, pth)
+                if missing is not None:
+                    missing.append(lib)
 
         # Macholib has to be used to get absolute path to libraries.
         else:
@@ -711,13 +876,176 @@ def _getImports_macholib(pth):
                 rslt.add(lib)
             except ValueError:
                 logger.error('Can not find path %s (needed by %s)', lib, pth)
+                if missing is not None:
+                    missing.append(lib)
 
     return rslt
 
 
+class ImportsCache(object):
+    """
+    Persistent cache of the binary dependencies found by `getImports()`.
+
+    Most binaries (e.g. system or Qt libraries) are the same from build to
+    build, so there is no need to inspect them again. An entry is valid as
+    long as size and mtime of the binary, the environment variables and the
+    ld.so cache affecting the library search and all dependencies found are
+    unchanged. Binaries with dependencies which can not be found are not
+    cached, so they are searched again (and reported) on every build.
+
+    The cache is a single file, loaded on first use and saved by `save()`.
+    It may be used by several threads at once.
+    It holds at most `MAX_ENTRIES` entries, the least recently used entries
+    are dropped first.
+    """
+    # Increase this when changing the format of the cached entries.
+    VERSION = 1
+    MAX_ENTRIES = 20000
+
+    def __init__(self, cache_dir):
+        self.filename = os.path.join(
+            cache_dir, 'bindepend%d_%s_%s.dat' % (self.VERSION, sys.platform,
+                                                  compat.architecture))
+        # Environment variables used to search libraries.
+        self._environ = tuple(compat.getenv(name, '') for name in
+                              ('LD_LIBRARY_PATH', 'DYLD_LIBRARY_PATH',
+                               'LIBPATH'))
+        # ldconfig updates the ld.so cache when libraries are installed.
+        try:
+            self._environ += (os.stat('/etc/ld.so.cache').st_mtime,)
+        except (IOError, OSError):
+            pass
+        self._entries = None
+        self._changed = False
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        """
+        Load the cache file unless already loaded.
+        """
+        # Threads loading the cache at once would replace each other's
+        # entries.
+        with self._load_lock:
+            if self._entries is None:
+                self._entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.filename, 'rb') as f:
+                entries = marshal.load(f)
+            if not isinstance(entries, dict):
+                raise ValueError('Invalid binary dependency cache')
+        except (IOError, OSError):
+            entries = {}
+        except (EOFError, ValueError, TypeError):
+            logger.debug('Ignoring corrupted binary dependency cache %s',
+                         self.filename)
+            entries = {}
+        return entries
+
+    def _key(self, pth):
+        st = os.stat(pth)
+        return os.path.normcase(os.path.abspath(pth)), (
+            st.st_size, st.st_mtime, self._environ)
+
+    def get(self, pth):
+        """
+        Return the cached dependencies of binary PTH _or_ `None` if there is
+        no valid entry.
+        """
+        self.load()
+        try:
+            key, fingerprint = self._key(pth)
+            entry_fingerprint, imports, last_used = self._entries[key]
+        except (IOError, OSError, KeyError):
+            return None
+        if entry_fingerprint != fingerprint:
+            return None
+        # A library found previously might have been removed meanwhile.
+        for lib in imports:
+            if os.path.isabs(lib) and not os.path.exists(lib):
+                return None
+        self._entries[key] = (entry_fingerprint, imports, time.time())
+        self._changed = True
+        return list(imports)
+
+    def put(self, pth, imports):
+        """
+        Store the dependencies of binary PTH.
+        """
+        self.load()
+        try:
+            key, fingerprint = self._key(pth)
+        except (IOError, OSError):
+            return
+        self._entries[key] = (fingerprint, tuple(imports), time.time())
+        self._changed = True
+
+    def save(self):
+        """
+        Write the cache, merged with the entries other builds saved
+        meanwhile.
+        """
+        if not self._changed:
+            return
+        entries = self._load()
+        for key, entry in self._entries.items():
+            if key not in entries or entries[key][2] < entry[2]:
+                entries[key] = entry
+        if len(entries) > self.MAX_ENTRIES:
+            keys = sorted(entries, key=lambda key: entries[key][2])
+            for key in keys[:len(entries) - self.MAX_ENTRIES]:
+                del entries[key]
+        try:
+            save_file_atomically(self.filename, marshal.dumps(entries))
+        except (IOError, OSError) as e:
+            logger.debug('Cannot write binary dependency cache %s: %s',
+                         self.filename, e)
+        self._entries = entries
+        self._changed = False
+
+
+_imports_cache = None
+
+
+def _get_imports_cache():
+    """
+    Return the `ImportsCache` in PyInstaller's cache directory _or_ `None`
+    if there is no cache directory configured.
+    """
+    global _imports_cache
+    from ..config import CONF
+    cache_dir = CONF.get('cachedir')
+    if not cache_dir:
+        return None
+    if _imports_cache is None or not _imports_cache.filename.startswith(
+            os.path.join(cache_dir, '')):
+        _imports_cache = ImportsCache(cache_dir)
+    return _imports_cache
+
+
 def getImports(pth):
+    """
+    Return the dependencies of binary PTH, using the persistent cache if
+    available.
+    """
+    imports_cache = _get_imports_cache()
+    if imports_cache is None:
+        return _getImports(pth)
+    imports = imports_cache.get(pth)
+    if imports is None:
+        missing = []
+        imports = list(_getImports(pth, missing))
+        if not missing:
+            imports_cache.put(pth, imports)
+    return imports
+
+
+def _getImports(pth, missing=None):
     """
     Forwards to the correct getImports implementation for the platform.
+    The names of dependencies which can not be found are appended to list
+    MISSING, if given.
     """
     if is_win or is_cygwin:
         if pth.lower().endswith(".manifest"):
@@ -737,9 +1065,17 @@ def getImports(pth):
                 exc_info=not isinstance(exception, pefile.PEFormatError))
             return []
     elif is_darwin:
-        return _getImports_macholib(pth)
+        return _getImports_macholib(pth, missing)
+    elif is_aix or is_hpux:
+        # AIX uses XCOFF binaries, HP-UX may use SOM binaries.
+        return _getImports_ldd(pth, missing)
     else:
-        return _getImports_ldd(pth)
+        try:
+            return _getImports_elf(pth, missing)
+        except (IOError, OSError, ValueError) as exception:
+            logger.debug('Can not read ELF file %s (%s), falling back to ldd',
+                         pth, exception)
+            return _getImports_ldd(pth, missing)
 
 
 def findLibrary(name):
@@ -838,15 +1174,10 @@ def _get_so_name(filename):
     Return the soname of a library.
 
     Soname is usefull whene there are multiple symplinks to one library.
+    Return the file name if the library has no soname.
     """
-    # TODO verify that objdump works on other unixes and not Linux only.
-    cmd = ["objdump", "-p", filename]
-    pattern = r'\s+SONAME\s+([^\s]+)'
-    if is_solar:
-        cmd = ["elfdump", "-d", filename]
-        pattern = r'\s+SONAME\s+[^\s]+\s+([^\s]+)'
-    m = re.search(pattern, compat.exec_command(*cmd))
-    return m.group(1)
+    soname = _get_elf_info(filename).soname
+    return soname or os.path.basename(filename)
 
 
 def get_python_library_path():
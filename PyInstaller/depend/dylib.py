@@ -117,6 +117,9 @@ _unix_excludes = set([
     r'libthread_db\.so(\..*)?',
     # glibc regex excludes.
     r'ld-linux\.so(\..*)?',
+    # The dynamic loader, e.g. ld-linux-x86-64.so.2 or ld64.so.2.
+    r'ld-linux-.*\.so(\..*)?',
+    r'ld64\.so(\..*)?',
     r'libBrokenLocale\.so(\..*)?',
     r'libanl\.so(\..*)?',
     r'libcidn\.so(\..*)?',
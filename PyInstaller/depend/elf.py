@@ -0,0 +1,186 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2019, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+"""
+Read the dynamic section of ELF binaries.
+
+This is all the dynamic loader needs to know for finding the libraries a
+binary depends on. Reading it directly is much faster than running `ldd` or
+`objdump` for each binary, and unlike `ldd` it does not execute the binary
+(or its interpreter).
+"""
+
+import collections
+import os
+import struct
+
+from ..compat import is_py2
+
+
+__all__ = ['DynamicInfo', 'read_dynamic_info', 'expand_search_path']
+
+
+ELF_MAGIC = b'\x7fELF'
+
+# Values of e_ident[EI_CLASS] and e_ident[EI_DATA].
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+ELFDATA2LSB = 1
+ELFDATA2MSB = 2
+
+# Program header types.
+PT_LOAD = 1
+PT_DYNAMIC = 2
+
+# Dynamic section tags.
+DT_NULL = 0
+DT_NEEDED = 1
+DT_STRTAB = 5
+DT_SONAME = 14
+DT_RPATH = 15
+DT_RUNPATH = 29
+
+# Formats of (e_machine, e_phoff, e_phentsize, e_phnum), of a program header
+# (p_type, p_offset, p_vaddr, p_filesz) and of a dynamic section entry, by
+# ELF class. Fields not needed are skipped using pad bytes.
+_FORMATS = {
+    ELFCLASS32: ('16xxxH8xI10xHH', 'IIIxxxxI', 'iI'),
+    ELFCLASS64: ('16xxxH12xQ14xHH', 'I4xQQ8xQ', 'qQ'),
+}
+
+
+DynamicInfo = collections.namedtuple(
+    'DynamicInfo',
+    # `elfclass` and `machine` are to be used to check whether two binaries
+    # are compatible. `rpath` and `runpath` are lists of directories, which
+    # may contain unexpanded tokens like `$ORIGIN`.
+    ['elfclass', 'machine', 'needed', 'soname', 'rpath', 'runpath'])
+
+
+def _decode(name):
+    # Names are kept as bytes on Python 2, as all other paths are, too.
+    return name if is_py2 else os.fsdecode(name)
+
+
+def _read(f, offset, size):
+    f.seek(offset)
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError('Truncated ELF file')
+    return data
+
+
+def read_dynamic_info(filename):
+    """
+    Read the dynamic section of the passed ELF file.
+
+    Return a `DynamicInfo` tuple. A binary without a dynamic section (e.g.
+    a static executable) results in no libraries needed.
+
+    Raise `ValueError` if the file is no ELF file or is malformed, and
+    `IOError`/`OSError` if it can not be read.
+    """
+    with open(filename, 'rb') as f:
+        ident = f.read(16)
+        if len(ident) != 16 or ident[:4] != ELF_MAGIC:
+            raise ValueError('Not an ELF file: %s' % filename)
+        elfclass, data = bytearray(ident[4:6])
+        if elfclass not in _FORMATS or data not in (ELFDATA2LSB, ELFDATA2MSB):
+            raise ValueError('Unsupported ELF file: %s' % filename)
+        order = '<' if data == ELFDATA2LSB else '>'
+        ehdr_fmt, phdr_fmt, dyn_fmt = (order + fmt for fmt in
+                                       _FORMATS[elfclass])
+        dyn_size = struct.calcsize(dyn_fmt)
+
+        machine, phoff, phentsize, phnum = struct.unpack(
+            ehdr_fmt, _read(f, 0, struct.calcsize(ehdr_fmt)))
+
+        # The dynamic section and the segments of the file mapped to memory.
+        # The addresses in the dynamic section refer to the latter.
+        dynamic = None
+        loads = []
+        phdr_size = struct.calcsize(phdr_fmt)
+        for i in range(phnum):
+            p_type, p_offset, p_vaddr, p_filesz = struct.unpack(
+                phdr_fmt, _read(f, phoff + i * phentsize, phdr_size))
+            if p_type == PT_DYNAMIC:
+                dynamic = (p_offset, p_filesz)
+            elif p_type == PT_LOAD:
+                loads.append((p_vaddr, p_offset, p_filesz))
+
+        entries = []
+        if dynamic is not None:
+            offset, size = dynamic
+            table = _read(f, offset, size - size % dyn_size)
+            for i in range(0, len(table), dyn_size):
+                tag, value = struct.unpack(dyn_fmt, table[i:i + dyn_size])
+                if tag == DT_NULL:
+                    break
+                entries.append((tag, value))
+
+        strtab = None
+        for tag, value in entries:
+            if tag == DT_STRTAB:
+                for vaddr, offset, size in loads:
+                    if vaddr <= value < vaddr + size:
+                        strtab = value - vaddr + offset
+                        break
+                else:
+                    raise ValueError('Invalid string table in %s' % filename)
+
+        def string(offset):
+            # Strings are zero-terminated, read them in chunks.
+            f.seek(strtab + offset)
+            chunks = []
+            while True:
+                chunk = f.read(256)
+                end = chunk.find(b'\0')
+                if end >= 0:
+                    chunks.append(chunk[:end])
+                    return _decode(b''.join(chunks))
+                if not chunk:
+                    raise ValueError('Truncated ELF file')
+                chunks.append(chunk)
+
+        needed = []
+        soname = None
+        rpath = []
+        runpath = []
+        for tag, value in entries:
+            if tag in (DT_NEEDED, DT_SONAME, DT_RPATH, DT_RUNPATH):
+                if strtab is None:
+                    raise ValueError('Missing string table in %s' % filename)
+                if tag == DT_NEEDED:
+                    needed.append(string(value))
+                elif tag == DT_SONAME:
+                    soname = string(value)
+                elif tag == DT_RPATH:
+                    rpath.extend(p for p in string(value).split(':') if p)
+                else:
+                    runpath.extend(p for p in string(value).split(':') if p)
+
+    return DynamicInfo(elfclass, machine, needed, soname, rpath, runpath)
+
+
+def expand_search_path(path, origin, elfclass):
+    """
+    Expand the tokens in the passed RPATH or RUNPATH entry of a binary
+    located in directory `origin`.
+
+    Return `None` if the entry contains a token which can not be expanded
+    at build time (like `$PLATFORM`), as the dynamic loader would ignore it.
+    """
+    lib = 'lib64' if elfclass == ELFCLASS64 else 'lib'
+    for token, value in (('ORIGIN', origin), ('LIB', lib)):
+        path = path.replace('${%s}' % token, value)
+        path = path.replace('$%s' % token, value)
+    if '$' in path:
+        return None
+    return path
@@ -12,7 +12,7 @@
 Code related to processing of import hooks.
 """
 
-import glob, sys, weakref
+import glob, sys, time, weakref
 import os.path
 
 from .. import log as logging
@@ -20,6 +20,7 @@ from ..compat import (
     expand_path, importlib_load_source, FileNotFoundError)
 from .imphookapi import PostGraphAPI
 from ..building.utils import format_binaries_and_datas
+from ..building import timing
 
 logger = logging.getLogger(__name__)
 
@@ -410,6 +411,7 @@ class ModuleHook(object):
         This method is intended to be called _after_ the module graph for this
         application is constructed.
         """
+        start = time.time()
 
         # Lazily load this hook script into an in-memory module.
         self._load_hook_module()
@@ -422,6 +424,9 @@ class ModuleHook(object):
         self._process_hidden_imports()
         self._process_excluded_imports()
 
+        timing.add_hook(self.module_name, self.hook_filename,
+                        time.time() - start)
+
 
     def _process_hook_func(self):
         """
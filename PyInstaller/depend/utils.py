@@ -109,10 +109,19 @@ def create_py3_base_library(libzip_filename, graph):
         raise
 
 
-def scan_code_for_ctypes(co):
+def get_ctypes_library_names(co):
+    """
+    Return the sorted names of the libraries loaded via ctypes by the code
+    object `co` and all code objects nested in it, as given in the code. The
+    names are neither checked nor resolved.
+    """
     binaries = []
-
     __recursivly_scan_code_objects_for_ctypes(co, binaries)
+    return sorted(set(binary for binary in binaries if binary))
+
+
+def scan_code_for_ctypes(co):
+    binaries = get_ctypes_library_names(co)
 
     # If any of the libraries has been requested with anything
     # different then the bare filename, drop that entry and warn
@@ -392,10 +401,15 @@ def load_ldconfig_cache():
 
     text = text.strip().splitlines()[splitlines_count:]
 
-    LDCONFIG_CACHE = {}
+    # Publish the cache only once complete, as it may be used by several
+    # threads concurrently.
+    cache = {}
     for line in text:
         # :fixme: this assumes libary names do not contain whitespace
         m = pattern.match(line)
+        if m is None:
+            # Skip trailing informative lines, e.g. "Cache generated by: ..."
+            continue
         path = m.groups()[-1]
         if is_freebsd:
             # Insert `.so` at the end of the lib's basename. soname
@@ -411,8 +425,9 @@ def load_ldconfig_cache():
         # ldconfig may know about several versions of the same lib,
         # e.g. differents arch, different libc, etc. Use the first
         # entry.
-        if not name in LDCONFIG_CACHE:
-            LDCONFIG_CACHE[name] = path
+        if not name in cache:
+            cache[name] = path
+    LDCONFIG_CACHE = cache
 
 
 def get_path_to_egg(path):
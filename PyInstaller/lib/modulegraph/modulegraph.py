@@ -1074,6 +1074,77 @@ class _Visitor(ast.NodeVisitor):
     visit_Await = visit_Expression
 
 
+def scan_source(contents, pathname):
+    """
+    Compile the passed source code and parse all import statements and global
+    attributes from it *without* modifying any graph.
+
+    This is the graph-independent part of loading a pure-Python module. Since
+    the result depends only on the passed source code and path, it may be
+    cached across builds or computed in another process.
+
+    Parameters
+    ----------
+    contents : str
+        Source code of the module to be scanned.
+    pathname : str
+        Absolute path of this module, embedded in the returned code object.
+
+    Returns
+    ----------
+    (valid, code, imports, global_attr_names)
+        Marshallable 4-tuple, where:
+        * `valid` is `False` only if the source is not parsable, in which case
+          all other items are empty.
+        * `code` is the code object compiled from this source _or_ `None` if
+          the source is parsable but not compilable.
+        * `imports` is a tuple of 5-tuples `(have_star, target_module_partname,
+          target_attr_names, level, edge_attr)` listing all deferred imports
+          in the order they are to be processed. See the `_deferred_imports`
+          attribute of the `Node` class for details; `edge_attr` is either a
+          plain tuple of `DependencyInfo` fields or `None`.
+        * `global_attr_names` is a tuple of the unqualified names of all
+          global attributes defined by this module.
+    """
+    if isinstance(contents, bytes):
+        contents += b'\n'
+    else:
+        contents += '\n'
+
+    try:
+        co_ast = compile(contents, pathname, 'exec', ast.PyCF_ONLY_AST, True)
+        if sys.version_info[:2] == (3, 5):
+            # In Python 3.5 some syntax problems with async
+            # functions are only reported when compiling to bytecode
+            compile(co_ast, '-', 'exec', 0, True)
+    except SyntaxError:
+        return (False, None, (), ())
+
+    try:
+        co = compile(co_ast, pathname, 'exec', 0, True)
+    except SyntaxError:
+        return (True, None, (), ())
+
+    # Scan a detached node, so no graph is required.
+    module = Node(pathname)
+    module._deferred_imports = []
+    _Visitor(None, module).visit(co_ast)
+    ModuleGraph._scan_bytecode(module, co, is_scanning_imports=False)
+
+    imports = []
+    for have_star, import_info, kwargs in module._deferred_imports:
+        target_module_partname, _, target_attr_names, level = import_info
+        if target_attr_names is not None:
+            target_attr_names = tuple(target_attr_names)
+        edge_attr = kwargs.get('edge_attr')
+        if edge_attr is not None:
+            edge_attr = tuple(edge_attr)
+        imports.append((have_star, target_module_partname, target_attr_names,
+                        level, edge_attr))
+
+    return (True, co, tuple(imports), tuple(sorted(module._global_attr_names)))
+
+
 class ModuleGraph(ObjectGraph):
     """
     Directed graph whose nodes represent modules and edges represent
@@ -2095,26 +2166,31 @@ class ModuleGraph(ObjectGraph):
             return m
 
         if typ == imp.PY_SOURCE:
-            contents = fp.read()
-            if isinstance(contents, bytes):
-                contents += b'\n'
-            else:
-                contents += '\n'
-
-            try:
-                co = compile(contents, pathname, 'exec', ast.PyCF_ONLY_AST, True)
-                if sys.version_info[:2] == (3, 5):
-                    # In Python 3.5 some syntax problems with async
-                    # functions are only reported when compiling to bytecode
-                    compile(co, '-', 'exec', 0, True)
-            except SyntaxError:
-                co = None
+            # Compiling and scanning the source is delegated, so that
+            # subclasses may reuse the result of a previous scan.
+            valid, co, imports, global_attr_names = self._scan_source(
+                fp, pathname)
+            if not valid:
                 cls = InvalidSourceModule
                 self.msg(2, "load_module: InvalidSourceModule", pathname)
-
             else:
                 cls = SourceModule
 
+            m = self.createNode(cls, fqname)
+            m.filename = pathname
+            if co is not None:
+                self._load_scan_record(m, imports, global_attr_names)
+                self._process_imports(m)
+
+                if self.replace_paths:
+                    co = self._replace_paths_in_code(co)
+                m.code = co
+            elif valid:
+                self.msg(1, "load_module: SyntaxError in ", pathname)
+
+            self.msgout(2, "load_module ->", m)
+            return m
+
         elif typ == imp.PY_COMPILED:
             data = fp.read(4)
             magic = imp.get_magic()
@@ -2150,26 +2226,70 @@ class ModuleGraph(ObjectGraph):
         m = self.createNode(cls, fqname)
         m.filename = pathname
         if co is not None:
-            try:
-                if isinstance(co, ast.AST):
-                    co_ast = co
-                    co = compile(co_ast, pathname, 'exec', 0, True)
-                else:
-                    co_ast = None
-                self._scan_code(m, co, co_ast)
+            self._scan_code(m, co)
 
-                if self.replace_paths:
-                    co = self._replace_paths_in_code(co)
-                m.code = co
-            except SyntaxError:
-                self.msg(1, "load_module: SyntaxError in ", pathname)
-                cls = InvalidSourceModule
-                m = self.createNode(cls, fqname)
+            if self.replace_paths:
+                co = self._replace_paths_in_code(co)
+            m.code = co
 
         self.msgout(2, "load_module ->", m)
         return m
 
 
+    def _scan_source(self, fp, pathname):
+        """
+        Compile and scan the pure-Python module with the passed source file.
+
+        Subclasses may override this method to reuse the result of a previous
+        scan of the same source file (e.g., from a persistent cache).
+
+        Parameters
+        ----------
+        fp : file
+            Open file handle providing the source code of this module.
+        pathname : str
+            Absolute path of this module.
+
+        Returns
+        ----------
+        tuple
+            See the `scan_source()` function for details.
+        """
+        return scan_source(fp.read(), pathname)
+
+
+    def _load_scan_record(self, module, imports, global_attr_names):
+        """
+        Record all imports and global attributes previously parsed by the
+        `scan_source()` function into the passed graph node, deferring the
+        importations for subsequent processing by `_process_imports()`.
+
+        Parameters
+        ----------
+        module : Node
+            Graph node of the module these imports originate from.
+        imports : tuple
+            Imports as returned by `scan_source()`.
+        global_attr_names : tuple
+            Global attribute names as returned by `scan_source()`.
+        """
+        module._deferred_imports = []
+        for (have_star, target_module_partname, target_attr_names, level,
+             edge_attr) in imports:
+            if target_attr_names is not None:
+                target_attr_names = list(target_attr_names)
+            kwargs = {}
+            if edge_attr is not None:
+                kwargs['edge_attr'] = DependencyInfo(*edge_attr)
+            module._deferred_imports.append((
+                have_star,
+                (target_module_partname, module, target_attr_names, level),
+                kwargs))
+
+        for attr_name in global_attr_names:
+            module.add_global_attr(attr_name)
+
+
     def _safe_import_hook(
         self, target_module_partname, source_module, target_attr_names,
         level=DEFAULT_IMPORT_LEVEL, edge_attr=None):
@@ -2669,8 +2789,8 @@ class ModuleGraph(ObjectGraph):
     #After doing so, the "Node._global_attr_names" attribute and all methods
     #using this attribute (e.g., Node.is_global()) should be moved from the
     #"Node" superclass to the "Package" subclass.
-    def _scan_bytecode(
-        self, module, module_code_object, is_scanning_imports):
+    @staticmethod
+    def _scan_bytecode(module, module_code_object, is_scanning_imports):
         """
         Parse and add all import statements from the passed code object of the
         passed source module to this graph, non-recursively.
@@ -25,6 +25,11 @@ pyimod03_importers.install()
 import os
 
 
+# Profile the imports from the PYZ archive if requested.
+if os.environ.get('PYI_IMPORT_PROFILE'):
+    pyimod03_importers.install_import_profile(os.environ['PYI_IMPORT_PROFILE'])
+
+
 # Let other python modules know that the code is running in frozen mode.
 if not hasattr(sys, 'frozen'):
     sys.frozen = True
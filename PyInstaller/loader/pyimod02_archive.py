@@ -43,6 +43,29 @@ PYZ_TYPE_MODULE = 0
 PYZ_TYPE_PKG = 1
 PYZ_TYPE_DATA = 2
 
+# compression codecs of PYZ entries
+PYZ_CODEC_STORE = 0
+PYZ_CODEC_ZLIB = 1
+PYZ_CODEC_LZMA = 2
+
+
+def decompress(codec, data):
+    """
+    Decompress the data of a PYZ entry compressed using `codec`.
+    """
+    if codec == PYZ_CODEC_ZLIB:
+        return zlib.decompress(data)
+    elif codec == PYZ_CODEC_STORE:
+        return data
+    elif codec == PYZ_CODEC_LZMA:
+        # '_lzma' is an extension module, not a builtin one. It is bundled
+        # only if the PYZ uses lzma and can be imported only after the
+        # bootstrap, so import it on first use.
+        import _lzma
+        return _lzma.LZMADecompressor(_lzma.FORMAT_ALONE).decompress(data)
+    raise ValueError('Unknown PYZ codec %r' % codec)
+
+
 class FilePos(object):
     """
     This class keeps track of the file object representing and current position
@@ -340,6 +363,10 @@ class ZlibArchiveReader(ArchiveReader):
 
         super(ZlibArchiveReader, self).__init__(path, offset)
 
+        # Map the archive into memory to read entries without any system
+        # call. If this is not possible, each entry is read from the file.
+        self._data = self._map_archive() if path is not None else None
+
         # Try to import the key module. If the key module is not available
         # then it means that encryption is disabled.
         try:
@@ -348,25 +375,73 @@ class ZlibArchiveReader(ArchiveReader):
         except ImportError:
             self.cipher = None
 
+        # Object with a `timer()` function and a method `add_stages(name,
+        # read, decompress, unmarshal)` which gets the seconds spent in each
+        # stage of extract(). Set to profile the imports.
+        self.profile = None
+
+    def _map_archive(self):
+        """
+        Return the contents of the file containing the archive mapped into
+        memory, or None if the file can not be mapped.
+
+        The mapping is kept for the life of the process. Slicing it does not
+        copy any data on Python 3.
+        """
+        try:
+            # 'mmap' is an extension module on most platforms. It is bundled
+            # with the bootstrap modules, but be safe.
+            import mmap
+        except ImportError:
+            return None
+        try:
+            with open(self.path, 'rb') as fp:
+                # The mapping stays valid after closing the file.
+                data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (EnvironmentError, ValueError):
+            return None
+        if sys.version_info[0] == 2:
+            # mmap in Python 2 does not support memoryview, slices are copies.
+            return data
+        return memoryview(data)
+
     def is_package(self, name):
-        (typ, pos, length) = self.toc.get(name, (0, None, 0))
+        (typ, pos) = self.toc.get(name, (0, None))[:2]
         if pos is None:
             return None
         return typ == PYZ_TYPE_PKG
 
     def extract(self, name):
-        (typ, pos, length) = self.toc.get(name, (0, None, 0))
+        entry = self.toc.get(name, (0, None, 0))
+        # Archives without a codec field use zlib for all entries.
+        (typ, pos, length, codec) = (entry + (PYZ_CODEC_ZLIB,))[:4]
         if pos is None:
             return None
-        with self.lib:
-            self.lib.seek(self.start + pos)
-            obj = self.lib.read(length)
+        profile = self.profile
+        if profile is not None:
+            start = profile.timer()
+        if self._data is not None:
+            obj = self._data[self.start + pos:self.start + pos + length]
+        else:
+            with self.lib:
+                self.lib.seek(self.start + pos)
+                obj = self.lib.read(length)
+        if profile is not None:
+            read = profile.timer()
         try:
             if self.cipher:
-                obj = self.cipher.decrypt(obj)
-            obj = zlib.decompress(obj)
+                obj = self.cipher.decrypt(bytes(obj))
+            obj = decompress(codec, obj)
+            if profile is not None:
+                decompressed = profile.timer()
             if typ in (PYZ_TYPE_MODULE, PYZ_TYPE_PKG):
                 obj = marshal.loads(obj)
+            elif type(obj) is not bytes:
+                # Do not return a view of the mapping.
+                obj = bytes(obj)
         except EOFError:
             raise ImportError("PYZ entry '%s' failed to unmarshal" % name)
+        if profile is not None:
+            profile.add_stages(name, read - start, decompressed - read,
+                               profile.timer() - decompressed)
         return typ, obj
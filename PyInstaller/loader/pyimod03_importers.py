@@ -386,7 +386,7 @@ class FrozenImporter(object):
                 sys.modules[fullname] = module
 
                 # Run the module code.
-                exec(bytecode, module.__dict__)
+                self._exec_code(entry_name, bytecode, module)
                 # Reread the module from sys.modules in case it's changed itself
                 module = sys.modules[fullname]
 
@@ -618,7 +618,22 @@ class FrozenImporter(object):
             # Set __path__ to point to 'sys.prefix/package/subpackage'.
             module.__path__ = [pyi_os_path.os_path_dirname(module.__file__)]
 
-        exec(bytecode, module.__dict__)
+        self._exec_code(spec.loader_state, bytecode, module)
+
+    def _exec_code(self, entry_name, bytecode, module):
+        """
+        Run the code of a module, recording the time spent if the imports
+        are profiled.
+        """
+        profile = self._pyz_archive.profile
+        if profile is None:
+            exec(bytecode, module.__dict__)
+            return
+        start = profile.start_exec()
+        try:
+            exec(bytecode, module.__dict__)
+        finally:
+            profile.end_exec(entry_name, start)
 
 
 # is_py2: This is only needed for Python 2.
@@ -770,6 +785,100 @@ class CExtensionImporter(object):
         raise ImportError('No module named ' + fullname)
 
 
+class ImportProfile(object):
+    """
+    Record the time spent importing each module from the PYZ archive, like
+    ``python -X importtime``, but split into the stages: reading,
+    decompressing and unmarshalling the code object, and executing it.
+
+    `exec` is the time spent executing the module itself, without nested
+    imports from the PYZ archive. `cumulative` is the time of all stages
+    including nested imports.
+
+    At exit the modules are written sorted by cumulative time to the file
+    `filename` as JSON, or to stderr as table if `filename` is '-'.
+    """
+    FIELDS = ('read', 'decompress', 'unmarshal', 'exec', 'cumulative')
+
+    def __init__(self, filename):
+        # This is used after the bootstrap, non-builtin modules are fine.
+        import time
+        if sys.version_info[0] == 2:
+            import thread
+        else:
+            import _thread as thread
+        self.timer = getattr(time, 'perf_counter', time.time)
+        self.filename = filename
+        self._get_ident = thread.get_ident
+        # Module name -> list of the seconds spent, in order of FIELDS.
+        self.modules = {}
+        # Thread id -> for each module being executed, the seconds spent
+        # importing nested modules.
+        self._nested = {}
+
+    def _record(self, name):
+        return self.modules.setdefault(name, [0.0] * len(self.FIELDS))
+
+    def _add_nested(self, seconds):
+        nested = self._nested.get(self._get_ident())
+        if nested:
+            nested[-1] += seconds
+
+    def add_stages(self, name, read, decompress, unmarshal):
+        record = self._record(name)
+        record[0] += read
+        record[1] += decompress
+        record[2] += unmarshal
+        record[4] += read + decompress + unmarshal
+        self._add_nested(read + decompress + unmarshal)
+
+    def start_exec(self):
+        self._nested.setdefault(self._get_ident(), []).append(0.0)
+        return self.timer()
+
+    def end_exec(self, name, start):
+        elapsed = self.timer() - start
+        record = self._record(name)
+        record[3] += elapsed - self._nested[self._get_ident()].pop()
+        record[4] += elapsed
+        self._add_nested(elapsed)
+
+    def dump(self):
+        modules = sorted(self.modules.items(),
+                         key=lambda item: (-item[1][4], item[0]))
+        if self.filename == '-':
+            # Microseconds, as `python -X importtime` prints.
+            sys.stderr.write('import time: %s | module\n'
+                             % ' | '.join('%10s' % f for f in self.FIELDS))
+            for name, record in modules:
+                sys.stderr.write('import time: %s | %s\n' % (
+                    ' | '.join('%10d' % (t * 1e6) for t in record), name))
+            return
+        # The 'json' module might not be bundled, write JSON by hand.
+        lines = []
+        for name, record in modules:
+            name = name.replace('\\', '\\\\').replace('"', '\\"')
+            lines.append('{"module": "%s", %s}' % (name, ', '.join(
+                '"%s": %.6f' % item for item in zip(self.FIELDS, record))))
+        data = '[\n' + ',\n'.join(lines) + '\n]\n'
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        with open(self.filename, 'wb') as fp:
+            fp.write(data)
+
+
+def install_import_profile(filename):
+    """
+    Profile the imports from the PYZ archive, see `ImportProfile`.
+    """
+    import atexit
+    profile = ImportProfile(filename)
+    for item in sys.meta_path:
+        if isinstance(item, FrozenImporter):
+            item._pyz_archive.profile = profile
+    atexit.register(profile.dump)
+
+
 def install():
     """
     Install FrozenImporter class and other classes into the import machinery.
@@ -18,7 +18,6 @@ import argparse
 import os
 import pprint
 import tempfile
-import zlib
 
 from PyInstaller.loader import pyimod02_archive
 from PyInstaller.archive.readers import CArchiveReader, NotAnArchiveError
@@ -149,12 +148,14 @@ def get_archive(name):
 
 def get_data(name, arch):
     if isinstance(arch.toc, dict):
-        (ispkg, pos, length) = arch.toc.get(name, (0, None, 0))
+        entry = arch.toc.get(name, (0, None, 0))
+        (ispkg, pos, length, codec) = \
+            (entry + (pyimod02_archive.PYZ_CODEC_ZLIB,))[:4]
         if pos is None:
             return None
         with arch.lib:
             arch.lib.seek(arch.start + pos)
-            return zlib.decompress(arch.lib.read(length))
+            return pyimod02_archive.decompress(codec, arch.lib.read(length))
     ndx = arch.toc.find(name)
     dpos, dlen, ulen, flag, typcd, name = arch.toc[ndx]
     x, data = arch.extract(ndx)
@@ -163,7 +164,7 @@ def get_data(name, arch):
 
 def show(name, arch):
     if isinstance(arch.toc, dict):
-        print(" Name: (ispkg, pos, len)")
+        print(" Name: (ispkg, pos, len, codec)")
         toc = arch.toc
     else:
         print(" pos, length, uncompressed, iscompressed, type, name")
@@ -6,20 +6,27 @@
 #
 # The full license is in the file COPYING.txt, distributed with this software.
 #-----------------------------------------------------------------------------
+import atexit
 import copy
 import glob
+import marshal
 import os
 import pkg_resources
 import pkgutil
+import struct
+import subprocess
 import sys
 import textwrap
+import threading
+import time
 
 from ...compat import base_prefix, exec_command_stdout, exec_python, \
-    is_darwin, is_py2, is_py3, is_venv, string_types, open_file, \
-    EXTENSION_SUFFIXES, ALL_SUFFIXES
-from ... import HOMEPATH
+    popen_python, is_darwin, is_py2, is_py3, is_venv, string_types, \
+    open_file, EXTENSION_SUFFIXES, ALL_SUFFIXES
+from ... import HOMEPATH, PACKAGEPATH
 from ... import log as logging
 from ...exceptions import ExecCommandFailed
+from ..misc import save_file_atomically
 
 logger = logging.getLogger(__name__)
 
@@ -38,11 +45,10 @@ PY_IGNORE_EXTENSIONS = set(ALL_SUFFIXES)
 hook_variables = {}
 
 
-def __exec_python_cmd(cmd, env=None):
+def __get_python_env(env=None):
     """
-    Executes an externally spawned Python interpreter and returns
-    anything that was emitted in the standard output as a single
-    string.
+    Return the environment for running an externally spawned Python
+    interpreter.
     """
     # 'PyInstaller.config' cannot be imported as other top-level modules.
     from ...config import CONF
@@ -68,17 +74,120 @@ def __exec_python_cmd(cmd, env=None):
     if 'PYTHONPATH' in pp_env:
         pp = os.pathsep.join([pp_env.get('PYTHONPATH'), pp])
     pp_env['PYTHONPATH'] = pp
+    return pp_env
+
 
-    txt = exec_python(*cmd, env=pp_env)
+def __exec_python_cmd(cmd, env=None):
+    """
+    Executes an externally spawned Python interpreter and returns
+    anything that was emitted in the standard output as a single
+    string.
+    """
+    txt = exec_python(*cmd, env=__get_python_env(env))
     return txt.strip()
 
 
+class _StatementServer(object):
+    """
+    Long-lived Python interpreter running the statements of
+    `exec_statement()`.
+
+    Starting an interpreter takes 50-200 ms, and the hooks run hundreds of
+    statements in a build. The server (`subproc/statement_server.py`) forks
+    a child process for each statement instead, so statements are as
+    isolated from each other as in a fresh interpreter. A server which died
+    is restarted, one which was started with another environment (e.g.
+    other `pathex`) is replaced.
+
+    Only used on platforms supporting `os.fork()`, except Mac OS X, where
+    frameworks may not be used in a forked child process.
+    """
+    def __init__(self):
+        self._process = None
+        self._env = None
+        self._lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def _start(self, env):
+        script = os.path.join(os.path.dirname(__file__), 'subproc',
+                              'statement_server.py')
+        self._env = dict(env)
+        self._process = popen_python(script, env=env, stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE)
+
+    def _stop(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            # The server exits at the end of its input.
+            process.stdin.close()
+        except (IOError, OSError):
+            process.kill()
+        process.wait()
+        process.stdout.close()
+
+    def stop(self):
+        """
+        Stop the server, if running.
+        """
+        with self._lock:
+            self._stop()
+
+    def _query(self, request):
+        stdin, stdout = self._process.stdin, self._process.stdout
+        stdin.write(struct.pack('!I', len(request)) + request)
+        stdin.flush()
+        header = stdout.read(4)
+        if len(header) != 4:
+            raise EOFError('Statement server exited')
+        size = struct.unpack('!I', header)[0]
+        response = stdout.read(size)
+        if len(response) != size:
+            raise EOFError('Statement server exited')
+        return marshal.loads(response)
+
+    def run(self, statement, env):
+        """
+        Run `statement` with environment `env` and return its output, or
+        `None` if the server failed.
+        """
+        request = marshal.dumps((os.getcwd(), statement))
+        with self._lock:
+            for attempt in range(2):
+                if self._process is None or self._env != env:
+                    self._stop()
+                    self._start(env)
+                try:
+                    status, output = self._query(request)
+                except (IOError, OSError, EOFError, ValueError) as e:
+                    logger.debug('Statement server failed: %s', e)
+                    self._stop()
+                    continue
+                if status:
+                    logger.debug('Statement exited with status %d', status)
+                if is_py3:
+                    output = output.decode('UTF-8')
+                return output
+        return None
+
+
+if hasattr(os, 'fork') and not is_darwin:
+    _statement_server = _StatementServer()
+else:
+    _statement_server = None
+
+
 def exec_statement(statement):
     """
     Executes a Python statement in an externally spawned interpreter, and
     returns anything that was emitted in the standard output as a single string.
     """
     statement = textwrap.dedent(statement)
+    if _statement_server is not None:
+        txt = _statement_server.run(statement, __get_python_env())
+        if txt is not None:
+            return txt.strip()
     cmd = ['-c', statement]
     return __exec_python_cmd(cmd)
 
@@ -120,6 +229,235 @@ def eval_script(scriptfilename, env=None, *args):
     return eval(txt)
 
 
+class _QueryCache(object):
+    """
+    Persistent cache of the output of statements querying installed
+    modules, e.g. by `collect_submodules()` or `get_module_attribute()`.
+
+    The output only changes when the distribution providing the module
+    changes. So an entry is keyed by the statement and valid as long as the
+    fingerprint of the module (see `fingerprint()`) is unchanged. Only
+    modules installed by a distribution which lists their files are cached;
+    sources in development, e.g. installed in editable mode, are not.
+
+    The cache is a single file, loaded on first use and saved when
+    PyInstaller exits. It holds at most `MAX_ENTRIES` entries, the least
+    recently used entries are dropped first.
+    """
+    # Increase this when changing the format of the cached entries.
+    VERSION = 1
+    MAX_ENTRIES = 20000
+    METADATA_SUFFIXES = ('.dist-info', '.egg-info', '.egg-link', '.pth')
+
+    def __init__(self, cache_dir):
+        self.filename = os.path.join(cache_dir,
+                                     'hookqueries%d.dat' % self.VERSION)
+        self._entries = None
+        self._changed = False
+        # Fingerprints of the path entries, computed once per build.
+        self._path_fingerprints = {}
+
+    def _load(self):
+        try:
+            with open(self.filename, 'rb') as f:
+                entries = marshal.load(f)
+            if not isinstance(entries, dict):
+                raise ValueError('Invalid hook query cache')
+        except (IOError, OSError):
+            entries = {}
+        except (EOFError, ValueError, TypeError):
+            logger.debug('Ignoring corrupted hook query cache %s',
+                         self.filename)
+            entries = {}
+        return entries
+
+    def _path_fingerprint(self, path):
+        # The installed distributions in path entry PATH and the top-level
+        # names their file lists own. Installing, upgrading or removing a
+        # distribution changes its metadata.
+        if path not in self._path_fingerprints:
+            try:
+                names = sorted(os.listdir(path))
+            except (IOError, OSError):
+                names = []
+            fingerprint = []
+            owned = set()
+            for name in names:
+                if not name.endswith(self.METADATA_SUFFIXES):
+                    continue
+                filename = os.path.join(path, name)
+                for files in ('RECORD', 'installed-files.txt'):
+                    if os.path.exists(os.path.join(filename, files)):
+                        filename = os.path.join(filename, files)
+                        owned.update(self._owned_names(path, filename))
+                        break
+                try:
+                    fingerprint.append((name, os.stat(filename).st_mtime))
+                except (IOError, OSError):
+                    pass
+            self._path_fingerprints[path] = (tuple(fingerprint), owned)
+        return self._path_fingerprints[path]
+
+    @staticmethod
+    def _owned_names(path, filename):
+        # The top-level names in path entry PATH listed by the file list
+        # FILENAME, a RECORD (relative to PATH) or an installed-files.txt
+        # (relative to the .egg-info directory).
+        base = path
+        if filename.endswith('installed-files.txt'):
+            base = os.path.dirname(filename)
+        names = set()
+        try:
+            with open(filename) as f:
+                for line in f:
+                    name = line.split(',')[0].strip()
+                    if not name:
+                        continue
+                    try:
+                        name = os.path.relpath(
+                            os.path.normpath(os.path.join(base, name)), path)
+                    except ValueError:
+                        # On another drive on Windows.
+                        continue
+                    names.add(name.split(os.sep)[0])
+        except (IOError, OSError):
+            pass
+        return names
+
+    def fingerprint(self, module_name):
+        """
+        Return the fingerprint of the distribution providing module
+        MODULE_NAME _or_ `None` if its output must not be cached.
+
+        The fingerprint covers the location of the top-level package and the
+        distributions installed in the path entries up to the one containing
+        it, so a distribution shadowing it invalidates the entry, too.
+        Modules found in `pathex`, the current directory or PyInstaller
+        itself, and modules not owned by an installed distribution are not
+        cached, as they may change at any time.
+        """
+        from ...config import CONF
+        top_name = module_name.split('.')[0]
+        volatile = [os.path.normcase(os.path.abspath(p)) for p in
+                    CONF['pathex'] + [os.curdir]]
+        paths = volatile + [os.path.normcase(os.path.abspath(p))
+                            for p in sys.path if p]
+        fingerprint = [sys.executable, sys.version]
+        for path in paths:
+            owned = set()
+            if path not in volatile:
+                path_fingerprint, owned = self._path_fingerprint(path)
+                fingerprint.append((path, path_fingerprint))
+            for name in [top_name] + [top_name + s for s in ALL_SUFFIXES]:
+                location = os.path.join(path, name)
+                if os.path.exists(location):
+                    if (path in volatile or name not in owned or
+                            location == os.path.normcase(PACKAGEPATH)):
+                        return None
+                    fingerprint.append(
+                        (location, os.stat(location).st_mtime))
+                    return tuple(fingerprint)
+        # Built-in, frozen or not installed at all.
+        return None
+
+    def get(self, statement, fingerprint):
+        """
+        Return the cached output of STATEMENT _or_ `None` if there is no
+        valid entry.
+        """
+        if self._entries is None:
+            self._entries = self._load()
+        try:
+            entry_fingerprint, output, last_used = self._entries[statement]
+        except KeyError:
+            return None
+        if entry_fingerprint != fingerprint:
+            return None
+        self._entries[statement] = (entry_fingerprint, output, time.time())
+        self._changed = True
+        return output
+
+    def put(self, statement, fingerprint, output):
+        """
+        Store the output of STATEMENT.
+        """
+        if self._entries is None:
+            self._entries = self._load()
+        self._entries[statement] = (fingerprint, output, time.time())
+        self._changed = True
+
+    def save(self):
+        """
+        Write the cache, merged with the entries other builds saved
+        meanwhile.
+        """
+        self._path_fingerprints = {}
+        if not self._changed:
+            return
+        entries = self._load()
+        for key, entry in self._entries.items():
+            if key not in entries or entries[key][2] < entry[2]:
+                entries[key] = entry
+        if len(entries) > self.MAX_ENTRIES:
+            keys = sorted(entries, key=lambda key: entries[key][2])
+            for key in keys[:len(entries) - self.MAX_ENTRIES]:
+                del entries[key]
+        try:
+            save_file_atomically(self.filename, marshal.dumps(entries))
+        except (IOError, OSError) as e:
+            logger.debug('Cannot write hook query cache %s: %s',
+                         self.filename, e)
+        self._entries = entries
+        self._changed = False
+
+
+_query_cache = None
+
+
+def _get_query_cache():
+    """
+    Return the `_QueryCache` in PyInstaller's cache directory _or_ `None`
+    if there is no cache directory configured.
+    """
+    global _query_cache
+    from ...config import CONF
+    cache_dir = CONF.get('cachedir')
+    if not cache_dir:
+        return None
+    if _query_cache is None or not _query_cache.filename.startswith(
+            os.path.join(cache_dir, '')):
+        if _query_cache is not None:
+            _query_cache.save()
+        else:
+            atexit.register(_save_query_cache)
+        _query_cache = _QueryCache(cache_dir)
+    return _query_cache
+
+
+def _save_query_cache():
+    if _query_cache is not None:
+        _query_cache.save()
+
+
+def _exec_statement_cached(module_name, statement):
+    """
+    Like `exec_statement()`, but cache the output as long as the
+    distribution providing module MODULE_NAME is unchanged.
+    """
+    statement = textwrap.dedent(statement)
+    query_cache = _get_query_cache()
+    fingerprint = None
+    if query_cache is not None:
+        fingerprint = query_cache.fingerprint(module_name)
+    if fingerprint is None:
+        return exec_statement(statement)
+    output = query_cache.get(statement, fingerprint)
+    if output is None:
+        output = exec_statement(statement)
+        query_cache.put(statement, fingerprint, output)
+    return output
+
+
 def get_pyextension_imports(modname):
     """
     Return list of modules required by binary (C/C++) Python extension.
@@ -149,7 +487,8 @@ def get_pyextension_imports(modname):
         # Print module list to stdout.
         print(list(diff))
     """ % {'modname': modname}
-    module_imports = eval_statement(statement)
+    txt = _exec_statement_cached(modname, statement).strip()
+    module_imports = eval(txt) if txt else ''
 
     if not module_imports:
         logger.error('Cannot find imports for module %s' % modname)
@@ -281,7 +620,7 @@ def get_module_attribute(module_name, attr_name):
     # undefined, which should be sufficiently obscure as to avoid collisions
     # with actual attribute values. That's the hope, anyway.
     attr_value_if_undefined = '!)ABadCafe@(D15ea5e#*DeadBeef$&Fee1Dead%^'
-    attr_value = exec_statement("""
+    attr_value = _exec_statement_cached(module_name, """
         import %s as m
         print(getattr(m, %r, %r))
     """ % (module_name, attr_name, attr_value_if_undefined))
@@ -332,7 +671,7 @@ def get_module_file_attribute(package):
                 # If p lacks a file attribute, hide the exception.
                 pass
         """
-        attr = exec_statement(__file__statement % package)
+        attr = _exec_statement_cached(package, __file__statement % package)
         if not attr.strip():
             raise ImportError
     return attr
@@ -577,7 +916,7 @@ def collect_submodules(package, filter=lambda name: True):
 
     # Walk the package. Since this performs imports, do it in a separate
     # process.
-    names = exec_statement("""
+    names = _exec_statement_cached(package, """
         import sys
         import pkgutil
 
@@ -0,0 +1,133 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2019, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+"""
+Run the statements of `PyInstaller.utils.hooks.exec_statement()`.
+
+This interpreter is started once and reads requests from stdin. For each
+statement it forks a child process, which runs the statement like
+``python -c statement`` would. So statements can not affect each other, but
+do not pay for starting an interpreter. The output of the child is sent back
+on stdout.
+
+Requests and responses are marshalled and prefixed by their length as a
+32-bit big-endian unsigned integer. A request is the tuple ``(cwd, statement)``, a
+response the tuple ``(status, output)``, where `status` is the status
+returned by `os.waitpid()`.
+
+This script must not leave any modules imported that are not imported by
+every interpreter anyway, as the statements would see them.
+"""
+
+import os
+import sys
+
+# Python 2 does not import `marshal` on startup, it is dropped again before
+# running a statement.
+_marshal_imported = 'marshal' in sys.modules
+import marshal
+
+_builtins = __builtins__
+
+
+def _unpack_size(header):
+    # Like ``struct.unpack('!I', header)[0]``, but `struct` is not imported
+    # on startup.
+    size = 0
+    for byte in bytearray(header):
+        size = size << 8 | byte
+    return size
+
+
+def _pack_size(size):
+    return bytes(bytearray([size >> 24 & 0xff, size >> 16 & 0xff,
+                            size >> 8 & 0xff, size & 0xff]))
+
+
+def _read(fd, size):
+    data = b''
+    while len(data) < size:
+        chunk = os.read(fd, size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def _write(fd, data):
+    while data:
+        data = data[os.write(fd, data):]
+
+
+def _serve(fd_in, fd_out):
+    # Return the statement to run in a child process, or None when the
+    # client closed stdin.
+    while True:
+        header = _read(fd_in, 4)
+        if header is None:
+            return None
+        cwd, statement = marshal.loads(
+            _read(fd_in, _unpack_size(header)))
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            os.close(fd_in)
+            os.close(fd_out)
+            os.dup2(write_fd, 1)
+            os.close(write_fd)
+            os.chdir(cwd)
+            return statement
+        os.close(write_fd)
+        chunks = []
+        while True:
+            chunk = os.read(read_fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        os.close(read_fd)
+        status = os.waitpid(pid, 0)[1]
+        response = marshal.dumps((status, b''.join(chunks)))
+        _write(fd_out, _pack_size(len(response)) + response)
+
+
+def main():
+    # Move the requests and responses off stdin and stdout, so the output
+    # of the statements can not get mixed up with them.
+    fd_in = os.dup(0)
+    fd_out = os.dup(1)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+    # Like ``python -c``.
+    sys.argv[:] = ['-c']
+    sys.path[0] = ''
+    return _serve(fd_in, fd_out)
+
+
+def _run(statement):
+    code = compile(statement, '<string>', 'exec')
+    # Run the statement in an empty `__main__` module. This clears the
+    # globals of this script, too.
+    namespace = sys.modules['__main__'].__dict__
+    builtins = _builtins
+    if not _marshal_imported:
+        del sys.modules['marshal']
+    namespace.clear()
+    namespace.update(__name__='__main__', __doc__=None, __package__=None,
+                     __spec__=None, __builtins__=builtins)
+    exec(code, namespace)
+
+
+if __name__ == '__main__':
+    statement = main()
+    if statement is not None:
+        _run(statement)
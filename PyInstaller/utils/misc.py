@@ -17,9 +17,10 @@ import os
 import pprint
 import py_compile
 import sys
+import tempfile
 
 from PyInstaller import log as logging
-from PyInstaller.compat import BYTECODE_MAGIC, is_py2, text_read_mode
+from PyInstaller.compat import BYTECODE_MAGIC, is_py2, is_win, text_read_mode
 
 logger = logging.getLogger(__name__)
 
@@ -231,6 +232,62 @@ def load_py_data_struct(filename):
         return eval(f.read())
 
 
+def save_file_atomically(filename, data):
+    """
+    Write binary data into a file, so that concurrent readers never see a
+    partially written file.
+
+    The data is first written into a temporary file in the same directory,
+    which then replaces the target file. This allows several builds to share
+    a cache directory.
+    """
+    fd, tmpname = make_temp_file_for(filename)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        replace_file(tmpname, filename)
+    except:
+        if os.path.exists(tmpname):
+            os.remove(tmpname)
+        raise
+
+
+def make_temp_file_for(filename):
+    """
+    Create a temporary file in the directory of `filename`, creating the
+    directory if required. Once written, the temporary file may replace
+    `filename` by `replace_file()`.
+
+    Return the tuple ``(fd, tmpname)`` like `tempfile.mkstemp()`.
+    """
+    dirname = os.path.dirname(filename)
+    if not os.path.isdir(dirname):
+        try:
+            os.makedirs(dirname)
+        except OSError:
+            # Another process might have created the directory meanwhile.
+            if not os.path.isdir(dirname):
+                raise
+    return tempfile.mkstemp(prefix=os.path.basename(filename) + '.',
+                            suffix='.tmp', dir=dirname)
+
+
+def replace_file(src, dst):
+    """
+    Rename file `src` to `dst`, replacing `dst` if it exists.
+
+    This is atomic, except on Windows with Python 2.
+    """
+    if hasattr(os, 'replace'):
+        os.replace(src, dst)
+    else:
+        # Python 2: os.rename() does not replace existing files on
+        # Windows.
+        if is_win and os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
 def absnormpath(apath):
     return os.path.abspath(os.path.normpath(apath))
 
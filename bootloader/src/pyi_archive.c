@@ -30,6 +30,11 @@
     #include <string.h>   /* strncmp, strcpy, strcat */
     #include <sys/stat.h> /* fchmod */
 #endif /* ifdef _WIN32 */
+#ifdef __linux__
+    #include <sys/sendfile.h> /* sendfile */
+    #include <sys/syscall.h>  /* SYS_memfd_create */
+    #include <unistd.h>       /* close, dup, ftruncate, getpid */
+#endif
 #include <stddef.h>  /* ptrdiff_t */
 #include <stdio.h>
 
@@ -139,21 +144,16 @@ decompress(unsigned char * buff, TOC *ptoc)
 }
 
 /*
- * Extract an archive entry.
+ * Read and decompress an archive entry from FP.
  * Returns pointer to the data (must be freed).
  */
-unsigned char *
-pyi_arch_extract(ARCHIVE_STATUS *status, TOC *ptoc)
+static unsigned char *
+pyi_arch_read_entry(ARCHIVE_STATUS *status, FILE *fp, TOC *ptoc)
 {
     unsigned char *data;
     unsigned char *tmp;
 
-    if (pyi_arch_open_fp(status) != 0) {
-        OTHERERROR("Cannot open archive file\n");
-        return NULL;
-    }
-
-    fseek(status->fp, status->pkgstart + ntohl(ptoc->pos), SEEK_SET);
+    fseek(fp, status->pkgstart + ntohl(ptoc->pos), SEEK_SET);
     data = (unsigned char *)malloc(ntohl(ptoc->len));
 
     if (data == NULL) {
@@ -161,7 +161,7 @@ pyi_arch_extract(ARCHIVE_STATUS *status, TOC *ptoc)
         return NULL;
     }
 
-    if (fread(data, ntohl(ptoc->len), 1, status->fp) < 1) {
+    if (fread(data, ntohl(ptoc->len), 1, fp) < 1) {
         OTHERERROR("Could not read from file\n");
         free(data);
         return NULL;
@@ -177,51 +177,313 @@ pyi_arch_extract(ARCHIVE_STATUS *status, TOC *ptoc)
             return NULL;
         }
     }
+    return data;
+}
+
+/*
+ * Extract an archive entry.
+ * Returns pointer to the data (must be freed).
+ */
+unsigned char *
+pyi_arch_extract(ARCHIVE_STATUS *status, TOC *ptoc)
+{
+    unsigned char *data;
+
+    if (pyi_arch_open_fp(status) != 0) {
+        OTHERERROR("Cannot open archive file\n");
+        return NULL;
+    }
+
+    data = pyi_arch_read_entry(status, status->fp, ptoc);
 
     pyi_arch_close_fp(status);
     return data;
 }
 
+/* Size of the buffers used to stream an entry to the filesystem. */
+#define PYI_ARCH_CHUNK 65536
+
 /*
- * Extract from the archive and copy to the filesystem.
- * The path is relative to the directory the archive is in.
+ * Write the data of the entry, read from FP, to OUT.
+ *
+ * The data are read and, if compressed, inflated piece by piece through
+ * fixed-size buffers. So extracting a large entry does not need memory
+ * for the whole compressed and uncompressed data.
  */
-int
-pyi_arch_extract2fs(ARCHIVE_STATUS *status, TOC *ptoc)
+static int
+pyi_arch_stream_entry(ARCHIVE_STATUS *status, FILE *fp, TOC *ptoc, FILE *out)
 {
-    FILE *out;
-    size_t result, len;
-    unsigned char *data = pyi_arch_extract(status, ptoc);
+    unsigned char *in_buf;
+    unsigned char *out_buf;
+    unsigned long remaining = ntohl(ptoc->len);
+    unsigned long written = 0;
+    size_t chunk, have;
+    z_stream zstream;
+    int rc = Z_OK;
 
-    /* Create tmp dir _MEIPASSxxx. */
-    if (pyi_create_temp_path(status) == -1) {
+    if (fseek(fp, status->pkgstart + ntohl(ptoc->pos), SEEK_SET) != 0) {
+        OTHERERROR("Could not seek to %s\n", ptoc->name);
         return -1;
     }
 
-    out = pyi_open_target(status->temppath, ptoc->name);
-    len = ntohl(ptoc->ulen);
+    in_buf = (unsigned char *)malloc(2 * PYI_ARCH_CHUNK);
 
-    if (out == NULL) {
-        FATAL_PERROR("fopen", "%s could not be extracted!\n", ptoc->name);
+    if (in_buf == NULL) {
+        OTHERERROR("Could not allocate read buffer\n");
         return -1;
     }
-    else {
-        result = fwrite(data, len, 1, out);
+    out_buf = in_buf + PYI_ARCH_CHUNK;
 
-        if ((1 != result) && (len > 0)) {
-            FATAL_PERROR("fwrite", "Failed to write all bytes for %s\n", ptoc->name);
+    if (ptoc->cflag == '\1') {
+        zstream.zalloc = NULL;
+        zstream.zfree = NULL;
+        zstream.opaque = NULL;
+        zstream.next_in = NULL;
+        zstream.avail_in = 0;
+        rc = inflateInit(&zstream);
+
+        if (rc != Z_OK) {
+            OTHERERROR("Error %d from inflateInit: %s\n", rc, zstream.msg);
+            free(in_buf);
             return -1;
         }
-#ifndef WIN32
-        fchmod(fileno(out), S_IRUSR | S_IWUSR | S_IXUSR);
+    }
+
+    while (remaining > 0 && rc != Z_STREAM_END) {
+        chunk = remaining < PYI_ARCH_CHUNK ? remaining : PYI_ARCH_CHUNK;
+
+        if (fread(in_buf, chunk, 1, fp) < 1) {
+            OTHERERROR("Could not read from file\n");
+            goto error;
+        }
+        remaining -= chunk;
+
+        if (ptoc->cflag != '\1') {
+            if (fwrite(in_buf, chunk, 1, out) < 1) {
+                FATAL_PERROR("fwrite", "Failed to write all bytes for %s\n", ptoc->name);
+                goto error;
+            }
+            written += chunk;
+            continue;
+        }
+
+        zstream.next_in = in_buf;
+        zstream.avail_in = chunk;
+
+        /* Inflate until the input is used up or the stream ends. */
+        do {
+            zstream.next_out = out_buf;
+            zstream.avail_out = PYI_ARCH_CHUNK;
+            rc = (inflate)(&zstream, Z_NO_FLUSH);
+
+            /* Z_BUF_ERROR only means no progress was possible; read more. */
+            if (rc != Z_OK && rc != Z_STREAM_END && rc != Z_BUF_ERROR) {
+                OTHERERROR("Error %d from inflate: %s\n", rc, zstream.msg);
+                goto error;
+            }
+            have = PYI_ARCH_CHUNK - zstream.avail_out;
+
+            if (have > 0 && fwrite(out_buf, have, 1, out) < 1) {
+                FATAL_PERROR("fwrite", "Failed to write all bytes for %s\n", ptoc->name);
+                goto error;
+            }
+            written += have;
+        } while (zstream.avail_out == 0 && rc != Z_STREAM_END);
+    }
+
+    if (ptoc->cflag == '\1') {
+        (inflateEnd)(&zstream);
+    }
+    free(in_buf);
+
+    if (written != ntohl(ptoc->ulen)) {
+        OTHERERROR("Error decompressing %s\n", ptoc->name);
+        return -1;
+    }
+    return 0;
+
+error:
+    if (ptoc->cflag == '\1') {
+        (inflateEnd)(&zstream);
+    }
+    free(in_buf);
+    return -1;
+}
+
+#ifdef __linux__
+
+#ifndef MFD_CLOEXEC
+    #define MFD_CLOEXEC 0x0001U
 #endif
-        fclose(out);
+
+/*
+ * Create an anonymous memory file for the entry.
+ * Returns the file descriptor, or -1 if memfd files are not available.
+ */
+static int
+pyi_arch_memfd_create(TOC *ptoc)
+{
+#ifdef SYS_memfd_create
+    char name[64];
+
+    /* The name only shows up in /proc, it does not need to be unique. */
+    snprintf(name, sizeof(name), "%s", ptoc->name);
+    /* Called directly, as glibc has a wrapper since 2.27 only. */
+    return syscall(SYS_memfd_create, name, MFD_CLOEXEC);
+#else
+    return -1;
+#endif
+}
+
+/*
+ * Copy the uncompressed entry from FP to FD within the kernel.
+ * Returns 0 on success, -1 on failure.
+ */
+static int
+pyi_arch_sendfile_entry(ARCHIVE_STATUS *status, FILE *fp, TOC *ptoc, int fd)
+{
+    off_t offset = status->pkgstart + ntohl(ptoc->pos);
+    size_t remaining = ntohl(ptoc->len);
+    ssize_t sent;
+
+    while (remaining > 0) {
+        sent = sendfile(fd, fileno(fp), &offset, remaining);
+
+        if (sent <= 0) {
+            return -1;
+        }
+        remaining -= sent;
+    }
+    return 0;
+}
+
+/*
+ * Extract the entry, read from FP, into a memfd file and link it from the
+ * temporary directory as /proc/<pid>/fd/<fd>. The descriptor stays open
+ * until the bootloader exits after the application, so the application
+ * loads the binary through the link from memory.
+ *
+ * Returns 0 on success, -1 on failure, and 1 if no memfd file could be
+ * set up, so the entry is to be extracted into a file instead.
+ */
+static int
+pyi_arch_write2memfd(ARCHIVE_STATUS *status, FILE *fp, TOC *ptoc)
+{
+    char target[64];
+    FILE *out = NULL;
+    int fd, rc;
+
+    fd = pyi_arch_memfd_create(ptoc);
+
+    if (fd == -1) {
+        VS("LOADER: Cannot create memfd file for %s\n", ptoc->name);
+        return 1;
+    }
+
+    if (ptoc->cflag == '\1' || pyi_arch_sendfile_entry(status, fp, ptoc, fd) != 0) {
+        /* Start over if sendfile() failed half-way. */
+        if (ftruncate(fd, 0) == 0 && lseek(fd, 0, SEEK_SET) == 0) {
+            out = fdopen(dup(fd), "wb");
+        }
+
+        if (out == NULL) {
+            close(fd);
+            return 1;
+        }
+        rc = pyi_arch_stream_entry(status, fp, ptoc, out);
+
+        if (fclose(out) != 0 || rc != 0) {
+            close(fd);
+            return -1;
+        }
     }
-    free(data);
 
+    snprintf(target, sizeof(target), "/proc/%d/fd/%d", (int) getpid(), fd);
+
+    if (pyi_link_target(status->temppath, ptoc->name, target) != 0) {
+        FATAL_PERROR("symlink", "%s could not be extracted!\n", ptoc->name);
+        close(fd);
+        return -1;
+    }
     return 0;
 }
 
+#endif /* ifdef __linux__ */
+
+/*
+ * Extract the entry, read from FP, to the filesystem.
+ */
+static int
+pyi_arch_write2fs(ARCHIVE_STATUS *status, FILE *fp, TOC *ptoc)
+{
+    FILE *out;
+    int rc;
+
+#ifdef __linux__
+
+    if (status->use_memfd && ptoc->typcd == ARCHIVE_ITEM_BINARY) {
+        rc = pyi_arch_write2memfd(status, fp, ptoc);
+
+        if (rc != 1) {
+            return rc;
+        }
+    }
+#endif
+
+    out = pyi_open_target(status->temppath, ptoc->name);
+
+    if (out == NULL) {
+        FATAL_PERROR("fopen", "%s could not be extracted!\n", ptoc->name);
+        return -1;
+    }
+    rc = pyi_arch_stream_entry(status, fp, ptoc, out);
+#ifndef WIN32
+    fchmod(fileno(out), S_IRUSR | S_IWUSR | S_IXUSR);
+#endif
+
+    if (fclose(out) != 0 && rc == 0) {
+        FATAL_PERROR("fclose", "Failed to write all bytes for %s\n", ptoc->name);
+        rc = -1;
+    }
+    return rc;
+}
+
+/*
+ * Extract from the archive and copy to the filesystem.
+ * The path is relative to the directory the archive is in.
+ */
+int
+pyi_arch_extract2fs(ARCHIVE_STATUS *status, TOC *ptoc)
+{
+    int rc;
+
+    /* Create tmp dir _MEIPASSxxx. */
+    if (pyi_create_temp_path(status) == -1) {
+        return -1;
+    }
+
+    if (pyi_arch_open_fp(status) != 0) {
+        OTHERERROR("Cannot open archive file\n");
+        return -1;
+    }
+
+    rc = pyi_arch_write2fs(status, status->fp, ptoc);
+
+    pyi_arch_close_fp(status);
+    return rc;
+}
+
+/*
+ * Like pyi_arch_extract2fs(), but read the entry from FP, which is opened
+ * by the caller. So several threads, each with its own FP, can extract
+ * entries at once. The temporary directory must exist already.
+ */
+int
+pyi_arch_extract2fs_fp(ARCHIVE_STATUS *status, FILE *fp, TOC *ptoc)
+{
+    return pyi_arch_write2fs(status, fp, ptoc);
+}
+
 /*
  * Look for the predefined string MAGIC in the embedded data before the given
  * search end position. If MAGIC is found, copies the entire COOKIE struct into
@@ -476,6 +738,8 @@ pyi_arch_set_paths(ARCHIVE_STATUS *status, char const * archivePath,
      * by temppath if it is available.
      */
     status->has_temp_directory = false;
+    status->has_cache_directory = false;
+    status->use_memfd = false;
     strcpy(status->mainpath, status->homepath);
 
     return 0;
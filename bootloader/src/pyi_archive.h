@@ -82,6 +82,18 @@ typedef struct _archive_status {
      * in this mode.
      */
     bool has_temp_directory;
+    /*
+     * Flag if temppath is the persistent extraction cache directory
+     * (option pyi-extraction-cache). It is kept on exit then.
+     */
+    bool has_cache_directory;
+    /* Lock held while extracting into the cache directory. */
+    int cache_lock;
+    /*
+     * Flag if binaries are extracted into memfd files, linked from temppath
+     * (option pyi-memfd-binaries, Linux only).
+     */
+    bool use_memfd;
     /*
      * Flag if Python library was loaded. This indicates if it is safe
      * to call function PI_Py_Finalize(). If Python dll is missing
@@ -102,6 +114,7 @@ TOC *pyi_arch_increment_toc_ptr(const ARCHIVE_STATUS *status, const TOC* ptoc);
 
 unsigned char *pyi_arch_extract(ARCHIVE_STATUS *status, TOC *ptoc);
 int pyi_arch_extract2fs(ARCHIVE_STATUS *status, TOC *ptoc);
+int pyi_arch_extract2fs_fp(ARCHIVE_STATUS *status, FILE *fp, TOC *ptoc);
 
 /**
  * Helpers for embedders
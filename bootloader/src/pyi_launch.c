@@ -32,6 +32,12 @@
     #include <langinfo.h> /* CODESET, nl_langinfo */
     #include <limits.h>   /* PATH_MAX */
     #include <stdlib.h>   /* malloc */
+    #include <unistd.h>   /* sysconf */
+#endif
+#ifdef __linux__
+    #include <pthread.h>
+    /* Extract files in onefile mode by several threads. */
+    #define PYI_EXTRACT_THREADS
 #endif
 #include <locale.h>  /* setlocale */
 #include <stdarg.h>
@@ -52,6 +58,9 @@
 /* Max count of possible opened archives in multipackage mode. */
 #define _MAX_ARCHIVE_POOL_LEN 20
 
+/* Max count of threads extracting files. */
+#define _MAX_EXTRACT_THREADS 8
+
 /*
  * The functions in this file defined in reverse order so that forward
  * declarations are not necessary.
@@ -294,6 +303,148 @@ pyi_launch_need_to_extract_binaries(ARCHIVE_STATUS *archive_status)
     return false;
 }
 
+/* Check if the entry is a file to extract into the temporary directory. */
+static bool
+_is_extracted(const TOC *ptoc)
+{
+    return ptoc->typcd == ARCHIVE_ITEM_BINARY || ptoc->typcd == ARCHIVE_ITEM_DATA ||
+           ptoc->typcd == ARCHIVE_ITEM_ZIPFILE;
+}
+
+#ifdef PYI_EXTRACT_THREADS
+
+/* State shared by the threads extracting files. */
+typedef struct _extract_state {
+    ARCHIVE_STATUS *status;
+    pthread_mutex_t lock;
+    TOC *            next;     /* Next entry to look at. */
+    int              retcode;  /* Set to -1 by the first failing thread. */
+} EXTRACT_STATE;
+
+/* Return the next entry to extract, or NULL when done or after an error. */
+static TOC *
+_next_extract_entry(EXTRACT_STATE *state)
+{
+    TOC *ptoc = NULL;
+
+    pthread_mutex_lock(&state->lock);
+
+    while (state->retcode == 0 && state->next < state->status->tocend) {
+        if (_is_extracted(state->next)) {
+            ptoc = state->next;
+        }
+        state->next = pyi_arch_increment_toc_ptr(state->status, state->next);
+
+        if (ptoc != NULL) {
+            break;
+        }
+    }
+    pthread_mutex_unlock(&state->lock);
+    return ptoc;
+}
+
+static void *
+_extract_thread(void *arg)
+{
+    EXTRACT_STATE *state = (EXTRACT_STATE *) arg;
+    FILE *fp;
+    TOC *ptoc;
+
+    /* Every thread reads the archive through its own file. */
+    fp = pyi_path_fopen(state->status->archivename, "rb");
+
+    if (fp == NULL) {
+        FATAL_PERROR("fopen", "Cannot open archive %s\n", state->status->archivename);
+        pthread_mutex_lock(&state->lock);
+        state->retcode = -1;
+        pthread_mutex_unlock(&state->lock);
+        return NULL;
+    }
+
+    while ((ptoc = _next_extract_entry(state)) != NULL) {
+        if (pyi_arch_extract2fs_fp(state->status, fp, ptoc)) {
+            pthread_mutex_lock(&state->lock);
+            state->retcode = -1;
+            pthread_mutex_unlock(&state->lock);
+            break;
+        }
+    }
+    pyi_path_fclose(fp);
+    return NULL;
+}
+
+/*
+ * Extract all binaries, data files and zipfiles by up to
+ * _MAX_EXTRACT_THREADS threads. Decompressing is CPU bound, and the entries
+ * are independent of each other.
+ *
+ * Returns 1 if there are too few entries or CPUs to use threads, so the
+ * caller has to extract the files itself.
+ */
+static int
+_extract_files_parallel(ARCHIVE_STATUS *archive_status)
+{
+    pthread_t threads[_MAX_EXTRACT_THREADS];
+    EXTRACT_STATE state;
+    TOC *ptoc;
+    long nthreads;
+    int count = 0;
+    int i;
+
+    nthreads = sysconf(_SC_NPROCESSORS_ONLN);
+
+    for (ptoc = archive_status->tocbuff; ptoc < archive_status->tocend;
+         ptoc = pyi_arch_increment_toc_ptr(archive_status, ptoc)) {
+        if (_is_extracted(ptoc)) {
+            count++;
+        }
+    }
+
+    if (nthreads > count) {
+        nthreads = count;
+    }
+
+    if (nthreads > _MAX_EXTRACT_THREADS) {
+        nthreads = _MAX_EXTRACT_THREADS;
+    }
+
+    if (nthreads < 2) {
+        return 1;
+    }
+
+    /* The threads must not create the directory concurrently. */
+    if (pyi_create_temp_path(archive_status) == -1) {
+        return -1;
+    }
+
+    VS("LOADER: Extracting files by %ld threads\n", nthreads);
+    state.status = archive_status;
+    state.next = archive_status->tocbuff;
+    state.retcode = 0;
+    pthread_mutex_init(&state.lock, NULL);
+
+    for (i = 0; i < nthreads; i++) {
+        if (pthread_create(&threads[i], NULL, _extract_thread, &state) != 0) {
+            VS("LOADER: Cannot create extraction thread\n");
+            break;
+        }
+    }
+
+    if (i == 0) {
+        /* Not even one thread; extract in this one. */
+        _extract_thread(&state);
+    }
+
+    while (i > 0) {
+        pthread_join(threads[--i], NULL);
+    }
+    pthread_mutex_destroy(&state.lock);
+
+    return state.retcode;
+}
+
+#endif /* ifdef PYI_EXTRACT_THREADS */
+
 /*
  * Extract all binaries (type 'b') and all data files (type 'x') to the filesystem
  * and checks for dependencies (type 'd'). If dependencies are found, extract them.
@@ -307,6 +458,8 @@ pyi_launch_extract_binaries(ARCHIVE_STATUS *archive_status)
 {
     int retcode = 0;
     ptrdiff_t index = 0;
+    char *cache_key;
+    bool extract_files = true;
 
     /*
      * archive_pool[0] is reserved for the main process, the others for dependencies.
@@ -314,6 +467,34 @@ pyi_launch_extract_binaries(ARCHIVE_STATUS *archive_status)
     ARCHIVE_STATUS *archive_pool[_MAX_ARCHIVE_POOL_LEN];
     TOC * ptoc = archive_status->tocbuff;
 
+    /*
+     * With the extraction cache, files extracted by a previous launch are
+     * reused. If there is no usable cache directory, extract into a
+     * temporary directory as usual.
+     */
+    cache_key = pyi_arch_get_option(archive_status, "pyi-extraction-cache");
+
+    if (cache_key != NULL && pyi_launch_need_to_extract_binaries(archive_status)) {
+        VS("LOADER: Found extraction-cache %s\n", cache_key);
+
+        if (pyi_cache_open(archive_status, cache_key) == 1) {
+            return 0;
+        }
+    }
+
+#ifdef __linux__
+
+    /*
+     * Keep binaries in memfd files, linked through /proc. They do not
+     * survive the process, so not with the extraction cache.
+     */
+    if (pyi_arch_get_option(archive_status, "pyi-memfd-binaries") != NULL &&
+        !archive_status->has_cache_directory && access("/proc/self/fd", F_OK) == 0) {
+        VS("LOADER: Extracting binaries into memfd files\n");
+        archive_status->use_memfd = true;
+    }
+#endif
+
     /* Clean memory for archive_pool list. */
     memset(&archive_pool, 0, _MAX_ARCHIVE_POOL_LEN * sizeof(ARCHIVE_STATUS *));
 
@@ -322,10 +503,23 @@ pyi_launch_extract_binaries(ARCHIVE_STATUS *archive_status)
 
     VS("LOADER: Extracting binaries\n");
 
+#ifdef PYI_EXTRACT_THREADS
+
+    switch (_extract_files_parallel(archive_status)) {
+    case 0:
+        /* Only dependencies are left to extract below. */
+        extract_files = false;
+        break;
+    case -1:
+        retcode = -1;
+        ptoc = archive_status->tocend;
+        break;
+    }
+#endif
+
     while (ptoc < archive_status->tocend) {
-        if (ptoc->typcd == ARCHIVE_ITEM_BINARY || ptoc->typcd == ARCHIVE_ITEM_DATA ||
-            ptoc->typcd == ARCHIVE_ITEM_ZIPFILE) {
-            if (pyi_arch_extract2fs(archive_status, ptoc)) {
+        if (_is_extracted(ptoc)) {
+            if (extract_files && pyi_arch_extract2fs(archive_status, ptoc)) {
                 retcode = -1;
                 break;  /* No need to extract other items in case of error. */
             }
@@ -352,6 +546,10 @@ pyi_launch_extract_binaries(ARCHIVE_STATUS *archive_status)
         pyi_arch_status_free_memory(archive_pool[index]);
     }
 
+    if (archive_status->has_cache_directory == true) {
+        pyi_cache_close(archive_status, retcode == 0);
+    }
+
     return retcode;
 }
 
@@ -181,7 +181,8 @@ pyi_main(int argc, char * argv[])
 
         VS("LOADER: Doing cleanup\n");
 
-        if (archive_status->has_temp_directory == true) {
+        if (archive_status->has_temp_directory == true &&
+            archive_status->has_cache_directory != true) {
             pyi_remove_temp_path(archive_status->temppath);
         }
         pyi_arch_status_free_memory(archive_status);
@@ -24,6 +24,8 @@
     #include <signal.h>  /* signal */
 #else
     #include <dirent.h>
+    #include <fcntl.h>     /* open, O_CREAT */
+    #include <sys/file.h>  /* flock */
 /*
  * On AIX  RTLD_MEMBER  flag is only visible when _ALL_SOURCE flag is defined.
  *
@@ -80,6 +82,10 @@ typedef void (*sighandler_t)(int);
 #include "pyi_utils.h"
 #include "pyi_win32_utils.h"
 
+#ifdef _WIN32
+    #define strtok_r strtok_s
+#endif
+
 /*
  *  global variables that are used to copy argc/argv, so that PyIstaller can manipulate them
  *  if need be.  One case in which the incoming argc/argv is manipulated is in the case of
@@ -522,6 +528,200 @@ pyi_remove_temp_path(const char *dir)
 }
 #endif /* ifdef _WIN32 */
 
+/*
+ * Persistent extraction cache for onefile mode (option pyi-extraction-cache).
+ *
+ * Instead of a fresh _MEIxxxxxx directory, the files are extracted into a
+ * directory named after the content hash of the archive. It is kept on exit
+ * and reused by later launches. Launches extract under an exclusive lock on
+ * a file next to the directory, and mark the extraction complete by creating
+ * PYI_CACHE_MARKER in the directory once all files were written. A directory
+ * without the marker is left over from an interrupted launch and is
+ * extracted again.
+ */
+#define PYI_CACHE_MARKER ".pyi-complete"
+
+#ifdef _WIN32
+
+int
+pyi_cache_open(ARCHIVE_STATUS *status, const char *key)
+{
+    /* Not supported, extract into a temporary directory. */
+    return -1;
+}
+
+void
+pyi_cache_close(ARCHIVE_STATUS *status, bool complete)
+{
+}
+
+#else /* ifdef _WIN32 */
+
+/*
+ * Put the path of the cache directory for KEY into BUFF: a directory of
+ * the current user in the first usable location a temporary directory would
+ * be created in.
+ */
+static int
+pyi_get_cache_path(char *buff, const char *runtime_tmpdir, const char *key)
+{
+    static const char *envname[] = {
+        "TMPDIR", "TEMP", "TMP", 0
+    };
+    static const char *dirname[] = {
+        "/tmp", "/var/tmp", "/usr/tmp", 0
+    };
+    char base[PATH_MAX];
+    char *p;
+    int i;
+
+    base[0] = PYI_NULLCHAR;
+
+    if (runtime_tmpdir != NULL) {
+        strncpy(base, runtime_tmpdir, PATH_MAX - 1);
+        base[PATH_MAX - 1] = PYI_NULLCHAR;
+    }
+
+    for (i = 0; envname[i] && base[0] == PYI_NULLCHAR; i++) {
+        p = pyi_getenv(envname[i]);
+
+        if (p) {
+            if (access(p, W_OK | X_OK) == 0 && strlen(p) < PATH_MAX) {
+                strcpy(base, p);
+            }
+            free(p);
+        }
+    }
+
+    for (i = 0; dirname[i] && base[0] == PYI_NULLCHAR; i++) {
+        if (access(dirname[i], W_OK | X_OK) == 0) {
+            strcpy(base, dirname[i]);
+        }
+    }
+
+    if (base[0] == PYI_NULLCHAR) {
+        return -1;
+    }
+
+    /* On OSX the value from $TMPDIR ends with '/'. */
+    if (base[strlen(base) - 1] == PYI_SEP) {
+        base[strlen(base) - 1] = PYI_NULLCHAR;
+    }
+    /* Other users must not be able to take the directory. */
+    if (snprintf(buff, PATH_MAX, "%s%s_MEIC%lu_%s", base, PYI_SEPSTR,
+                 (unsigned long) getuid(), key) >= PATH_MAX) {
+        return -1;
+    }
+    return 0;
+}
+
+/*
+ * Set up the extraction cache directory for KEY as status->temppath.
+ *
+ * Return 1 if the directory was extracted completely before and can be
+ * used as is, 0 if the files have to be extracted into it, followed by
+ * pyi_cache_close(), or -1 if there is no usable cache directory.
+ */
+int
+pyi_cache_open(ARCHIVE_STATUS *status, const char *key)
+{
+    char path[PATH_MAX];
+    char lockname[PATH_MAX];
+    char marker[PATH_MAX];
+    struct stat sbuf;
+    int fd;
+
+    if (pyi_get_cache_path(path, pyi_arch_get_option(status, "pyi-runtime-tmpdir"),
+                           key) == -1) {
+        return -1;
+    }
+
+    if (snprintf(lockname, PATH_MAX, "%s.lock", path) >= PATH_MAX ||
+        snprintf(marker, PATH_MAX, "%s%s%s", path, PYI_SEPSTR,
+                 PYI_CACHE_MARKER) >= PATH_MAX) {
+        return -1;
+    }
+
+    /* Wait for other launches extracting into the directory. */
+    fd = open(lockname, O_RDWR | O_CREAT | O_NOFOLLOW, S_IRUSR | S_IWUSR);
+
+    if (fd == -1) {
+        VS("LOADER: Cannot open cache lock %s: %s\n", lockname, strerror(errno));
+        return -1;
+    }
+
+    if (fstat(fd, &sbuf) != 0 || sbuf.st_uid != getuid() ||
+        flock(fd, LOCK_EX) != 0) {
+        VS("LOADER: Cannot lock cache %s\n", path);
+        close(fd);
+        return -1;
+    }
+
+    if (lstat(path, &sbuf) == 0) {
+        if (!S_ISDIR(sbuf.st_mode) || sbuf.st_uid != getuid() ||
+            (sbuf.st_mode & (S_IRWXG | S_IRWXO)) != 0) {
+            VS("LOADER: Cache directory %s is not private\n", path);
+            close(fd);
+            return -1;
+        }
+
+        if (stat(marker, &sbuf) == 0) {
+            VS("LOADER: Reusing cache directory %s\n", path);
+            close(fd);
+            strcpy(status->temppath, path);
+            status->has_temp_directory = true;
+            status->has_cache_directory = true;
+            return 1;
+        }
+        VS("LOADER: Removing incomplete cache directory %s\n", path);
+        pyi_remove_temp_path(path);
+    }
+
+    if (mkdir(path, S_IRWXU) != 0) {
+        VS("LOADER: Cannot create cache directory %s: %s\n", path, strerror(errno));
+        close(fd);
+        return -1;
+    }
+    VS("LOADER: Extracting into cache directory %s\n", path);
+    strcpy(status->temppath, path);
+    status->has_temp_directory = true;
+    status->has_cache_directory = true;
+    status->cache_lock = fd;
+    return 0;
+}
+
+/*
+ * Finish extracting into the cache directory and release the lock. Unless
+ * the extraction is COMPLETE, the directory is left without marker, so the
+ * next launch extracts it again.
+ */
+void
+pyi_cache_close(ARCHIVE_STATUS *status, bool complete)
+{
+    char marker[PATH_MAX];
+    int fd = -1;
+
+    if (complete) {
+        if (snprintf(marker, PATH_MAX, "%s%s%s", status->temppath, PYI_SEPSTR,
+                     PYI_CACHE_MARKER) < PATH_MAX) {
+            fd = open(marker, O_WRONLY | O_CREAT, S_IRUSR | S_IWUSR);
+        }
+
+        if (fd == -1) {
+            /* Remove the directory on exit, like a temporary one. */
+            VS("LOADER: Cannot mark cache directory %s complete\n", status->temppath);
+            status->has_cache_directory = false;
+        }
+        else {
+            close(fd);
+        }
+    }
+    close(status->cache_lock);
+    status->cache_lock = -1;
+}
+
+#endif /* ifdef _WIN32 */
+
 /* TODO is this function still used? Could it be removed? */
 /*
  * If binaries were extracted, this should be called
@@ -536,12 +736,12 @@ cleanUp(ARCHIVE_STATUS *status)
 }
 
 /*
- * helper for extract2fs
- * which may try multiple places
+ * Build the path of the file NAME_ under PATH in FNM, a buffer of PATH_MAX
+ * characters, and create the directories in between.
+ * Returns 0 on success, -1 if the path is too long.
  */
-/* TODO find better name for function. */
-FILE *
-pyi_open_target(const char *path, const char* name_)
+static int
+pyi_target_path(char *fnm, const char *path, const char* name_)
 {
 
 #ifdef _WIN32
@@ -550,9 +750,9 @@ pyi_open_target(const char *path, const char* name_)
 #else
     struct stat sbuf;
 #endif
-    char fnm[PATH_MAX];
     char name[PATH_MAX];
     char *dir;
+    char *saveptr;
     size_t len;
 
     strncpy(fnm, path, PATH_MAX);
@@ -560,21 +760,22 @@ pyi_open_target(const char *path, const char* name_)
 
     /* Check if the path names could be copied */
     if (fnm[PATH_MAX-1] != '\0' || name[PATH_MAX-1] != '\0') {
-        return NULL;
+        return -1;
     }
 
     len = strlen(fnm);
-    dir = strtok(name, PYI_SEPSTR);
+    /* Reentrant, as files are extracted by several threads. */
+    dir = strtok_r(name, PYI_SEPSTR, &saveptr);
 
     while (dir != NULL) {
         len += strlen(dir) + strlen(PYI_SEPSTR);
         /* Check if fnm does not exceed the buffer size */
         if (len >= PATH_MAX-1) {
-            return NULL;
+            return -1;
         }
         strcat(fnm, PYI_SEPSTR);
         strcat(fnm, dir);
-        dir = strtok(NULL, PYI_SEPSTR);
+        dir = strtok_r(NULL, PYI_SEPSTR, &saveptr);
 
         if (!dir) {
             break;
@@ -593,6 +794,29 @@ pyi_open_target(const char *path, const char* name_)
         }
 #endif
     }
+    return 0;
+}
+
+/*
+ * helper for extract2fs
+ * which may try multiple places
+ */
+/* TODO find better name for function. */
+FILE *
+pyi_open_target(const char *path, const char* name_)
+{
+
+#ifdef _WIN32
+    wchar_t wchar_buffer[PATH_MAX];
+    struct _stat sbuf;
+#else
+    struct stat sbuf;
+#endif
+    char fnm[PATH_MAX];
+
+    if (pyi_target_path(fnm, path, name_) == -1) {
+        return NULL;
+    }
 
 #ifdef _WIN32
     pyi_win32_utils_from_utf8(wchar_buffer, fnm, PATH_MAX);
@@ -613,6 +837,23 @@ pyi_open_target(const char *path, const char* name_)
     return pyi_path_fopen(fnm, "wb");
 }
 
+#ifndef _WIN32
+/*
+ * Create the symbolic link NAME_ under PATH pointing to TARGET.
+ * Returns 0 on success, -1 on failure.
+ */
+int
+pyi_link_target(const char *path, const char* name_, const char *target)
+{
+    char fnm[PATH_MAX];
+
+    if (pyi_target_path(fnm, path, name_) == -1) {
+        return -1;
+    }
+    return symlink(target, fnm);
+}
+#endif
+
 /* Copy the file src to dst 4KB per time */
 int
 pyi_copy_file(const char *src, const char *dst, const char *filename)
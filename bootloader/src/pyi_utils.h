@@ -38,9 +38,12 @@ int pyi_unsetenv(const char *variable);
 
 int pyi_create_temp_path(ARCHIVE_STATUS *status);
 void pyi_remove_temp_path(const char *dir);
+int pyi_cache_open(ARCHIVE_STATUS *status, const char *key);
+void pyi_cache_close(ARCHIVE_STATUS *status, bool complete);
 
 /* File manipulation. */
 FILE *pyi_open_target(const char *path, const char* name_);
+int pyi_link_target(const char *path, const char* name_, const char *target);
 int pyi_copy_file(const char *src, const char *dst, const char *filename);
 
 /* Other routines. */
@@ -22,7 +22,8 @@ import pytest
 # -------------
 from PyInstaller.compat import is_darwin, is_win, is_py2, is_py37
 from PyInstaller.utils.tests import importorskip, skipif, skipif_win, \
-    skipif_winorosx, skipif_notwin, skipif_notosx, skipif_no_compiler, xfail
+    skipif_winorosx, skipif_notwin, skipif_notosx, skipif_notlinux, \
+    skipif_no_compiler, xfail
 from PyInstaller.utils.hooks import is_module_satisfies
 
 
@@ -186,6 +187,20 @@ def test_helloworld(pyi_builder):
     pyi_builder.test_source("print('Hello Python!')")
 
 
+def test_import_profile(pyi_builder, monkeypatch, tmpdir):
+    import json
+    profile = tmpdir.join('profile.json')
+    monkeypatch.setenv('PYI_IMPORT_PROFILE', str(profile))
+    pyi_builder.test_source("import email.parser")
+    modules = json.loads(profile.read())
+    names = [module['module'] for module in modules]
+    assert 'email.parser' in names
+    # The parser imports other email modules, so it takes the most time.
+    assert names.index('email.parser') < names.index('email.feedparser')
+    for module in modules:
+        assert module['cumulative'] >= module['exec']
+
+
 def test_module__file__attribute(pyi_builder):
     pyi_builder.test_script('pyi_module__file__attribute.py')
 
@@ -581,3 +596,57 @@ def test_several_scripts2(pyi_builder_spec):
     Verify each script has it's own global vars (basic test).
     """
     pyi_builder_spec.test_spec('several-scripts2.spec')
+
+
+@skipif_win
+def test_option_extraction_cache(pyi_builder):
+    "Test that option `extraction_cache` names and completes the directory."
+    pyi_builder.test_source(
+        """
+        import os
+        import sys
+        if os.path.dirname(sys.executable) != sys._MEIPASS:
+            # onefile mode
+            name = os.path.basename(sys._MEIPASS)
+            if not name.startswith('_MEIC'):
+                raise SystemExit('Not extracted into the cache: ' + name)
+            if not os.path.exists(os.path.join(sys._MEIPASS,
+                                               '.pyi-complete')):
+                raise SystemExit('Cache not marked complete')
+        """,
+        ['--extraction-cache', '--runtime-tmpdir=.'])
+
+
+def test_option_align_binaries(pyi_builder):
+    "Test that option `--align-binaries` aligns the PYZ in the file to 64 KiB."
+    pyi_builder.test_source(
+        """
+        import sys
+        for importer in sys.meta_path:
+            if hasattr(importer, '_pyz_archive'):
+                start = importer._pyz_archive.start
+                if start % 65536:
+                    raise SystemExit('PYZ is not aligned: %d' % start)
+                break
+        else:
+            raise SystemExit('No frozen importer')
+        """,
+        ['--align-binaries'])
+
+
+@skipif_notlinux
+def test_option_memfd_binaries(pyi_builder):
+    "Test that option `--memfd-binaries` links binaries from memory files."
+    pyi_builder.test_source(
+        """
+        import os
+        import sys
+        import _struct
+        if os.path.dirname(sys.executable) != sys._MEIPASS:
+            # onefile mode
+            if not os.path.islink(_struct.__file__):
+                raise SystemExit('Not linked: ' + _struct.__file__)
+            if not os.path.realpath(_struct.__file__).startswith('/memfd:'):
+                raise SystemExit('Not a memfd file: ' + _struct.__file__)
+        """,
+        ['--memfd-binaries'])
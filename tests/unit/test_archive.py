@@ -0,0 +1,170 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2019, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+import os
+
+import pytest
+
+from PyInstaller.compat import is_py2
+from PyInstaller.archive.writers import ZlibArchiveWriter, CArchiveWriter
+from PyInstaller.archive.readers import CArchiveReader
+from PyInstaller.loader.pyimod02_archive import ZlibArchiveReader, \
+    PYZ_TYPE_MODULE, PYZ_TYPE_PKG, PYZ_TYPE_DATA, PYZ_CODEC_STORE, \
+    PYZ_CODEC_LZMA
+
+
+def _make_pyz_toc(tmpdir):
+    toc = []
+    code_dict = {}
+    for i in range(50):
+        name = 'mod%02d' % i
+        code_dict[name] = compile('value = %r\n' % (name * i), name, 'exec')
+        toc.append((name, str(tmpdir.join(name + '.py')), 'PYMODULE'))
+    code_dict['pkg'] = compile('', 'pkg', 'exec')
+    toc.append(('pkg', str(tmpdir.join('pkg', '__init__.py')), 'PYMODULE'))
+    data = tmpdir.join('data.txt')
+    data.write('data' * 1000)
+    toc.append(('data.txt', str(data), 'PYZ'))
+    return toc, code_dict
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+@pytest.mark.parametrize('mapped', [True, False])
+def test_zlib_archive(tmpdir, monkeypatch, jobs, mapped):
+    toc, code_dict = _make_pyz_toc(tmpdir)
+    pyz = str(tmpdir.join('out.pyz'))
+    ZlibArchiveWriter(pyz, toc, code_dict=code_dict, jobs=jobs)
+
+    if not mapped:
+        monkeypatch.setattr(ZlibArchiveReader, '_map_archive', lambda self: None)
+    reader = ZlibArchiveReader(pyz)
+    assert (reader._data is not None) == mapped
+    typ, code = reader.extract('mod03')
+    assert typ == PYZ_TYPE_MODULE
+    namespace = {}
+    exec(code, namespace)
+    assert namespace['value'] == 'mod03' * 3
+    assert reader.extract('pkg')[0] == PYZ_TYPE_PKG
+    assert reader.extract('data.txt') == (PYZ_TYPE_DATA, b'data' * 1000)
+
+
+def test_zlib_archive_parallel_is_reproducible(tmpdir):
+    toc, code_dict = _make_pyz_toc(tmpdir)
+    archives = []
+    for jobs in (1, 4):
+        pyz = tmpdir.join('out%d.pyz' % jobs)
+        ZlibArchiveWriter(str(pyz), toc, code_dict=code_dict, jobs=jobs)
+        archives.append(pyz.read_binary())
+    assert archives[0] == archives[1]
+
+
+@pytest.mark.parametrize('compression', [
+    'store', 'zlib',
+    pytest.param('lzma', marks=pytest.mark.skipif(
+        is_py2, reason='lzma requires Python 3'))])
+def test_zlib_archive_compression(tmpdir, compression):
+    toc, code_dict = _make_pyz_toc(tmpdir)
+    random_data = tmpdir.join('random.bin')
+    random_data.write_binary(os.urandom(64))
+    toc.append(('random.bin', str(random_data), 'PYZ'))
+    pyz = str(tmpdir.join('out.pyz'))
+    ZlibArchiveWriter(pyz, toc, code_dict=code_dict, compression=compression)
+
+    reader = ZlibArchiveReader(pyz)
+    # Entries not getting smaller are stored uncompressed.
+    assert reader.toc['random.bin'][3] == PYZ_CODEC_STORE
+    assert reader.extract('random.bin') == (PYZ_TYPE_DATA,
+                                            random_data.read_binary())
+    if compression == 'lzma':
+        assert reader.toc['data.txt'][3] == PYZ_CODEC_LZMA
+    namespace = {}
+    exec(reader.extract('mod10')[1], namespace)
+    assert namespace['value'] == 'mod10' * 10
+    assert reader.extract('data.txt') == (PYZ_TYPE_DATA, b'data' * 1000)
+
+
+def test_zlib_archive_unknown_compression(tmpdir):
+    with pytest.raises(ValueError):
+        ZlibArchiveWriter(str(tmpdir.join('out.pyz')), [],
+                          compression='bzip3')
+
+
+def test_zlib_archive_reuses_unchanged_entries(tmpdir, monkeypatch):
+    toc, code_dict = _make_pyz_toc(tmpdir)
+    pyz = str(tmpdir.join('out.pyz'))
+    ZlibArchiveWriter(pyz, toc, code_dict=code_dict)
+
+    compressed = []
+    compress = ZlibArchiveWriter._compress
+
+    def _compress(self, data):
+        compressed.append(data)
+        return compress(self, data)
+    monkeypatch.setattr(ZlibArchiveWriter, '_compress', _compress)
+    code_dict['mod03'] = compile('value = 3\n', 'mod03', 'exec')
+    ZlibArchiveWriter(pyz, toc, code_dict=code_dict, jobs=4)
+    assert len(compressed) == 1
+
+    reader = ZlibArchiveReader(pyz)
+    for name, value in (('mod03', 3), ('mod04', 'mod04' * 4)):
+        namespace = {}
+        exec(reader.extract(name)[1], namespace)
+        assert namespace['value'] == value
+    assert reader.extract('data.txt') == (PYZ_TYPE_DATA, b'data' * 1000)
+    assert not os.path.exists(pyz + '.previous')
+
+    # Entries compressed differently are not reused.
+    del compressed[:]
+    ZlibArchiveWriter(pyz, toc, code_dict=code_dict, compression='store')
+    assert len(compressed) == len(toc)
+
+
+def test_carchive_extraction_cache(tmpdir):
+    data = tmpdir.join('data.txt')
+    data.write('data')
+    toc = [('data.txt', str(data), 1, 'x')]
+
+    def extraction_cache_option(name):
+        CArchiveWriter(str(tmpdir.join(name)), toc, pylib_name='',
+                       extraction_cache=True)
+        archive = CArchiveReader(str(tmpdir.join(name)))
+        options = [entry[-1] for entry in archive.toc.data
+                   if entry[-1].startswith('pyi-extraction-cache ')]
+        assert len(options) == 1
+        return options[0]
+
+    option = extraction_cache_option('a.pkg')
+    assert extraction_cache_option('b.pkg') == option
+    # The hash changes with the contents.
+    data.write('changed')
+    assert extraction_cache_option('c.pkg') != option
+
+
+def test_carchive_alignment(tmpdir):
+    binary = tmpdir.join('binary.so')
+    binary.write_binary(b'\x7fELF' * 1000)
+    data = tmpdir.join('data.txt')
+    data.write('data')
+    toc = [('data.txt', str(data), 0, 'x'),
+           ('binary.so', str(binary), 0, 'b'),
+           ('compressed.so', str(binary), 1, 'b'),
+           ('data2.txt', str(data), 0, 'x'),
+           ('binary2.so', str(binary), 0, 'b')]
+    CArchiveWriter(str(tmpdir.join('a.pkg')), toc, pylib_name='',
+                   alignment=4096)
+    archive = CArchiveReader(str(tmpdir.join('a.pkg')))
+    positions = dict((entry[-1], entry[0]) for entry in archive.toc.data)
+    # Only uncompressed binaries are aligned.
+    assert positions['binary.so'] == 4096
+    assert positions['binary2.so'] % 4096 == 0
+    assert positions['compressed.so'] % 4096 != 0
+    assert positions['data2.txt'] % 4096 != 0
+    assert archive.extract('binary2.so')[1] == binary.read_binary()
+    assert archive.extract('data2.txt')[1] == b'data'
@@ -0,0 +1,160 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2019, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+import glob
+import os
+import sys
+
+import pytest
+
+from PyInstaller import compat
+from PyInstaller.depend import bindepend, elf
+from PyInstaller.utils.tests import skipif_notlinux
+
+
+def test_elf_expand_search_path():
+    assert elf.expand_search_path('$ORIGIN/../lib', '/opt/app/bin',
+                                  elf.ELFCLASS64) == '/opt/app/bin/../lib'
+    assert elf.expand_search_path('${ORIGIN}:/usr/$LIB', '/opt',
+                                  elf.ELFCLASS32) == '/opt:/usr/lib'
+    assert elf.expand_search_path('/opt/$PLATFORM', '/opt',
+                                  elf.ELFCLASS64) is None
+
+
+def test_elf_read_no_elf_file(tmpdir):
+    filename = tmpdir.join('libfoo.so')
+    filename.write('/* GNU ld script */\n')
+    with pytest.raises(ValueError):
+        elf.read_dynamic_info(str(filename))
+
+
+@skipif_notlinux
+def test_elf_read_dynamic_info():
+    info = elf.read_dynamic_info(sys.executable)
+    expected = elf.ELFCLASS64 if compat.architecture == '64bit' else \
+        elf.ELFCLASS32
+    assert info.elfclass == expected
+    libc = [lib for lib in bindepend._getImports_elf(sys.executable)
+            if os.path.basename(lib).startswith('libc.so.')]
+    assert len(libc) == 1
+    assert bindepend._get_so_name(libc[0]) == os.path.basename(libc[0])
+
+
+@skipif_notlinux
+@pytest.mark.parametrize('pattern', ['_ssl*.so', '_ctypes*.so', '*.so'])
+def test_elf_imports_match_ldd(pattern):
+    # Extension modules have some well known dependencies.
+    lib_dynload = os.path.join(os.path.dirname(os.__file__), 'lib-dynload')
+    extensions = sorted(glob.glob(os.path.join(lib_dynload, pattern)))
+    if not extensions:
+        pytest.skip('no extension module %s found' % pattern)
+    pth = extensions[0]
+    imports = bindepend._getImports_elf(pth)
+    # ldd does not list the dynamic loader, as it is loaded first anyway.
+    imports = set(os.path.realpath(lib) for lib in imports
+                  if not os.path.basename(lib).startswith('ld-'))
+    expected = set(os.path.realpath(lib)
+                   for lib in bindepend._getImports_ldd(pth))
+    assert imports == expected
+
+
+@skipif_notlinux
+def test_dependencies_parallel(monkeypatch):
+    lib_dynload = os.path.join(os.path.dirname(os.__file__), 'lib-dynload')
+    toc = [(os.path.basename(pth), pth, 'EXTENSION')
+           for pth in sorted(glob.glob(os.path.join(lib_dynload, '*.so')))]
+    if not toc:
+        pytest.skip('no extension modules found')
+    results = []
+    for jobs in (1, 4):
+        monkeypatch.setattr(bindepend, 'seen', set())
+        results.append(bindepend.Dependencies(list(toc), jobs=jobs))
+    assert len(results[0]) > len(toc)
+    assert results[0] == results[1]
+
+
+def test_imports_cache(tmpdir, monkeypatch):
+    binary = tmpdir.join('libfoo.so')
+    binary.write('binary')
+    lib = tmpdir.join('libbar.so')
+    lib.write('library')
+    cache = bindepend.ImportsCache(str(tmpdir.join('cache')))
+    assert cache.get(str(binary)) is None
+    cache.put(str(binary), [str(lib), 'libc.so.6'])
+    cache.save()
+
+    cache = bindepend.ImportsCache(str(tmpdir.join('cache')))
+    assert cache.get(str(binary)) == [str(lib), 'libc.so.6']
+    # Removing a dependency invalidates the entry.
+    lib.remove()
+    assert cache.get(str(binary)) is None
+    # So does changing the binary.
+    cache.put(str(binary), ['libc.so.6'])
+    binary.write('changed binary')
+    assert cache.get(str(binary)) is None
+
+
+def test_imports_cache_evicts_least_recently_used(tmpdir, monkeypatch):
+    monkeypatch.setattr(bindepend.ImportsCache, 'MAX_ENTRIES', 2)
+    cache = bindepend.ImportsCache(str(tmpdir))
+    binaries = []
+    for i in range(3):
+        binary = tmpdir.join('lib%d.so' % i)
+        binary.write('binary')
+        binaries.append(str(binary))
+    times = iter(range(10))
+    monkeypatch.setattr(bindepend.time, 'time', lambda: next(times))
+    for binary in binaries:
+        cache.put(binary, [])
+    # Use the first binary, so the second one is the least recently used.
+    cache.get(binaries[0])
+    cache.save()
+
+    cache = bindepend.ImportsCache(str(tmpdir))
+    assert cache.get(binaries[0]) == []
+    assert cache.get(binaries[1]) is None
+    assert cache.get(binaries[2]) == []
+
+
+def test_get_imports_uses_cache(tmpdir, monkeypatch):
+    from PyInstaller.config import CONF
+    monkeypatch.setitem(CONF, 'cachedir', str(tmpdir))
+    monkeypatch.setattr(bindepend, '_imports_cache', None)
+    monkeypatch.setattr(bindepend, '_getImports',
+                        lambda pth, missing=None: ['libc.so.6'])
+    binary = tmpdir.join('libfoo.so')
+    binary.write('binary')
+    assert bindepend.getImports(str(binary)) == ['libc.so.6']
+    bindepend._get_imports_cache().save()
+    bindepend._imports_cache = None
+
+    def fail(pth, missing=None):
+        raise AssertionError('%s inspected again' % pth)
+    monkeypatch.setattr(bindepend, '_getImports', fail)
+    assert bindepend.getImports(str(binary)) == ['libc.so.6']
+
+
+def test_get_imports_does_not_cache_missing(tmpdir, monkeypatch):
+    from PyInstaller.config import CONF
+    monkeypatch.setitem(CONF, 'cachedir', str(tmpdir))
+    monkeypatch.setattr(bindepend, '_imports_cache', None)
+    calls = []
+
+    def get_imports(pth, missing=None):
+        calls.append(pth)
+        missing.append('libmissing.so.1')
+        return ['libc.so.6']
+    monkeypatch.setattr(bindepend, '_getImports', get_imports)
+    binary = tmpdir.join('libfoo.so')
+    binary.write('binary')
+    assert bindepend.getImports(str(binary)) == ['libc.so.6']
+    # The missing library might be installed meanwhile, search again.
+    assert bindepend.getImports(str(binary)) == ['libc.so.6']
+    assert len(calls) == 2
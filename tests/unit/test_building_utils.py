@@ -76,3 +76,195 @@ def test_format_binaries_and_datas_with_bracket(tmpdir):
 
     res = utils.format_binaries_and_datas(datas, str(tmpdir))
     assert res == expected
+
+
+def test_check_cache(tmpdir, monkeypatch):
+    from PyInstaller.config import CONF
+    from PyInstaller import compat
+    monkeypatch.setitem(CONF, 'cachedir', str(tmpdir.join('cache')))
+    monkeypatch.setattr(utils, '_bincache_indexes', {})
+    commands = []
+    monkeypatch.setattr(compat, 'exec_command',
+                        lambda *cmd: commands.append(cmd))
+    binary = tmpdir.join('libfoo.so')
+    binary.write('binary')
+
+    cachedfile = utils.checkCache(str(binary), strip=True)
+    assert len(commands) == 1
+    assert commands[0][0] == 'strip'
+    assert os.path.dirname(cachedfile) != str(tmpdir)
+    with open(cachedfile) as f:
+        assert f.read() == 'binary'
+    # No temporary files are left behind.
+    assert sorted(os.listdir(os.path.dirname(cachedfile))) == \
+        ['index', 'libfoo.so']
+
+    # Other builds reuse the processed file.
+    monkeypatch.setattr(utils, '_bincache_indexes', {})
+    assert utils.checkCache(str(binary), strip=True) == cachedfile
+    assert len(commands) == 1
+
+    # A changed file is processed again.
+    binary.write('changed binary')
+    assert utils.checkCache(str(binary), strip=True) == cachedfile
+    assert len(commands) == 2
+    with open(cachedfile) as f:
+        assert f.read() == 'changed binary'
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_check_cache_all(tmpdir, monkeypatch, jobs):
+    from PyInstaller.config import CONF
+    from PyInstaller import compat
+    monkeypatch.setitem(CONF, 'cachedir', str(tmpdir.join('cache')))
+    monkeypatch.setattr(utils, '_bincache_indexes', {})
+    commands = []
+    monkeypatch.setattr(compat, 'exec_command',
+                        lambda *cmd: commands.append(cmd))
+    toc = []
+    for i in range(8):
+        binary = tmpdir.join('lib%d.so' % i)
+        binary.write('binary %d' % i)
+        toc.append(('lib%d.so' % i, str(binary), 'BINARY'))
+    # Only the first binary of a name is processed.
+    toc.append(('lib0.so', str(tmpdir.join('lib1.so')), 'BINARY'))
+    # Other type codes are not processed.
+    toc.append(('data.txt', str(tmpdir.join('lib2.so')), 'DATA'))
+
+    get_cached = utils.checkCacheAll(toc, strip=True, jobs=jobs)
+    assert len(commands) == 8
+    for i in range(8):
+        cachedfile = get_cached('lib%d.so' % i, str(tmpdir.join('lib%d.so' % i)))
+        with open(cachedfile) as f:
+            assert f.read() == 'binary %d' % i
+    assert len(commands) == 8
+    # Binaries not processed before are processed on demand.
+    cachedfile = get_cached('lib0.so', str(tmpdir.join('lib1.so')))
+    assert len(commands) == 9
+    with open(cachedfile) as f:
+        assert f.read() == 'binary 1'
+
+
+def test_check_cache_skips_hashing_unchanged_files(tmpdir, monkeypatch):
+    from PyInstaller.config import CONF
+    from PyInstaller import compat
+    monkeypatch.setitem(CONF, 'cachedir', str(tmpdir.join('cache')))
+    monkeypatch.setattr(utils, '_bincache_indexes', {})
+    monkeypatch.setattr(compat, 'exec_command', lambda *cmd: None)
+    binary = tmpdir.join('libfoo.so')
+    binary.write('binary')
+    cachedfile = utils.checkCache(str(binary), strip=True)
+
+    hashed = []
+    cache_digest = utils.cacheDigest
+
+    def fake_cache_digest(fnm, redirects):
+        hashed.append(fnm)
+        return cache_digest(fnm, redirects)
+    monkeypatch.setattr(utils, 'cacheDigest', fake_cache_digest)
+    monkeypatch.setattr(utils, '_bincache_indexes', {})
+    assert utils.checkCache(str(binary), strip=True) == cachedfile
+    assert hashed == []
+
+    # A touched but unchanged file is hashed, but not processed again.
+    stat = os.stat(str(binary))
+    os.utime(str(binary), (stat.st_atime, stat.st_mtime + 10))
+    monkeypatch.setattr(utils, '_process_cached_file', None)
+    assert utils.checkCache(str(binary), strip=True) == cachedfile
+    assert hashed == [str(binary)]
+    monkeypatch.setattr(utils, '_bincache_indexes', {})
+    assert utils.checkCache(str(binary), strip=True) == cachedfile
+    assert hashed == [str(binary)]
+
+
+def test_get_code_data(tmpdir, monkeypatch):
+    import marshal
+    from PyInstaller.config import CONF
+    monkeypatch.setitem(CONF, 'cachedir', str(tmpdir.join('cache')))
+    monkeypatch.setitem(CONF, 'pathex', [str(tmpdir.join('src'))])
+    monkeypatch.setattr(utils, '_code_caches', {})
+    source = tmpdir.join('src', 'pkg', 'mod.py')
+    source.write('value = 1\n', ensure=True)
+
+    data = utils.get_code_data('pkg.mod', str(source))
+    code = marshal.loads(data)
+    assert code.co_filename == os.path.join('pkg', 'mod.py')
+
+    def fail(modname, filename):
+        raise AssertionError('%s compiled again' % modname)
+    monkeypatch.setattr(utils, 'get_code_object', fail)
+    assert utils.get_code_data('pkg.mod', str(source)) == data
+    # Changing the source invalidates the entry.
+    source.write('value = 2\n')
+    with pytest.raises(AssertionError):
+        utils.get_code_data('pkg.mod', str(source))
+
+
+@pytest.mark.skipif(not hasattr(os, 'link'), reason='requires hard links')
+def test_collect_file_hardlink(tmpdir):
+    src = tmpdir.join('libfoo.so')
+    src.write('binary')
+    src.chmod(0o755)
+    dst = tmpdir.join('libfoo-linked.so')
+    assert utils.collect_file(str(src), str(dst), 'hardlink',
+                              executable=True) == 'hardlink'
+    assert os.path.samefile(str(src), str(dst))
+
+    # Making a binary executable must not change the original file.
+    src.chmod(0o644)
+    dst = tmpdir.join('libfoo-copied.so')
+    assert utils.collect_file(str(src), str(dst), 'hardlink',
+                              executable=True) == 'copy'
+    assert not os.path.samefile(str(src), str(dst))
+    assert os.stat(str(dst)).st_mode & 0o777 == 0o755
+    assert os.stat(str(src)).st_mode & 0o777 == 0o644
+
+
+def test_collect_file_reflink(tmpdir):
+    src = tmpdir.join('data.txt')
+    src.write('data')
+    dst = tmpdir.join('data-cloned.txt')
+    # File systems not supporting clones fall back to copying.
+    assert utils.collect_file(str(src), str(dst), 'reflink') in ('reflink',
+                                                                 'copy')
+    assert dst.read() == 'data'
+    assert not os.path.samefile(str(src), str(dst))
+
+
+def test_sync_collect_directory(tmpdir, monkeypatch):
+    from PyInstaller.config import CONF
+    monkeypatch.setitem(CONF, 'specpath', str(tmpdir.join('spec')))
+    monkeypatch.setitem(CONF, 'workpath', str(tmpdir.join('build')))
+    src = tmpdir.mkdir('src')
+    src.join('libfoo.so').write('binary')
+    src.join('data.txt').write('data')
+    src.join('old.txt').write('old')
+    src.mkdir('pkg').join('mod.txt').write('mod')
+    dist = tmpdir.join('dist', 'app')
+    manifest = str(tmpdir.join('COLLECT-00.manifest'))
+    files = [('libfoo.so', str(src.join('libfoo.so')), True),
+             ('data.txt', str(src.join('data.txt')), False),
+             ('old.txt', str(src.join('old.txt')), False),
+             ('pkg', str(src.join('pkg')), False)]
+    assert utils.sync_collect_directory(str(dist), files, manifest) == \
+        (4, 0, 0)
+    assert dist.join('pkg', 'mod.txt').read() == 'mod'
+    assert os.stat(str(dist.join('libfoo.so'))).st_mode & 0o777 == 0o755
+    mtime = dist.join('libfoo.so').mtime()
+
+    # Same content with a new timestamp, changed and stale files.
+    src.join('libfoo.so').setmtime(mtime + 10)
+    src.join('data.txt').write('new data')
+    dist.join('extra.txt').write('extra')
+    assert utils.sync_collect_directory(str(dist), files[:2] + files[3:],
+                                        manifest) == (1, 2, 2)
+    assert dist.join('libfoo.so').mtime() == mtime
+    assert dist.join('data.txt').read() == 'new data'
+    assert not dist.join('old.txt').exists()
+    assert not dist.join('extra.txt').exists()
+
+    # Files modified in the output directory are collected again.
+    dist.join('pkg', 'mod.txt').write('modified')
+    assert utils.sync_collect_directory(str(dist), files[:1] + files[3:],
+                                        manifest) == (1, 1, 1)
+    assert dist.join('pkg', 'mod.txt').read() == 'mod'
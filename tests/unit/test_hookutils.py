@@ -13,10 +13,11 @@ import pytest
 import shutil
 from os.path import join
 
+from PyInstaller.utils import hooks
 from PyInstaller.utils.hooks import collect_data_files, collect_submodules, \
     get_module_file_attribute, remove_prefix, remove_suffix, \
     remove_file_extension, is_module_or_submodule, \
-    is_module_satisfies
+    is_module_satisfies, exec_statement
 from PyInstaller.compat import exec_python, ALL_SUFFIXES
 
 
@@ -270,3 +271,85 @@ def test_collect_data_all_included(data_lists):
 def test_get_module_file_attribute_non_exist_module():
     with pytest.raises(ImportError):
         get_module_file_attribute('pyinst_nonexisting_module_name')
+
+
+@pytest.mark.skipif(hooks._statement_server is None,
+                    reason='statement server not supported')
+def test_statement_server(monkeypatch, tmpdir):
+    monkeypatch.setattr('PyInstaller.config.CONF', {'pathex': []})
+    monkeypatch.chdir(tmpdir)
+    statement = """
+        import os, sys
+        print(os.getcwd(), 'json' in sys.modules, 'struct' in sys.modules)
+        import json, struct
+    """
+    expected = '%s False False' % os.getcwd()
+    # Statements do not affect each other.
+    assert exec_statement(statement) == expected
+    assert exec_statement(statement) == expected
+    assert exec_statement('raise SystemExit(3)') == ''
+    # A server which died is restarted.
+    hooks._statement_server._process.kill()
+    hooks._statement_server._process.wait()
+    assert exec_statement(statement) == expected
+
+
+def test_query_cache(monkeypatch, tmpdir):
+    site_dir = tmpdir.join('site-packages')
+    site_dir.join('foo', '__init__.py').write('', ensure=True)
+    record = site_dir.join('foo-1.0.dist-info', 'RECORD')
+    record.write('foo/__init__.py,,\n', ensure=True)
+    monkeypatch.setattr('PyInstaller.config.CONF', {'pathex': []})
+    monkeypatch.syspath_prepend(str(site_dir))
+
+    cache = hooks._QueryCache(str(tmpdir.join('cache')))
+    fingerprint = cache.fingerprint('foo.bar')
+    assert fingerprint is not None
+    assert cache.get('statement', fingerprint) is None
+    cache.put('statement', fingerprint, 'output')
+    cache.save()
+
+    cache = hooks._QueryCache(str(tmpdir.join('cache')))
+    assert cache.fingerprint('foo.bar') == fingerprint
+    assert cache.get('statement', fingerprint) == 'output'
+    # Upgrading the distribution invalidates the entry.
+    record.setmtime(record.mtime() + 10)
+    cache.save()
+    assert cache.fingerprint('foo.bar') != fingerprint
+    # Modules in pathex are not cached.
+    monkeypatch.setattr('PyInstaller.config.CONF',
+                        {'pathex': [str(site_dir)]})
+    assert cache.fingerprint('foo.bar') is None
+
+
+def test_query_cache_pyinstaller_in_site_packages(monkeypatch, tmpdir):
+    # With a normal installation, HOMEPATH is site-packages.
+    site_dir = tmpdir.join('site-packages')
+    site_dir.join('foo', '__init__.py').write('', ensure=True)
+    site_dir.join('PyInstaller', '__init__.py').write('', ensure=True)
+    site_dir.join('foo-1.0.dist-info', 'RECORD').write(
+        'foo/__init__.py,,\n', ensure=True)
+    site_dir.join('PyInstaller-3.6.dist-info', 'RECORD').write(
+        'PyInstaller/__init__.py,,\n', ensure=True)
+    monkeypatch.setattr('PyInstaller.config.CONF', {'pathex': []})
+    monkeypatch.setattr(hooks, 'HOMEPATH', str(site_dir))
+    monkeypatch.setattr(hooks, 'PACKAGEPATH', str(site_dir.join('PyInstaller')))
+    monkeypatch.syspath_prepend(str(site_dir))
+
+    cache = hooks._QueryCache(str(tmpdir.join('cache')))
+    assert cache.fingerprint('foo') is not None
+    # PyInstaller itself is not cached.
+    assert cache.fingerprint('PyInstaller.utils') is None
+
+
+def test_query_cache_editable_install(monkeypatch, tmpdir):
+    # A source directory on sys.path, as with `setup.py develop`. Its
+    # .egg-info does not list the files, which may change at any time.
+    src_dir = tmpdir.join('src')
+    src_dir.join('foo', '__init__.py').write('', ensure=True)
+    src_dir.join('foo.egg-info', 'top_level.txt').write('foo\n', ensure=True)
+    monkeypatch.setattr('PyInstaller.config.CONF', {'pathex': []})
+    monkeypatch.syspath_prepend(str(src_dir))
+
+    cache = hooks._QueryCache(str(tmpdir.join('cache')))
+    assert cache.fingerprint('foo.bar') is None
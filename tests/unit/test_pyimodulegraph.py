@@ -125,3 +125,128 @@ def test_graph_collects_script_dependencies(fresh_pyi_modgraph, tmpdir):
     names = [n.identifier for n in mg.flatten(start=node)]
     assert str(src2) in names
     assert "uuid" in names
+
+
+def test_module_scan_cache(tmpdir):
+    cache = analysis.ModuleScanCache(str(tmpdir.join('cache')))
+    src = tmpdir.join('mymod.py')
+    src.write('import os\nvalue = 1\n')
+    pathname = str(src)
+    assert cache.get(pathname) is None
+
+    cache.put(pathname, modulegraph.scan_source(src.read(), pathname))
+    valid, code, imports, global_attr_names = cache.get(pathname)
+    assert valid
+    assert isinstance(code, types.CodeType)
+    assert [imp[1] for imp in imports] == ['os']
+    assert 'value' in global_attr_names
+
+    # Touching the file keeps the entry valid, changing the contents does not.
+    src.setmtime(src.mtime() + 10)
+    assert cache.get(pathname) is not None
+    src.write('import sys\n')
+    assert cache.get(pathname) is None
+
+
+def test_graph_reuses_module_scan_cache(tmpdir, monkeypatch):
+    def fake_base_modules(self):
+        # speed up set up
+        self._base_modules = ()
+
+    monkeypatch.setattr(analysis.PyiModuleGraph,
+                        "_analyze_base_modules", fake_base_modules)
+    tmpdir.join('mymod1.py').write('import mymod2\nvalue = 1\n')
+    tmpdir.join('mymod2.py').write('value = 2\n')
+    script = gen_sourcefile(tmpdir, """import mymod1""")
+    cache_dir = str(tmpdir.join('cache'))
+
+    def run_graph():
+        mg = analysis.PyiModuleGraph(HOMEPATH, cache_dir=cache_dir)
+        mg.path = [str(tmpdir)] + mg.path
+        mg.run_script(str(script))
+        return mg
+
+    run_graph()
+    # All modules are cached now and must not be scanned again.
+    def fail_scan_source(contents, pathname):
+        raise AssertionError('%s scanned again' % pathname)
+    monkeypatch.setattr(modulegraph, 'scan_source', fail_scan_source)
+    mg = run_graph()
+    node = mg.findNode('mymod2')
+    assert isinstance(node, modulegraph.SourceModule)
+    assert isinstance(node.code, types.CodeType)
+    assert node.is_global_attr('value')
+    assert mg.findNode('mymod1') in mg.getReferers(node)
+
+
+def test_graph_scans_modules_in_parallel(tmpdir, monkeypatch):
+    def fake_base_modules(self):
+        # speed up set up
+        self._base_modules = ()
+
+    monkeypatch.setattr(analysis.PyiModuleGraph,
+                        "_analyze_base_modules", fake_base_modules)
+    pkg = tmpdir.join('mypkg').ensure(dir=True)
+    pkg.join('__init__.py').write('from . import sub\n')
+    pkg.join('sub.py').write('from .other import value\n')
+    pkg.join('other.py').write('value = 1\n')
+    tmpdir.join('mymod.py').write('import mypkg.sub\nvalue = 2\n')
+    script = gen_sourcefile(tmpdir, """import mymod""")
+
+    def run_graph(jobs):
+        mg = analysis.PyiModuleGraph(HOMEPATH, jobs=jobs)
+        mg.path = [str(tmpdir)] + mg.path
+        mg.run_script(str(script))
+        return mg
+
+    serial = run_graph(1)
+    # All modules must be scanned by the worker processes.
+    def fail_scan_source(self, fp, pathname):
+        raise AssertionError('%s scanned by the main process' % pathname)
+    monkeypatch.setattr(modulegraph.ModuleGraph, '_scan_source',
+                        fail_scan_source)
+    try:
+        parallel = run_graph(2)
+    finally:
+        analysis.shutdown_scan_pool()
+    assert not parallel._scan_jobs
+    for name in ('mymod', 'mypkg', 'mypkg.sub', 'mypkg.other'):
+        node = parallel.findNode(name)
+        assert isinstance(node.code, types.CodeType)
+        assert node.code == serial.findNode(name).code
+        assert (sorted(n.identifier for n in parallel.getReferers(node)) ==
+                sorted(n.identifier for n in serial.getReferers(node)))
+
+
+def test_import_signature(tmpdir):
+    mod = tmpdir.join('mymod.py')
+    mod.write('import os\n\ndef func():\n    return 1\n')
+    signature = analysis.get_import_signature(str(mod))
+    assert signature is not None
+    # Changing code other than imports and module-level names keeps the
+    # signature.
+    mod.write('import os\n\ndef func():\n    return os.sep\n')
+    assert analysis.get_import_signature(str(mod)) == signature
+    mod.write('import os\n\ndef func():\n    import sys\n')
+    assert analysis.get_import_signature(str(mod)) != signature
+    # Module-level names decide on missing submodules and star-imports.
+    mod.write('import os\n\ndef func():\n    return 1\nvalue = 1\n')
+    assert analysis.get_import_signature(str(mod)) != signature
+    # Files which can not be analysed have no signature.
+    mod.write('import os\nvalue = \n')
+    assert analysis.get_import_signature(str(mod)) is None
+    assert analysis.get_import_signature(str(tmpdir.join('missing.py'))) is None
+
+
+def test_import_signature_ctypes(tmpdir):
+    mod = tmpdir.join('mymod.py')
+    mod.write('import ctypes\n\ndef func():\n    return 1\n')
+    signature = analysis.get_import_signature(str(mod))
+    # Libraries loaded via ctypes become binaries of the analysis.
+    mod.write('import ctypes\n\ndef func():\n'
+              '    return ctypes.CDLL("libfoo.so")\n')
+    ctypes_signature = analysis.get_import_signature(str(mod))
+    assert ctypes_signature != signature
+    mod.write('import ctypes\n\ndef func():\n'
+              '    return ctypes.CDLL("libbar.so")\n')
+    assert analysis.get_import_signature(str(mod)) != ctypes_signature
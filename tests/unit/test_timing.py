@@ -0,0 +1,39 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2019, PyInstaller Development Team.
+#
+# Distributed under the terms of the GNU General Public License with exception
+# for distributing bootloader.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+
+import json
+
+from PyInstaller.building import timing
+
+
+def test_timing_report(tmpdir):
+    timing.reset()
+    with timing.phase('Analysis'):
+        with timing.phase('hooks'):
+            timing.add_hook('fast', 'hook-fast.py', 0.1)
+            timing.add_hook('slow', 'hook-slow.py', 0.5)
+    with timing.phase('PYZ'):
+        pass
+    report = tmpdir.join('timing.json')
+    timing.write_report(str(report))
+
+    data = json.loads(report.read())
+    assert [entry['name'] for entry in data['phases']] == \
+        ['Analysis/hooks', 'Analysis', 'PYZ']
+    analysis = data['phases'][1]
+    assert analysis['wall'] >= data['phases'][0]['wall'] >= 0
+    assert analysis['cpu'] >= 0
+    assert [hook['module'] for hook in data['hooks']] == ['slow', 'fast']
+    timing.reset()
+
+
+def test_peak_rss():
+    rss = timing.peak_rss()
+    assert rss is None or rss > 1024 * 1024